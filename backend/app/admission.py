@@ -0,0 +1,269 @@
+"""
+Admission control for API requests
+
+Caps how many API requests run at once so a flood of bulk writes can't
+exhaust the database pool and starve interactive users:
+
+* at most ``capacity`` requests run concurrently (sized to the DB pool),
+  and bulk operations (``BULK_ROUTES``: bulk edits, layouts, jobs,
+  archiving) may only use ``bulk_capacity`` of those slots so
+  interactive reads and edits always have headroom;
+* requests over capacity wait in a bounded queue where interactive
+  requests are woken before bulk ones; a full queue or a wait longer
+  than ``queue_timeout`` gets ``503`` with ``Retry-After``;
+* a single client, or a single route listed in ``route_limits``, may
+  only have so many requests running or queued; beyond that it gets
+  ``429`` with ``Retry-After``.
+
+Limits are per process.
+"""
+import asyncio
+import json
+import math
+from fnmatch import fnmatchcase
+from collections import Counter, deque
+from typing import Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import get_settings
+from app.database import scope_client_key
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+EXEMPT_PREFIXES = ("/api/health", "/api/metrics")
+# "METHOD /path" patterns of bulk operations; "*" matches any path segments
+BULK_ROUTES = (
+    "POST /api/components/bulk/*",
+    "POST /api/frames/*/layout",
+    "POST /api/jobs",
+    "POST /api/projects/archive",
+    "POST /api/projects/*/archive",
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request can't be admitted"""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Concurrency slots with a prioritized, bounded wait queue"""
+
+    def __init__(
+        self,
+        capacity: int,
+        bulk_capacity: int,
+        max_queue: int,
+        queue_timeout: float,
+        per_client: int,
+        route_limits: Optional[dict[str, int]] = None,
+    ):
+        self.capacity = capacity
+        self.bulk_capacity = min(bulk_capacity, capacity)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.per_client = per_client
+        self.route_limits = route_limits or {}
+
+        self.in_flight = 0
+        self.bulk_in_flight = 0
+        self._waiters: dict[str, deque] = {INTERACTIVE: deque(), BULK: deque()}
+        self._clients: Counter = Counter()
+        self._routes: Counter = Counter()
+
+        self.admitted = 0
+        self.queued = 0
+        self.max_queue_depth = 0
+        self.rejected: Counter = Counter()
+
+    def route_key(self, method: str, path: str) -> Optional[str]:
+        """The configured route limit matching ``method path``, if any
+
+        Keys match exactly; a key ending in ``/*`` also matches sub-paths.
+        """
+        target = f"{method} {path}"
+        for key in self.route_limits:
+            if target == key or (key.endswith("/*") and target.startswith(key[:-1])):
+                return key
+        return None
+
+    def queue_depth(self) -> int:
+        """Requests currently waiting for a slot"""
+        return len(self._waiters[INTERACTIVE]) + len(self._waiters[BULK])
+
+    def _has_slot(self, priority: str) -> bool:
+        if self.in_flight >= self.capacity:
+            return False
+        return priority == INTERACTIVE or self.bulk_in_flight < self.bulk_capacity
+
+    def _take_slot(self, priority: str) -> None:
+        self.in_flight += 1
+        if priority == BULK:
+            self.bulk_in_flight += 1
+
+    def _reject(self, status_code: int, reason: str, retry_after: float) -> AdmissionRejected:
+        self.rejected[reason] += 1
+        return AdmissionRejected(status_code, reason, max(1, math.ceil(retry_after)))
+
+    async def acquire(self, priority: str, client: str, route: Optional[str]) -> None:
+        """Wait for a slot or raise ``AdmissionRejected``
+
+        Queued requests count toward the client and route limits, so one
+        client can't fill the queue on its own.
+        """
+        if self._clients[client] >= self.per_client:
+            raise self._reject(429, "client_limit", 1)
+        if route is not None and self._routes[route] >= self.route_limits[route]:
+            raise self._reject(429, "route_limit", 1)
+
+        # Nobody may jump the queue; reads only wait behind other reads
+        ahead = len(self._waiters[INTERACTIVE]) + (len(self._waiters[BULK]) if priority == BULK else 0)
+        if not ahead and self._has_slot(priority):
+            self._take_slot(priority)
+            self._count(client, route, 1)
+            self.admitted += 1
+            return
+
+        if self.queue_depth() >= self.max_queue:
+            raise self._reject(503, "queue_full", self.queue_timeout)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+        self._count(client, route, 1)
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth())
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as exc:
+            self._count(client, route, -1)
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled
+                self._give_back(priority)
+            else:
+                self._discard(priority, waiter)
+            if isinstance(exc, asyncio.TimeoutError):
+                raise self._reject(503, "queue_timeout", self.queue_timeout) from None
+            raise
+        self.admitted += 1
+
+    def release(self, priority: str, client: str, route: Optional[str]) -> None:
+        """Give back a slot and wake the next waiter"""
+        self._count(client, route, -1)
+        self._give_back(priority)
+
+    def _count(self, client: str, route: Optional[str], delta: int) -> None:
+        self._clients[client] += delta
+        if self._clients[client] <= 0:
+            del self._clients[client]
+        if route is not None:
+            self._routes[route] += delta
+
+    def _give_back(self, priority: str) -> None:
+        self.in_flight -= 1
+        if priority == BULK:
+            self.bulk_in_flight -= 1
+        self._wake()
+
+    def _discard(self, priority: str, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters[priority].remove(waiter)
+        except ValueError:
+            pass
+
+    def _wake(self) -> None:
+        """Hand free slots to waiters, reads first"""
+        while True:
+            for priority in (INTERACTIVE, BULK):
+                queue = self._waiters[priority]
+                while queue and queue[0].done():
+                    queue.popleft()
+                if queue and self._has_slot(priority):
+                    self._take_slot(priority)
+                    queue.popleft().set_result(None)
+                    break
+            else:
+                return
+
+    def metrics(self) -> dict:
+        """Current load and rejection counters"""
+        return {
+            "in_flight": self.in_flight,
+            "bulk_in_flight": self.bulk_in_flight,
+            "queue_depth": self.queue_depth(),
+            "interactive_queue_depth": len(self._waiters[INTERACTIVE]),
+            "bulk_queue_depth": len(self._waiters[BULK]),
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": dict(self.rejected),
+        }
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying an ``AdmissionController`` to /api requests"""
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not path.startswith("/api/") or path.startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        if method == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        priority = request_priority(method, path)
+        client = scope_client_key(scope)
+        route = self.controller.route_key(method, path)
+
+        try:
+            await self.controller.acquire(priority, client, route)
+        except AdmissionRejected as rejected:
+            await _send_rejection(send, rejected)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(priority, client, route)
+
+
+def request_priority(method: str, path: str) -> str:
+    """BULK for the operations in ``BULK_ROUTES``, INTERACTIVE for everything else"""
+    target = f"{method} {path}"
+    return BULK if any(fnmatchcase(target, pattern) for pattern in BULK_ROUTES) else INTERACTIVE
+
+
+async def _send_rejection(send: Send, rejected: AdmissionRejected) -> None:
+    body = json.dumps({"detail": f"Server busy ({rejected.reason}), retry later"}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": rejected.status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(rejected.retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+settings = get_settings()
+
+admission_controller = AdmissionController(
+    capacity=settings.ADMISSION_MAX_CONCURRENCY,
+    bulk_capacity=settings.ADMISSION_BULK_CONCURRENCY,
+    max_queue=settings.ADMISSION_MAX_QUEUE,
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    per_client=settings.ADMISSION_PER_CLIENT,
+    route_limits=settings.ADMISSION_ROUTE_LIMITS,
+)
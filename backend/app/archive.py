@@ -0,0 +1,260 @@
+"""
+Cold storage for inactive projects
+
+Archiving moves a project's frames, components and frame revisions out of
+the hot tables into one zlib-compressed JSON row in ``project_archives``.
+The ``projects`` row stays as a stub, and ``archived_frames`` and
+``archived_components`` remember which frame and component ids belonged
+to the project. The first request that needs the project's frames or
+components rehydrates it: rows are re-inserted with their original ids
+and the archive is dropped.
+"""
+import base64
+import json
+import logging
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import DateTime, LargeBinary, func, literal_column, select, union_all
+from sqlalchemy.orm import Session
+
+from app import models
+
+logger = logging.getLogger(__name__)
+
+# Archived tables in insert order
+TABLES = (models.Frame.__table__, models.Component.__table__, models.FrameRevision.__table__)
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode("ascii")
+    return value
+
+
+def _decode(column, value):
+    if value is None:
+        return None
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(column.type, LargeBinary):
+        return base64.b64decode(value)
+    return value
+
+
+def _dump_rows(db: Session, table, where) -> list[list]:
+    """Rows of ``table`` matching ``where`` as JSON-ready lists"""
+    return [[_encode(value) for value in row] for row in db.execute(select(table).where(where))]
+
+
+def _load_rows(table, rows: list[list]) -> list[dict]:
+    """Inverse of ``_dump_rows``"""
+    columns = list(table.columns)
+    return [
+        {column.name: _decode(column, value) for column, value in zip(columns, row)}
+        for row in rows
+    ]
+
+
+def _row_bytes(db: Session, table, where) -> Optional[int]:
+    """On-disk size of the matching rows on PostgreSQL, None elsewhere"""
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    size = func.pg_column_size(literal_column(f"{table.name}.*"))
+    return int(db.execute(select(func.coalesce(func.sum(size), 0)).select_from(table).where(where)).scalar())
+
+
+def is_archived(db: Session, project_id: int) -> bool:
+    """Whether a project is currently archived"""
+    archive = models.ProjectArchive
+    return db.execute(select(archive.project_id).where(archive.project_id == project_id)).first() is not None
+
+
+def _summary(archive: models.ProjectArchive) -> dict:
+    return {
+        "project_id": archive.project_id,
+        "frames": archive.frame_count,
+        "components": archive.component_count,
+        "revisions": archive.revision_count,
+        "hot_bytes": archive.hot_bytes,
+        "archive_bytes": len(archive.payload),
+    }
+
+
+def archive_project(db: Session, project_id: int) -> Optional[dict]:
+    """Move a project's frames, components and revisions into cold storage
+
+    Returns a summary of what was moved, or None if the project doesn't
+    exist. Archiving an archived project returns its existing summary.
+    """
+    project = db.execute(
+        select(models.Project).where(models.Project.id == project_id).with_for_update()
+    ).scalar_one_or_none()
+    if project is None:
+        return None
+    if project.archive is not None:
+        return _summary(project.archive)
+
+    f, c, r = TABLES
+    frame_ids = db.execute(
+        select(f.c.id).where(f.c.project_id == project_id).with_for_update()
+    ).scalars().all()
+    wheres = (f.c.project_id == project_id, c.c.frame_id.in_(frame_ids), r.c.frame_id.in_(frame_ids))
+
+    payload = {table.name: _dump_rows(db, table, where) for table, where in zip(TABLES, wheres)}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    measured = [_row_bytes(db, table, where) for table, where in zip(TABLES, wheres)]
+    hot_bytes = sum(measured) if None not in measured else len(raw)
+
+    archive = models.ProjectArchive(
+        project_id=project_id,
+        payload=zlib.compress(raw),
+        frame_count=len(payload[f.name]),
+        component_count=len(payload[c.name]),
+        revision_count=len(payload[r.name]),
+        hot_bytes=hot_bytes,
+    )
+    db.add(archive)
+    db.flush()
+    if frame_ids:
+        db.execute(models.ArchivedFrame.__table__.insert(), [
+            {"frame_id": frame_id, "project_id": project_id} for frame_id in frame_ids
+        ])
+    component_column = list(c.columns).index(c.c.id)
+    if payload[c.name]:
+        db.execute(models.ArchivedComponent.__table__.insert(), [
+            {"component_id": row[component_column], "project_id": project_id} for row in payload[c.name]
+        ])
+    for table, where in reversed(list(zip(TABLES, wheres))):
+        db.execute(table.delete().where(where))
+    db.commit()
+
+    summary = _summary(archive)
+    logger.info(
+        "Archived project %d: %d frames, %d components, %d revisions, %d bytes -> %d bytes",
+        project_id, summary["frames"], summary["components"], summary["revisions"],
+        summary["hot_bytes"], summary["archive_bytes"],
+    )
+    return summary
+
+
+def rehydrate(db: Session, project_id: int) -> bool:
+    """Move an archived project back into the hot tables
+
+    Returns True if the project was archived. Concurrent callers are
+    serialized on the archive row; only the first one does the work.
+    """
+    archive = db.execute(
+        select(models.ProjectArchive)
+        .where(models.ProjectArchive.project_id == project_id)
+        .with_for_update()
+    ).scalar_one_or_none()
+    if archive is None:
+        return False
+
+    payload = json.loads(zlib.decompress(archive.payload))
+    for table in TABLES:
+        rows = _load_rows(table, payload.get(table.name, []))
+        if rows:
+            db.execute(table.insert(), rows)
+    for index in (models.ArchivedFrame, models.ArchivedComponent):
+        db.execute(index.__table__.delete().where(index.project_id == project_id))
+    db.execute(
+        models.ProjectArchive.__table__.delete().where(models.ProjectArchive.project_id == project_id)
+    )
+    db.commit()
+    logger.info("Rehydrated project %d", project_id)
+    return True
+
+
+def rehydrate_frame(db: Session, frame_id: int) -> bool:
+    """Rehydrate the project owning an archived frame"""
+    project_id = db.execute(
+        select(models.ArchivedFrame.project_id).where(models.ArchivedFrame.frame_id == frame_id)
+    ).scalar()
+    return project_id is not None and rehydrate(db, project_id)
+
+
+def rehydrate_components(db: Session, component_ids: list[int]) -> bool:
+    """Rehydrate the projects owning any of the archived components"""
+    if not component_ids:
+        return False
+    a = models.ArchivedComponent
+    project_ids = db.execute(
+        select(a.project_id).where(a.component_id.in_(component_ids)).distinct()
+    ).scalars().all()
+    rehydrated = False
+    for project_id in project_ids:
+        rehydrated = rehydrate(db, project_id) or rehydrated
+    return rehydrated
+
+
+def inactive_projects(db: Session, before: datetime, limit: int) -> list[int]:
+    """Unarchived projects with no activity since ``before``, oldest first
+
+    Activity is the latest creation or update of the project, its frames,
+    its components or its revisions.
+    """
+    p, f, c, r = models.Project, models.Frame, models.Component, models.FrameRevision
+    activity = union_all(
+        select(p.id.label("project_id"), func.coalesce(p.updated_at, p.created_at).label("at")),
+        select(f.project_id, func.max(func.coalesce(f.updated_at, f.created_at)))
+        .group_by(f.project_id),
+        select(f.project_id, func.max(func.coalesce(c.updated_at, c.created_at)))
+        .join(c, c.frame_id == f.id)
+        .group_by(f.project_id),
+        select(f.project_id, func.max(r.created_at))
+        .join(r, r.frame_id == f.id)
+        .group_by(f.project_id),
+    ).subquery()
+    latest = func.max(activity.c.at)
+    return db.execute(
+        select(activity.c.project_id)
+        .where(activity.c.project_id.not_in(select(models.ProjectArchive.project_id)))
+        .group_by(activity.c.project_id)
+        .having(latest < before)
+        .order_by(latest)
+        .limit(limit)
+    ).scalars().all()
+
+
+def archive_inactive(db: Session, older_than_days: int, limit: int, dry_run: bool = False) -> dict:
+    """Archive projects untouched for ``older_than_days``
+
+    Each project is archived in its own transaction, so a failure only
+    skips that project. Returns the candidates and totals of what was
+    moved; ``hot_bytes`` is the row storage reclaimed from the hot tables
+    (disk space is returned once PostgreSQL vacuums them).
+    """
+    before = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    candidates = inactive_projects(db, before, limit)
+    report = {
+        "candidates": candidates,
+        "archived": [],
+        "failed": [],
+        "frames": 0,
+        "components": 0,
+        "revisions": 0,
+        "hot_bytes": 0,
+        "archive_bytes": 0,
+    }
+    if dry_run:
+        return report
+
+    for project_id in candidates:
+        try:
+            summary = archive_project(db, project_id)
+        except Exception:
+            db.rollback()
+            logger.error("Archiving project %d failed", project_id, exc_info=True)
+            report["failed"].append(project_id)
+            continue
+        if summary is None:
+            continue
+        report["archived"].append(project_id)
+        for key in ("frames", "components", "revisions", "hot_bytes", "archive_bytes"):
+            report[key] += summary[key]
+    return report
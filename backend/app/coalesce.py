@@ -0,0 +1,159 @@
+"""
+Single-flight coalescing of identical concurrent reads
+
+When a project is shared, every open client refreshes the same frames
+right after an edit. Only the first of those identical requests runs;
+requests arriving while it is in flight wait for it and get a copy of its
+response, so the herd costs one set of queries and one serialization.
+
+Requests are identical when they have the same method, path, query
+string and the request headers a response depends on (``VARY_HEADERS``).
+Only GET and HEAD requests under ``paths`` are coalesced, and nothing is
+kept once a flight lands, so responses are never older than a request
+already running:
+
+* every completed write starts a new epoch and requests only join
+  flights of the current one, so a read sent after a write has returned
+  never gets a response that was being built before it;
+* clients pinned to the primary after a write only share flights with
+  other pinned clients, since unpinned flights may read a lagging replica.
+
+The shared request runs in its own task, so it carries on if the client
+that started it disconnects. Each waiter is sent its own copy of the
+response messages, so per-request headers added further out (request
+ids, CORS) stay per request. Flights are per process.
+"""
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import get_settings
+from app.database import router, scope_client_key
+
+READ_METHODS = ("GET", "HEAD")
+# Request headers that change the response of a read
+VARY_HEADERS = (b"accept", b"accept-encoding", b"if-none-match", b"if-modified-since", b"range")
+
+
+class RequestCoalescer:
+    """In-flight reads by key and deduplication counters"""
+
+    def __init__(self, paths: list[str], is_pinned: Optional[Callable[[str], bool]] = None):
+        self.paths = tuple(path.rstrip("/") for path in paths)
+        self.is_pinned = is_pinned or (lambda client: False)
+        self.epoch = 0
+        # key -> (task running the first request, requests sharing it)
+        self._flights: dict[tuple, list] = {}
+
+        self.requests = 0
+        self.executed = 0
+        self.coalesced = 0
+        self.max_shared = 0
+
+    def matches(self, method: str, path: str) -> bool:
+        """Whether requests to ``method path`` may be coalesced"""
+        return method in READ_METHODS and any(
+            path == prefix or path.startswith(prefix + "/") for prefix in self.paths
+        )
+
+    def key(self, scope: Scope) -> tuple:
+        """Identity of a request: what it asks for and what it may be answered with"""
+        headers = tuple(sorted((name, value) for name, value in scope.get("headers", []) if name in VARY_HEADERS))
+        pinned = self.is_pinned(scope_client_key(scope))
+        return (self.epoch, pinned, scope["method"], scope["path"], scope.get("query_string", b""), headers)
+
+    def wrote(self) -> None:
+        """A write finished; later reads must not share earlier flights"""
+        self.epoch += 1
+
+    async def fetch(self, key: tuple, run: Callable[[], Awaitable[list[Message]]]) -> list[Message]:
+        """Response of the flight for ``key``, starting it if there is none"""
+        self.requests += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            task = asyncio.ensure_future(run())
+            flight = self._flights[key] = [task, 1]
+            self.executed += 1
+            task.add_done_callback(lambda _: self._flights.pop(key, None))
+        else:
+            flight[1] += 1
+            self.coalesced += 1
+            self.max_shared = max(self.max_shared, flight[1])
+        # A waiter that disconnects doesn't cancel the others' response
+        return await asyncio.shield(flight[0])
+
+    def metrics(self) -> dict:
+        """Requests seen, run and deduplicated"""
+        return {
+            "requests": self.requests,
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._flights),
+            "max_shared": self.max_shared,
+            "dedup_ratio": self.coalesced / self.requests if self.requests else 0.0,
+        }
+
+
+class CoalescingMiddleware:
+    """ASGI middleware applying a ``RequestCoalescer`` to /api requests"""
+
+    def __init__(self, app: ASGIApp, coalescer: RequestCoalescer):
+        self.app = app
+        self.coalescer = coalescer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope.get("path", "").startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        if method == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        if method not in READ_METHODS:
+            async def send_after_write(message: Message) -> None:
+                # Before the client can see the response and send its next read
+                if message["type"] == "http.response.start":
+                    self.coalescer.wrote()
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_after_write)
+            finally:
+                self.coalescer.wrote()
+            return
+        if not self.coalescer.matches(method, scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        messages = await self.coalescer.fetch(self.coalescer.key(scope), lambda: self._capture(scope))
+        for message in messages:
+            # Outer middlewares (CORS, request ids) edit the headers in place
+            if "headers" in message:
+                message = {**message, "headers": list(message["headers"])}
+            await send(dict(message))
+
+    async def _capture(self, scope: Scope) -> list[Message]:
+        """Run the request and collect its response messages"""
+        messages: list[Message] = []
+        requested = False
+
+        async def receive() -> Message:
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            # Reads have no body; a shared request never sees a disconnect
+            return await asyncio.get_running_loop().create_future()
+
+        async def send(message: Message) -> None:
+            messages.append(message)
+
+        await self.app(scope, receive, send)
+        return messages
+
+
+settings = get_settings()
+
+request_coalescer = RequestCoalescer(paths=settings.COALESCE_PATHS, is_pinned=router.is_pinned)
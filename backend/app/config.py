@@ -23,6 +23,15 @@ class Settings(BaseSettings):
 
     # Log Level
     LOG_LEVEL: str = "DEBUG"
+    LOG_FORMAT: str = "json"  # json, text
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_ERROR_BURST: int = 5
+    LOG_ERROR_WINDOW_SECONDS: float = 60.0
+
+    # Database backend: postgresql, or sqlite for local and single-user deployments
+    DB_BACKEND: str = "postgresql"
+    # SQLite database file; relative paths are resolved against backend/
+    SQLITE_PATH: str = "data/ps-ui.db"
 
     # Database
     DB_HOST: str = "aidev-pgvector-dev.crkgaskg6o61.ap-northeast-2.rds.amazonaws.com"
@@ -31,17 +40,88 @@ class Settings(BaseSettings):
     DB_PORT: int = 5432
     DB_NAME: str = "PS-UI-test3"
 
+    # Read replicas ("host" or "host:port"); empty means everything uses the primary
+    DB_REPLICA_HOSTS: list[str] = []
+    # How long a client reads from the primary after it writes
+    DB_READ_YOUR_WRITES_SECONDS: float = 5.0
+
+    # Write-behind buffer for drag position updates
+    WRITE_BEHIND_FLUSH_INTERVAL_MS: int = 100
+    WRITE_BEHIND_MAX_PENDING: int = 50000
+    # A drag without a final flush=true is recorded as a revision after this long without updates
+    WRITE_BEHIND_SETTLE_MS: int = 1000
+
+    # Tile pyramid: tile side at zoom 0 in world units, aggregation raster per tile,
+    # shapes listed individually up to TILE_DETAIL_LIMIT per tile
+    TILE_WORLD_SIZE: float = 65536.0
+    TILE_MAX_ZOOM: int = 20
+    TILE_GRID: int = 32
+    TILE_DETAIL_LIMIT: int = 256
+    TILE_CACHE_FRAMES: int = 8
+    TILE_CACHE_TILES_PER_FRAME: int = 4096
+
+    # Frame thumbnails: side in pixels, render processes (0 renders in the request thread)
+    THUMBNAIL_SIZE: int = 256
+    THUMBNAIL_WORKERS: int = 2
+    THUMBNAIL_CACHE_ENTRIES: int = 1024
+    THUMBNAIL_TIMEOUT_SECONDS: float = 10.0
+
+    # Cold storage: archive projects untouched for this many days
+    ARCHIVE_AFTER_DAYS: int = 90
+    ARCHIVE_BATCH_LIMIT: int = 100
+
+    # Background jobs; each worker holds a DB connection while it runs a job
+    JOB_WORKERS: int = 2
+    JOB_MAX_QUEUED: int = 100
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0
+    JOB_HEARTBEAT_SECONDS: float = 10.0
+    # A running job whose heartbeat is older than this was orphaned by a dead worker
+    JOB_STALE_SECONDS: float = 60.0
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_EXPORT_DIR: str = "data/exports"
+
+    # Admission control; keep MAX_CONCURRENCY at or below the DB pool size (10 + 20 overflow)
+    ADMISSION_MAX_CONCURRENCY: int = 30
+    ADMISSION_BULK_CONCURRENCY: int = 20
+    ADMISSION_MAX_QUEUE: int = 100
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 2.0
+    ADMISSION_PER_CLIENT: int = 20
+    # "METHOD /path" -> concurrent requests; "METHOD /path/*" also matches sub-paths
+    ADMISSION_ROUTE_LIMITS: dict[str, int] = {"POST /api/components": 10}
+
+    # Identical concurrent GET/HEAD requests under these paths share one response
+    COALESCE_PATHS: list[str] = ["/api/projects", "/api/frames", "/api/components", "/api/search"]
+
     # CORS
     CORS_ORIGINS: list[str] = ["http://localhost:8600"]
 
     @property
     def database_url(self) -> str:
         """Get database URL"""
+        if self.DB_BACKEND == "sqlite":
+            path = Path(self.SQLITE_PATH)
+            if not path.is_absolute():
+                path = Path(__file__).parent.parent / path
+            return f"sqlite:///{path}"
         return (
             f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}"
             f"@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
         )
 
+    @property
+    def replica_database_urls(self) -> list[str]:
+        """Get read replica database URLs"""
+        if self.DB_BACKEND == "sqlite":
+            return []
+        urls = []
+        for replica in self.DB_REPLICA_HOSTS:
+            host, _, port = replica.partition(":")
+            urls.append(
+                f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}"
+                f"@{host}:{port or self.DB_PORT}/{self.DB_NAME}"
+            )
+        return urls
+
 
 @lru_cache()
 def get_settings() -> Settings:
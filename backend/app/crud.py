@@ -1,9 +1,13 @@
 """
 CRUD operations
 """
-from sqlalchemy.orm import Session
-from app import models, schemas
-from typing import List, Optional
+from collections import defaultdict
+
+import numpy as np
+from sqlalchemy import and_, delete, func, select, update
+from sqlalchemy.orm import Session, aliased
+from app import geometry, layout, models, revisions, schemas
+from typing import List, Optional, Sequence
 
 
 # Project CRUD
@@ -52,6 +56,9 @@ def delete_project(db: Session, project_id: int) -> bool:
     if not db_project:
         return False
 
+    # A list rather than a subquery, so the planner can prune partitions
+    frame_ids = db.execute(select(models.Frame.id).where(models.Frame.project_id == project_id)).scalars().all()
+    delete_frame_contents(db, frame_ids)
     db.delete(db_project)
     db.commit()
     return True
@@ -62,6 +69,8 @@ def create_frame(db: Session, frame: schemas.FrameCreate) -> models.Frame:
     """Create a new frame"""
     db_frame = models.Frame(name=frame.name, project_id=frame.project_id)
     db.add(db_frame)
+    db.flush()
+    revisions.record(db, db_frame.id, {"frame": {"name": db_frame.name}})
     db.commit()
     db.refresh(db_frame)
     return db_frame
@@ -88,8 +97,9 @@ def update_frame(
     if not db_frame:
         return None
 
-    if frame_update.name is not None:
+    if frame_update.name is not None and frame_update.name != db_frame.name:
         db_frame.name = frame_update.name
+        revisions.record(db, frame_id, {"frame": {"name": db_frame.name}})
 
     db.commit()
     db.refresh(db_frame)
@@ -102,11 +112,25 @@ def delete_frame(db: Session, frame_id: int) -> bool:
     if not db_frame:
         return False
 
+    delete_frame_contents(db, [frame_id])
     db.delete(db_frame)
     db.commit()
     return True
 
 
+def delete_frame_contents(db: Session, frame_ids: Sequence[int]) -> None:
+    """Delete the components and revisions of frames with set-based DELETEs
+
+    Leaves nothing for the ORM cascade to load and delete row by row. On a
+    partitioned components table the frame filter prunes the DELETE to the
+    partitions holding those frames.
+    """
+    if not frame_ids:
+        return
+    for model in (models.Component, models.FrameRevision):
+        db.execute(delete(model).where(model.frame_id.in_(frame_ids)))
+
+
 # Component CRUD
 def create_component(db: Session, component: schemas.ComponentCreate) -> models.Component:
     """Create a new component"""
@@ -121,6 +145,10 @@ def create_component(db: Session, component: schemas.ComponentCreate) -> models.
         properties=component.properties
     )
     db.add(db_component)
+    db.flush()
+    revisions.record_components(
+        db, {db_component.frame_id: {db_component.id: revisions.component_state(db_component)}}
+    )
     db.commit()
     db.refresh(db_component)
     return db_component
@@ -144,18 +172,12 @@ def update_component(
     if not db_component:
         return None
 
-    if component_update.name is not None:
-        db_component.name = component_update.name
-    if component_update.x is not None:
-        db_component.x = component_update.x
-    if component_update.y is not None:
-        db_component.y = component_update.y
-    if component_update.width is not None:
-        db_component.width = component_update.width
-    if component_update.height is not None:
-        db_component.height = component_update.height
-    if component_update.properties is not None:
-        db_component.properties = component_update.properties
+    changes = {}
+    for field, value in component_update.model_dump(exclude_none=True).items():
+        if getattr(db_component, field) != value:
+            setattr(db_component, field, value)
+            changes[field] = value
+    revisions.record_components(db, {db_component.frame_id: {db_component.id: changes}})
 
     db.commit()
     db.refresh(db_component)
@@ -167,8 +189,354 @@ def delete_component(db: Session, component_id: int) -> bool:
     db_component = get_component(db, component_id)
     if not db_component:
         return False
-    
+
+    frame_id = db_component.frame_id
     db.delete(db_component)
+    db.flush()
+    revisions.record_components(db, {frame_id: {component_id: None}})
     db.commit()
     return True
 
+
+
+# Sparse fieldsets
+# Columns a client may ask for with ``fields=``; ``id`` is always returned.
+PROJECT_FIELDS = ("id", "name", "created_at", "updated_at")
+FRAME_FIELDS = ("id", "project_id", "name", "created_at", "updated_at")
+COMPONENT_FIELDS = (
+    "id", "frame_id", "name", "type", "x", "y", "width", "height", "properties", "created_at", "updated_at"
+)
+PROJECT_INCLUDES = ("frame_count", "frames")
+FRAME_INCLUDES = ("component_count", "components")
+
+
+def _columns(model, fields: Optional[Sequence[str]], default: Sequence[str]):
+    """Selected columns, always starting with the primary key"""
+    names = ["id"] + [name for name in (fields or default) if name != "id"]
+    return [getattr(model, name) for name in names]
+
+
+def get_projects_sparse(
+    db: Session,
+    fields: Optional[Sequence[str]] = None,
+    include: Sequence[str] = (),
+    skip: int = 0,
+    limit: Optional[int] = 100,
+    project_id: Optional[int] = None,
+) -> List[dict]:
+    """Projects with only the requested columns
+
+    ``frame_count`` is computed in the same query with a GROUP BY;
+    ``frames`` embeds frame summaries loaded with one extra query.
+    """
+    p, f = models.Project, models.Frame
+    query = select(*_columns(p, fields, PROJECT_FIELDS))
+    if "frame_count" in include:
+        query = (
+            # Counting the join column lets the count use an index-only scan
+            query.add_columns(func.count(f.project_id).label("frame_count"))
+            .outerjoin(f, f.project_id == p.id)
+            .group_by(p.id)
+        )
+    if project_id is not None:
+        query = query.where(p.id == project_id)
+    query = query.order_by(p.id).offset(skip).limit(limit)
+    rows = [dict(row._mapping) for row in db.execute(query)]
+
+    if "frames" in include and rows:
+        frames = get_frames_sparse(
+            db, fields=("project_id", "name"), include=("component_count",), limit=None,
+            project_ids=[row["id"] for row in rows],
+        )
+        by_project = defaultdict(list)
+        for frame in frames:
+            by_project[frame["project_id"]].append(frame)
+        for row in rows:
+            row["frames"] = by_project.get(row["id"], [])
+    return rows
+
+
+def get_frames_sparse(
+    db: Session,
+    fields: Optional[Sequence[str]] = None,
+    include: Sequence[str] = (),
+    skip: int = 0,
+    limit: Optional[int] = 100,
+    project_id: Optional[int] = None,
+    project_ids: Optional[Sequence[int]] = None,
+    frame_id: Optional[int] = None,
+) -> List[dict]:
+    """Frames with only the requested columns
+
+    ``component_count`` is computed in the same query with a GROUP BY;
+    ``components`` embeds component summaries loaded with one extra query.
+    """
+    f, c = models.Frame, models.Component
+    query = select(*_columns(f, fields, FRAME_FIELDS))
+    if "component_count" in include:
+        query = (
+            query.add_columns(func.count(c.frame_id).label("component_count"))
+            .outerjoin(c, c.frame_id == f.id)
+            .group_by(f.id)
+        )
+    if project_id is not None:
+        query = query.where(f.project_id == project_id)
+    if project_ids is not None:
+        query = query.where(f.project_id.in_(project_ids))
+    if frame_id is not None:
+        query = query.where(f.id == frame_id)
+    query = query.order_by(f.id).offset(skip).limit(limit)
+    rows = [dict(row._mapping) for row in db.execute(query)]
+
+    if "components" in include and rows:
+        components = get_components_sparse(
+            db, fields=("frame_id", "name", "type"), frame_ids=[row["id"] for row in rows]
+        )
+        by_frame = defaultdict(list)
+        for component in components:
+            by_frame[component["frame_id"]].append(component)
+        for row in rows:
+            row["components"] = by_frame.get(row["id"], [])
+    return rows
+
+
+def get_components_sparse(
+    db: Session,
+    fields: Optional[Sequence[str]] = None,
+    frame_ids: Optional[Sequence[int]] = None,
+    component_id: Optional[int] = None,
+) -> List[dict]:
+    """Components with only the requested columns"""
+    c = models.Component
+    query = select(*_columns(c, fields, COMPONENT_FIELDS))
+    if frame_ids is not None:
+        query = query.where(c.frame_id.in_(frame_ids))
+    if component_id is not None:
+        query = query.where(c.id == component_id)
+    return [dict(row._mapping) for row in db.execute(query.order_by(c.id))]
+
+
+# Bulk geometry
+# Component x/y are the shape's center, so edges are x -/+ width/2 and
+# y -/+ height/2. Connections take their geometry from their endpoints and
+# are left alone.
+def _selection_filter(selection: schemas.ComponentSelection, component=models.Component):
+    """Build the WHERE clause for a bulk selection"""
+    clauses = [component.type != "connection"]
+    if selection.frame_id is not None:
+        clauses.append(component.frame_id == selection.frame_id)
+    if selection.component_ids is not None:
+        clauses.append(component.id.in_(selection.component_ids))
+    return and_(*clauses)
+
+
+def _bulk_update(db: Session, selection: schemas.ComponentSelection, values: dict) -> int:
+    """Run one set-based UPDATE over the selection"""
+    result = db.execute(
+        update(models.Component)
+        .where(_selection_filter(selection))
+        .values(values)
+        .execution_options(synchronize_session=False)
+    )
+    revisions.record_geometry(db, _selection_filter(selection))
+    db.commit()
+    return result.rowcount
+
+
+def translate_components(db: Session, request: schemas.TranslateRequest) -> int:
+    """Move the selection by dx/dy"""
+    c = models.Component
+    return _bulk_update(db, request, {c.x: c.x + request.dx, c.y: c.y + request.dy})
+
+
+def scale_components(db: Session, request: schemas.ScaleRequest) -> int:
+    """Scale positions and sizes of the selection around a pivot"""
+    c = models.Component
+    pivot_x, pivot_y = request.pivot_x, request.pivot_y
+    if pivot_x is None or pivot_y is None:
+        bounds = db.execute(
+            select(
+                func.min(c.x - c.width / 2), func.max(c.x + c.width / 2),
+                func.min(c.y - c.height / 2), func.max(c.y + c.height / 2),
+            ).where(_selection_filter(request))
+        ).one()
+        if bounds[0] is None:
+            return 0
+        if pivot_x is None:
+            pivot_x = (bounds[0] + bounds[1]) / 2
+        if pivot_y is None:
+            pivot_y = (bounds[2] + bounds[3]) / 2
+
+    return _bulk_update(db, request, {
+        c.x: pivot_x + (c.x - pivot_x) * request.scale_x,
+        c.y: pivot_y + (c.y - pivot_y) * request.scale_y,
+        c.width: c.width * abs(request.scale_x),
+        c.height: c.height * abs(request.scale_y),
+    })
+
+
+def align_components(db: Session, request: schemas.AlignRequest) -> int:
+    """Align the selection to an edge of its bounding box
+
+    The bounding box is computed by scalar subqueries inside the UPDATE
+    itself, so the whole operation is a single statement.
+    """
+    c = models.Component
+    inner = aliased(models.Component)
+    where = _selection_filter(request, inner)
+
+    def bound(expr):
+        return select(expr).where(where).scalar_subquery()
+
+    left = bound(func.min(inner.x - inner.width / 2))
+    right = bound(func.max(inner.x + inner.width / 2))
+    bottom = bound(func.min(inner.y - inner.height / 2))
+    top = bound(func.max(inner.y + inner.height / 2))
+
+    values = {
+        "left": {c.x: left + c.width / 2},
+        "right": {c.x: right - c.width / 2},
+        "bottom": {c.y: bottom + c.height / 2},
+        "top": {c.y: top - c.height / 2},
+        "center_x": {c.x: (left + right) / 2},
+        "center_y": {c.y: (bottom + top) / 2},
+    }[request.edge]
+    return _bulk_update(db, request, values)
+
+
+def distribute_components(db: Session, request: schemas.DistributeRequest) -> int:
+    """Space the selection so the gaps between neighbours are equal
+
+    The outermost shapes stay put. Positions are computed from one SELECT
+    and written back with a single executemany UPDATE.
+    """
+    c = models.Component
+    if request.axis == "horizontal":
+        pos_col, size_col = c.x, c.width
+    else:
+        pos_col, size_col = c.y, c.height
+
+    rows = db.execute(
+        select(c.id, pos_col, size_col)
+        .where(_selection_filter(request))
+        .order_by(pos_col, c.id)
+    ).all()
+    if len(rows) < 3:
+        return 0
+
+    start = min(pos - size / 2 for _, pos, size in rows)
+    end = max(pos + size / 2 for _, pos, size in rows)
+    total_size = sum(size for _, _, size in rows)
+    gap = (end - start - total_size) / (len(rows) - 1)
+
+    key = pos_col.key
+    params = []
+    cursor = start
+    for component_id, _, size in rows:
+        params.append({"id": component_id, key: cursor + size / 2})
+        cursor += size + gap
+
+    return _bulk_write(db, params, frame_id=request.frame_id)
+
+
+def _bulk_write(db: Session, params: list[dict], frame_id: Optional[int] = None) -> int:
+    """Write per-component values with one executemany UPDATE by primary key
+
+    With ``frame_id`` every row is also matched on its frame, which
+    prunes the UPDATE to one partition of a partitioned components table.
+    """
+    if params:
+        c = models.Component
+        statement, where = update(c), c.id.in_([p["id"] for p in params])
+        if frame_id is not None:
+            statement = statement.where(c.frame_id == frame_id).execution_options(synchronize_session=None)
+            where = and_(c.frame_id == frame_id, where)
+        db.execute(statement, params)
+        revisions.record_geometry(db, where)
+        db.commit()
+    return len(params)
+
+
+# Overlaps
+def get_frame_overlaps(db: Session, frame_id: int) -> list[tuple[int, int]]:
+    """Find all pairs of overlapping shapes in a frame"""
+    c = models.Component
+    rows = db.execute(
+        select(c.id, c.x, c.y, c.width, c.height)
+        .where(c.frame_id == frame_id, c.type != "connection")
+    ).all()
+    if len(rows) < 2:
+        return []
+    ids = [row.id for row in rows]
+    x, y, width, height = (np.array(column, dtype=float) for column in list(zip(*rows))[1:])
+    return geometry.find_overlaps(ids, x, y, width, height)
+
+
+def find_overlapping_components(
+    db: Session,
+    frame_id: int,
+    x: float,
+    y: float,
+    width: float,
+    height: float,
+    exclude_id: Optional[int] = None,
+) -> List[int]:
+    """Ids of shapes in a frame whose boxes intersect the given box"""
+    c = models.Component
+    left, bottom, right, top = (float(v) for v in geometry.bounds(x, y, width, height))
+    query = select(c.id).where(
+        c.frame_id == frame_id,
+        c.type != "connection",
+        c.x - func.abs(c.width) / 2 < right,
+        c.x + func.abs(c.width) / 2 > left,
+        c.y - func.abs(c.height) / 2 < top,
+        c.y + func.abs(c.height) / 2 > bottom,
+    ).order_by(c.id)
+    if exclude_id is not None:
+        query = query.where(c.id != exclude_id)
+    return list(db.execute(query).scalars().all())
+
+
+# Layout
+def layout_frame(db: Session, frame_id: int, request: schemas.LayoutRequest) -> int:
+    """Lay out a frame's shapes along its connections and store the result
+
+    The new layout is centered on the centroid of the old positions so the
+    shapes stay roughly where the camera already is.
+    """
+    c = models.Component
+    nodes = db.execute(
+        select(c.id, c.x, c.y).where(c.frame_id == frame_id, c.type != "connection").order_by(c.id)
+    ).all()
+    if not nodes:
+        return 0
+    connections = db.execute(
+        select(c.properties).where(c.frame_id == frame_id, c.type == "connection")
+    ).scalars().all()
+
+    node_ids = [row.id for row in nodes]
+    old_x = np.array([row.x or 0.0 for row in nodes])
+    old_y = np.array([row.y or 0.0 for row in nodes])
+    edges = layout.edge_index(node_ids, [
+        (props.get("sourceId"), props.get("targetId"))
+        for props in connections if props
+    ])
+
+    if request.algorithm == "force":
+        new_x, new_y = layout.force_layout(
+            len(node_ids), edges,
+            spacing=request.spacing_x,
+            iterations=request.iterations,
+            seed=request.seed,
+        )
+    else:
+        new_x, new_y = layout.layered_layout(
+            len(node_ids), edges, spacing_x=request.spacing_x, spacing_y=request.spacing_y
+        )
+    new_x = new_x - new_x.mean() + old_x.mean()
+    new_y = new_y - new_y.mean() + old_y.mean()
+
+    return _bulk_write(db, [
+        {"id": node_id, "x": x, "y": y}
+        for node_id, x, y in zip(node_ids, new_x.tolist(), new_y.tolist())
+    ], frame_id=frame_id)
@@ -1,23 +1,135 @@
 """
 Database connection and session management
 """
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+import itertools
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from fastapi import Depends, Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from starlette.types import Scope
 from app.config import get_settings
 
 settings = get_settings()
 
-engine = create_engine(
-    settings.database_url,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20
+# Applied to every SQLite connection
+SQLITE_PRAGMAS = (
+    ("journal_mode", "WAL"),  # readers don't block the writer
+    ("synchronous", "NORMAL"),  # no fsync per commit; a power loss may drop the last commits
+    ("foreign_keys", "ON"),
+    ("busy_timeout", "5000"),  # wait up to 5s for the write lock instead of failing
+    ("cache_size", "-65536"),  # 64 MiB page cache
+    ("temp_store", "MEMORY"),
+    ("mmap_size", str(256 * 1024 * 1024)),
 )
 
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS:
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+    # SQLite's lower() only folds ASCII; name search lowercases queries with
+    # str.lower. Deterministic, so it can back the name_key indexes. Under its
+    # own name so other clients of the file fail on those indexes instead of
+    # computing the keys differently.
+    dbapi_connection.create_function(
+        "name_fold", 1, lambda value: value.lower() if isinstance(value, str) else value, deterministic=True
+    )
+
+
+def create_database_engine(url: str) -> Engine:
+    """Create an engine with the settings of its backend
+
+    SQLite engines get the pragmas above and may be shared across the
+    threadpool; the database file's directory is created if needed.
+    """
+    if make_url(url).get_backend_name() == "sqlite":
+        database = make_url(url).database
+        if database and database != ":memory:":
+            Path(database).parent.mkdir(parents=True, exist_ok=True)
+        sqlite_engine = create_engine(url, connect_args={"check_same_thread": False})
+        event.listen(sqlite_engine, "connect", _set_sqlite_pragmas)
+        return sqlite_engine
+    return create_engine(url, pool_pre_ping=True, pool_size=10, max_overflow=20)
+
+
+engine = create_database_engine(settings.database_url)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+CLIENT_ID_HEADER = "X-Client-ID"
+
+
+class SessionRouter:
+    """Route read-only sessions to replicas
+
+    Writes always go to the primary. A client that has just written is
+    pinned to the primary for ``pin_seconds`` so it reads its own writes
+    even if the replicas lag behind.
+    """
+
+    def __init__(self, replica_urls: list[str], pin_seconds: float):
+        self.pin_seconds = pin_seconds
+        self.replica_engines = [create_database_engine(url) for url in replica_urls]
+        self._replica_sessions = [
+            sessionmaker(autocommit=False, autoflush=False, bind=replica)
+            for replica in self.replica_engines
+        ]
+        self._next_replica = itertools.cycle(range(len(self._replica_sessions)))
+        self._pins: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def has_replicas(self) -> bool:
+        """Whether any replica is configured"""
+        return bool(self._replica_sessions)
+
+    def pin(self, client_key: str) -> None:
+        """Send ``client_key``'s reads to the primary for a while"""
+        now = time.monotonic()
+        with self._lock:
+            self._pins[client_key] = now + self.pin_seconds
+            if len(self._pins) > 10000:
+                self._pins = {k: v for k, v in self._pins.items() if v > now}
+
+    def is_pinned(self, client_key: str) -> bool:
+        """Whether ``client_key`` wrote recently"""
+        until = self._pins.get(client_key)
+        return until is not None and until > time.monotonic()
+
+    def replica_session(self, client_key: str) -> Optional[Session]:
+        """Open a replica session, or None if the primary must be used"""
+        if not self.has_replicas or self.is_pinned(client_key):
+            return None
+        with self._lock:
+            index = next(self._next_replica)
+        return self._replica_sessions[index]()
+
+
+router = SessionRouter(settings.replica_database_urls, settings.DB_READ_YOUR_WRITES_SECONDS)
+
+
+def client_key(request: Request) -> str:
+    """Identify the client for read-your-writes pinning"""
+    return scope_client_key(request.scope)
+
+
+def scope_client_key(scope: Scope) -> str:
+    """``client_key`` of an ASGI scope: the X-Client-ID header or the client host"""
+    header = CLIENT_ID_HEADER.lower().encode("latin-1")
+    for name, value in scope.get("headers", []):
+        if name == header and value:
+            return value.decode("latin-1")
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
 
 def get_db():
     """Get database session"""
@@ -27,3 +139,18 @@ def get_db():
     finally:
         db.close()
 
+
+def get_read_db(request: Request, db: Session = Depends(get_db)):
+    """Get database session for read-only endpoints
+
+    Uses a replica when one is configured and the client has not written
+    recently; otherwise falls back to the primary session.
+    """
+    replica_db = router.replica_session(client_key(request))
+    if replica_db is None:
+        yield db
+        return
+    try:
+        yield replica_db
+    finally:
+        replica_db.close()
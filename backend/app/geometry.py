@@ -0,0 +1,89 @@
+"""
+Bounding box geometry for frame components
+
+Component ``x``/``y`` are the shape's center, so a box spans
+``x +/- width/2`` and ``y +/- height/2``. Boxes that merely touch do not
+overlap.
+"""
+import numpy as np
+
+
+def bounds(x, y, width, height) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Left, bottom, right and top edges of center-based boxes"""
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    half_w = np.abs(np.asarray(width, dtype=float)) / 2
+    half_h = np.abs(np.asarray(height, dtype=float)) / 2
+    return x - half_w, y - half_h, x + half_w, y + half_h
+
+
+def find_overlaps(ids, x, y, width, height, max_cells_per_box: int = 64) -> list[tuple[int, int]]:
+    """Find all pairs of intersecting boxes
+
+    Uses a uniform grid sized to the typical box: each box is bucketed
+    into the cells it covers, candidate pairs come only from shared
+    cells, and each pair is reported once from the cell holding the
+    corner of its intersection. With reasonably sized boxes this is
+    O(n log n + k) for k overlapping pairs. Pairs are returned as
+    ``(smaller id, larger id)`` sorted ascending.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    n = len(ids)
+    if n < 2:
+        return []
+    left, bottom, right, top = bounds(x, y, width, height)
+
+    # Cells about the size of the larger boxes keep per-box cell counts small
+    extent = np.maximum(right - left, top - bottom)
+    cell = max(float(np.percentile(extent, 90)), 1e-9)
+    cx0 = np.floor(left / cell).astype(np.int64)
+    cy0 = np.floor(bottom / cell).astype(np.int64)
+    cx1 = np.floor(right / cell).astype(np.int64)
+    cy1 = np.floor(top / cell).astype(np.int64)
+    span_x = cx1 - cx0 + 1
+    span_y = cy1 - cy0 + 1
+
+    # Boxes covering many cells (a background panel, say) are compared
+    # against everything directly instead of flooding the grid
+    counts = span_x * span_y
+    large = np.flatnonzero(counts > max_cells_per_box)
+    pairs_a, pairs_b = [], []
+    for i in large.tolist():
+        hit = (left[i] < right) & (left < right[i]) & (bottom[i] < top) & (bottom < top[i])
+        hit[i] = False
+        # Large-large pairs are reported from the lower index only
+        hit[large[large < i]] = False
+        pairs_a.append(np.full(int(hit.sum()), i))
+        pairs_b.append(np.flatnonzero(hit))
+    counts[large] = 0
+
+    # One (cell, box) entry per covered cell
+    box = np.repeat(np.arange(n), counts)
+    offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    ex = cx0[box] + offset % span_x[box]
+    ey = cy0[box] + offset // span_x[box]
+
+    order = np.lexsort((box, ey, ex))
+    box, ex, ey = box[order], ex[order], ey[order]
+
+    for step in range(1, len(box)):
+        same = (ex[step:] == ex[:-step]) & (ey[step:] == ey[:-step])
+        if not same.any():
+            break
+        a, b = box[:-step][same], box[step:][same]
+        cell_x, cell_y = ex[step:][same], ey[step:][same]
+
+        hit = (left[a] < right[b]) & (left[b] < right[a]) & (bottom[a] < top[b]) & (bottom[b] < top[a])
+        # Report each pair only from the cell containing its intersection's corner
+        corner_x = np.floor(np.maximum(left[a], left[b]) / cell).astype(np.int64)
+        corner_y = np.floor(np.maximum(bottom[a], bottom[b]) / cell).astype(np.int64)
+        hit &= (corner_x == cell_x) & (corner_y == cell_y)
+        pairs_a.append(a[hit])
+        pairs_b.append(b[hit])
+
+    if not pairs_a:
+        return []
+    a = ids[np.concatenate(pairs_a)]
+    b = ids[np.concatenate(pairs_b)]
+    lo, hi = np.minimum(a, b), np.maximum(a, b)
+    order = np.lexsort((hi, lo))
+    return list(zip(lo[order].tolist(), hi[order].tolist()))
@@ -0,0 +1,527 @@
+"""
+Background jobs for long-running project operations
+
+Deleting, cloning, exporting or re-laying-out a big project takes far
+longer than a request should. These operations are submitted as jobs
+instead: the ``jobs`` row is both the queue entry and the status record,
+and a bounded pool of ``workers`` threads runs queued jobs oldest first.
+
+* Jobs are claimed with a conditional UPDATE, so several processes can
+  share the table without running a job twice.
+* Handlers report progress between steps, which is also where a
+  cancellation takes effect. Cancelling a queued job is immediate.
+* Handlers commit one step at a time, together with a checkpoint in
+  ``jobs.state``. The owning process heartbeats its running jobs; if it
+  dies, the heartbeat goes stale, the job is queued again (up to
+  ``max_attempts`` runs) and the handler resumes from the checkpoint. On
+  a clean shutdown running jobs stop at their next progress report and
+  go back to the queue without using up an attempt.
+"""
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app import archive, crud, models, revisions, schemas
+from app.config import get_settings
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler whose job was cancelled"""
+
+
+class JobInterrupted(Exception):
+    """Raised inside a handler when the runner shuts down"""
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already queued"""
+
+
+# kind -> handler(db, job) returning the job result
+HANDLERS: dict[str, Callable[[Session, "JobContext"], Optional[dict]]] = {}
+
+
+def handler(kind: str):
+    """Register a job handler for ``kind``"""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobContext:
+    """The running job as seen by its handler"""
+
+    def __init__(self, runner: "JobRunner", job_id: int, params: dict, state: Optional[dict]):
+        self.runner = runner
+        self.id = job_id
+        self.params = params
+        self.state = state
+
+    def progress(self, done: int, total: int, message: Optional[str] = None) -> None:
+        """Record progress; raises if the job should stop here
+
+        Call between steps, outside an open write transaction.
+        """
+        if self.runner.stopping:
+            raise JobInterrupted()
+        j = models.Job
+        with self.runner.session_factory() as db:
+            db.execute(update(j).where(j.id == self.id).values(
+                progress=min(done / total, 1.0) if total else 0.0,
+                message=message,
+                heartbeat_at=_now(),
+            ))
+            cancel = db.execute(select(j.cancel_requested).where(j.id == self.id)).scalar()
+            db.commit()
+        if cancel:
+            raise JobCancelled()
+
+    def save_state(self, db: Session, state: dict) -> None:
+        """Checkpoint in the handler's transaction; commit it with the step it describes"""
+        self.state = state
+        db.execute(update(models.Job).where(models.Job.id == self.id).values(state=state))
+
+
+class JobRunner:
+    """Bounded pool of worker threads running jobs from the ``jobs`` table"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        workers: int,
+        max_queued: int,
+        poll_interval: float,
+        heartbeat_interval: float,
+        stale_after: float,
+        max_attempts: int,
+        export_dir: Path,
+    ):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.max_queued = max_queued
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self.export_dir = export_dir
+
+        self._running: set[int] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop.is_set()
+
+    def export_path(self, job_id: int) -> Path:
+        """File an export job writes to"""
+        return self.export_dir / f"job-{job_id}.json.gz"
+
+    def submit(self, db: Session, kind: str, params: dict) -> models.Job:
+        """Queue a job; raises ``JobQueueFull`` past ``max_queued``"""
+        if kind not in HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        j = models.Job
+        queued = db.execute(select(func.count(j.id)).where(j.status == QUEUED)).scalar()
+        if queued >= self.max_queued:
+            raise JobQueueFull(f"{queued} jobs already queued")
+        job = models.Job(kind=kind, params=params, status=QUEUED, progress=0.0,
+                         cancel_requested=False, attempts=0)
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        self._wake.set()
+        return job
+
+    def cancel(self, db: Session, job_id: int) -> Optional[models.Job]:
+        """Cancel a job: queued jobs at once, running ones at their next progress report"""
+        j = models.Job
+        db.execute(
+            update(j).where(j.id == job_id, j.status.in_((QUEUED, RUNNING))).values(cancel_requested=True)
+        )
+        db.execute(
+            update(j).where(j.id == job_id, j.status == QUEUED).values(status=CANCELLED, finished_at=_now())
+        )
+        db.commit()
+        return db.get(j, job_id)
+
+    def claim(self) -> Optional[int]:
+        """Mark the oldest queued job as running and return its id"""
+        j = models.Job
+        with self.session_factory() as db:
+            while True:
+                job_id = db.execute(
+                    select(j.id).where(j.status == QUEUED).order_by(j.id).limit(1)
+                ).scalar()
+                if job_id is None:
+                    return None
+                now = _now()
+                claimed = db.execute(
+                    update(j).where(j.id == job_id, j.status == QUEUED).values(
+                        status=RUNNING,
+                        attempts=j.attempts + 1,
+                        started_at=func.coalesce(j.started_at, now),
+                        heartbeat_at=now,
+                        message=None,
+                    )
+                ).rowcount
+                db.commit()
+                if claimed:
+                    return job_id
+                # Another process got there first; try the next one
+
+    def run(self, job_id: int) -> None:
+        """Run a claimed job in the calling thread and record the outcome"""
+        with self._lock:
+            self._running.add(job_id)
+        db = self.session_factory()
+        try:
+            job = db.get(models.Job, job_id)
+            run_handler = HANDLERS.get(job.kind)
+            if run_handler is None:
+                raise ValueError(f"Unknown job kind: {job.kind}")
+            context = JobContext(self, job_id, dict(job.params or {}), job.state)
+            db.commit()
+            result = run_handler(db, context)
+            db.commit()
+            self._finish(job_id, SUCCEEDED, result=result, progress=1.0, message=None)
+        except JobCancelled:
+            db.rollback()
+            logger.info("Job %d cancelled", job_id)
+            self._finish(job_id, CANCELLED)
+        except JobInterrupted:
+            db.rollback()
+            self._requeue(job_id)
+        except Exception as exc:
+            db.rollback()
+            logger.error("Job %d failed", job_id, exc_info=True)
+            self._finish(job_id, FAILED, error=str(exc) or type(exc).__name__)
+        finally:
+            db.close()
+            with self._lock:
+                self._running.discard(job_id)
+            self._wake.set()
+
+    def run_once(self) -> Optional[int]:
+        """Claim and run the next queued job in the calling thread"""
+        job_id = self.claim()
+        if job_id is not None:
+            self.run(job_id)
+        return job_id
+
+    def _finish(self, job_id: int, status: str, **values) -> None:
+        j = models.Job
+        with self.session_factory() as db:
+            db.execute(
+                update(j).where(j.id == job_id, j.status == RUNNING)
+                .values(status=status, finished_at=_now(), **values)
+            )
+            db.commit()
+
+    def _requeue(self, job_id: int) -> None:
+        """Put an interrupted job back in the queue without using up an attempt"""
+        j = models.Job
+        with self.session_factory() as db:
+            db.execute(
+                update(j).where(j.id == job_id, j.status == RUNNING)
+                .values(status=QUEUED, attempts=j.attempts - 1, message="Interrupted by shutdown")
+            )
+            db.commit()
+        logger.info("Job %d interrupted, queued again", job_id)
+
+    def recover(self) -> int:
+        """Queue again running jobs whose worker stopped heartbeating
+
+        Jobs that already used ``max_attempts`` runs fail instead.
+        Returns how many jobs were queued again.
+        """
+        j = models.Job
+        stale = (j.status == RUNNING) & (j.heartbeat_at < _now() - timedelta(seconds=self.stale_after))
+        with self.session_factory() as db:
+            failed = db.execute(
+                update(j).where(stale, j.attempts >= self.max_attempts)
+                .values(status=FAILED, error="Worker lost too many times", finished_at=_now())
+            ).rowcount
+            requeued = db.execute(
+                update(j).where(stale).values(status=QUEUED, message="Worker lost, queued again")
+            ).rowcount
+            db.commit()
+        if failed or requeued:
+            logger.warning("Recovered orphaned jobs: %d queued again, %d failed", requeued, failed)
+        return requeued
+
+    def _heartbeat(self) -> None:
+        with self._lock:
+            running = list(self._running)
+        if not running:
+            return
+        j = models.Job
+        with self.session_factory() as db:
+            db.execute(update(j).where(j.id.in_(running), j.status == RUNNING).values(heartbeat_at=_now()))
+            db.commit()
+
+    def start(self) -> None:
+        """Start the dispatcher and the worker pool"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="job-worker")
+        self._thread = threading.Thread(target=self._dispatch, name="job-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop taking jobs and wait for running ones to reach a progress report"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _dispatch(self) -> None:
+        last_heartbeat = 0.0
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() - last_heartbeat >= self.heartbeat_interval:
+                    self._heartbeat()
+                    self.recover()
+                    last_heartbeat = time.monotonic()
+                while not self._stop.is_set():
+                    with self._lock:
+                        if len(self._running) >= self.workers:
+                            break
+                    job_id = self.claim()
+                    if job_id is None:
+                        break
+                    with self._lock:
+                        # Reserve the worker before the thread picks the job up
+                        self._running.add(job_id)
+                    self._executor.submit(self.run, job_id)
+            except Exception:  # retried on the next tick
+                logger.error("Job dispatch failed", exc_info=True)
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def metrics(self, db: Session) -> dict:
+        """Worker usage and jobs per status"""
+        j = models.Job
+        statuses = dict(db.execute(select(j.status, func.count(j.id)).group_by(j.status)).all())
+        with self._lock:
+            running = len(self._running)
+        return {"workers": self.workers, "running": running, "statuses": statuses}
+
+
+# Handlers
+def _hot_project(db: Session, project_id: int) -> models.Project:
+    """The project with its frames in the hot tables"""
+    archive.rehydrate(db, project_id)
+    project = crud.get_project(db, project_id)
+    if project is None:
+        raise LookupError("Project not found")
+    return project
+
+
+def _frame_ids(db: Session, project_id: int) -> list[int]:
+    f = models.Frame
+    return db.execute(select(f.id).where(f.project_id == project_id).order_by(f.id)).scalars().all()
+
+
+@handler("delete_project")
+def delete_project(db: Session, job: JobContext) -> dict:
+    """Delete a project one frame per transaction
+
+    Archived frames go with the project row. A cancelled delete keeps the
+    frames it hadn't reached yet.
+    """
+    project_id = job.params["project_id"]
+    frame_ids = _frame_ids(db, project_id)
+    f = models.Frame
+    for done, frame_id in enumerate(frame_ids):
+        job.progress(done, len(frame_ids), f"Deleting frame {done + 1} of {len(frame_ids)}")
+        crud.delete_frame_contents(db, [frame_id])
+        db.execute(delete(f).where(f.id == frame_id))
+        db.commit()
+    crud.delete_project(db, project_id)
+    return {"project_id": project_id, "frames": len(frame_ids)}
+
+
+def _remap(properties: Optional[dict], ids: dict[int, int]) -> Optional[dict]:
+    """Connection properties pointing at the copied shapes"""
+    if not properties:
+        return properties
+    properties = dict(properties)
+    for key in ("sourceId", "targetId"):
+        if properties.get(key) in ids:
+            properties[key] = ids[properties[key]]
+    return properties
+
+
+def _clone_frame(db: Session, frame_id: int, project_id: int) -> int:
+    """Copy a frame and its components into ``project_id``; returns the copy's id"""
+    c = models.Component.__table__
+    fields = revisions.COMPONENT_FIELDS
+    name = db.execute(select(models.Frame.name).where(models.Frame.id == frame_id)).scalar_one()
+    frame = models.Frame(project_id=project_id, name=name)
+    db.add(frame)
+    db.flush()
+
+    rows = db.execute(
+        select(c.c.id, *(c.c[field] for field in fields)).where(c.c.frame_id == frame_id).order_by(c.c.id)
+    ).all()
+    shapes = [row for row in rows if row.type != "connection"]
+    connections = [row for row in rows if row.type == "connection"]
+    ids: dict[int, int] = {}
+    if shapes:
+        # Connections reference shape ids, so shapes go first and return their new ids in order
+        new_ids = db.execute(
+            insert(c).returning(c.c.id, sort_by_parameter_order=True),
+            [{"frame_id": frame.id, **{field: getattr(row, field) for field in fields}} for row in shapes],
+        ).scalars().all()
+        ids = dict(zip((row.id for row in shapes), new_ids))
+    if connections:
+        db.execute(insert(c), [
+            {
+                "frame_id": frame.id,
+                **{field: getattr(row, field) for field in fields},
+                "properties": _remap(row.properties, ids),
+            }
+            for row in connections
+        ])
+    revisions.record(db, frame.id, revisions.diff(
+        {"frame": {}, "components": {}}, revisions.current_state(db, frame.id)
+    ))
+    return frame.id
+
+
+@handler("clone_project")
+def clone_project(db: Session, job: JobContext) -> dict:
+    """Copy a project one frame per transaction
+
+    A cancelled clone keeps the frames copied so far.
+    """
+    source_id = job.params["project_id"]
+    source = _hot_project(db, source_id)
+    state = job.state
+    if state is None:
+        clone = models.Project(name=job.params.get("name") or f"{source.name} (copy)")
+        db.add(clone)
+        db.flush()
+        state = {"project_id": clone.id, "frames": {}}
+        job.save_state(db, state)
+        db.commit()
+
+    frame_ids = _frame_ids(db, source_id)
+    for done, frame_id in enumerate(frame_ids):
+        job.progress(done, len(frame_ids), f"Copying frame {done + 1} of {len(frame_ids)}")
+        if str(frame_id) in state["frames"]:
+            continue
+        state["frames"][str(frame_id)] = _clone_frame(db, frame_id, state["project_id"])
+        job.save_state(db, state)
+        db.commit()
+    return {"project_id": state["project_id"], "frames": len(frame_ids)}
+
+
+@handler("export_project")
+def export_project(db: Session, job: JobContext) -> dict:
+    """Write a project and its components to a gzipped JSON file
+
+    The file is written under a temporary name and renamed when complete;
+    a resumed export starts over.
+    """
+    project_id = job.params["project_id"]
+    project = _hot_project(db, project_id)
+    frame_ids = _frame_ids(db, project_id)
+    path = job.runner.export_path(job.id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix(".partial")
+
+    components = 0
+    try:
+        with gzip.open(partial, "wt", encoding="utf-8") as out:
+            out.write('{"project":%s,"frames":[' % json.dumps({"id": project.id, "name": project.name}))
+            for done, frame_id in enumerate(frame_ids):
+                job.progress(done, len(frame_ids), f"Exporting frame {done + 1} of {len(frame_ids)}")
+                state = revisions.current_state(db, frame_id)
+                items = revisions.state_components(state)
+                frame = {"id": frame_id, "name": state["frame"]["name"], "components": items}
+                out.write(("," if done else "") + json.dumps(frame, separators=(",", ":")))
+                components += len(items)
+            out.write("]}")
+        os.replace(partial, path)
+    finally:
+        # Left behind if the job was cancelled, interrupted or failed
+        partial.unlink(missing_ok=True)
+    return {
+        "project_id": project_id,
+        "frames": len(frame_ids),
+        "components": components,
+        "bytes": path.stat().st_size,
+    }
+
+
+@handler("layout_project")
+def layout_project(db: Session, job: JobContext) -> dict:
+    """Lay out every frame of a project, one frame per transaction"""
+    project_id = job.params["project_id"]
+    request = schemas.LayoutRequest(**job.params.get("layout", {}))
+    _hot_project(db, project_id)
+    state = job.state or {"frames": []}
+
+    frame_ids = _frame_ids(db, project_id)
+    for done, frame_id in enumerate(frame_ids):
+        job.progress(done, len(frame_ids), f"Laying out frame {done + 1} of {len(frame_ids)}")
+        if frame_id in state["frames"]:
+            continue
+        state["frames"].append(frame_id)
+        # Committed by layout_frame together with the new positions
+        job.save_state(db, state)
+        crud.layout_frame(db, frame_id, request)
+        db.commit()
+    return {"project_id": project_id, "frames": len(frame_ids)}
+
+
+settings = get_settings()
+
+_export_dir = Path(settings.JOB_EXPORT_DIR)
+if not _export_dir.is_absolute():
+    _export_dir = Path(__file__).parent.parent / _export_dir
+
+job_runner = JobRunner(
+    SessionLocal,
+    workers=settings.JOB_WORKERS,
+    max_queued=settings.JOB_MAX_QUEUED,
+    poll_interval=settings.JOB_POLL_INTERVAL_SECONDS,
+    heartbeat_interval=settings.JOB_HEARTBEAT_SECONDS,
+    stale_after=settings.JOB_STALE_SECONDS,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+    export_dir=_export_dir,
+)
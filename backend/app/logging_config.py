@@ -0,0 +1,196 @@
+"""
+Logging configuration
+
+Log records are pushed onto a bounded in-memory queue by the request
+threads and written out by a single background listener thread, so log
+I/O (and traceback formatting) stays off the request path.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.config import Settings
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "request_id", default=None
+)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RESERVED_ATTRS = frozenset(
+    vars(logging.LogRecord("", 0, "", 0, "", None, None)).keys()
+) | {"message", "asctime", "request_id"}
+
+
+def new_request_id() -> str:
+    """Generate a new request id"""
+    return uuid.uuid4().hex
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request id to every record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class ErrorSamplingFilter(logging.Filter):
+    """Rate-limit repeated error records
+
+    Records at ERROR and above are keyed by logger, message template and
+    exception type. Each key may emit ``burst`` records per ``window``
+    seconds; the rest are dropped and the number dropped is reported on
+    the next record that gets through for that key.
+    """
+
+    def __init__(self, burst: int = 5, window: float = 60.0):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._lock = threading.Lock()
+        self._state: dict[tuple, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.ERROR or self.burst <= 0:
+            return True
+
+        exc_type = record.exc_info[0].__name__ if record.exc_info and record.exc_info[0] else None
+        key = (record.name, record.msg, exc_type)
+        now = time.monotonic()
+
+        with self._lock:
+            state = self._state.get(key)
+            if state is None or now - state[0] >= self.window:
+                # [window start, emitted in window, suppressed since last emit]
+                suppressed = state[2] if state else 0
+                state = [now, 0, suppressed]
+                self._state[key] = state
+                if len(self._state) > 1024:
+                    self._evict(now)
+
+            if state[1] >= self.burst:
+                state[2] += 1
+                return False
+
+            state[1] += 1
+            if state[2]:
+                record.suppressed = state[2]
+                state[2] = 0
+        return True
+
+    def _evict(self, now: float) -> None:
+        """Drop keys whose window has expired"""
+        expired = [k for k, v in self._state.items() if now - v[0] >= self.window and not v[2]]
+        for k in expired:
+            del self._state[k]
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_type"] = record.exc_info[0].__name__ if record.exc_info[0] else None
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that never blocks and defers formatting
+
+    The stock ``QueueHandler.prepare`` formats the record (including the
+    traceback) on the calling thread. Here only the message is merged so
+    that mutable args can't change underneath us; the traceback is
+    formatted by the listener thread. When the queue is full the record is
+    dropped and counted instead of blocking the request.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(settings: Settings) -> None:
+    """Install the queue-based logging pipeline on the root logger
+
+    Safe to call more than once; an existing listener is stopped and
+    replaced.
+    """
+    global _listener  # pylint: disable=global-statement
+
+    level = getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO)
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if settings.LOG_FORMAT.lower() == "json":
+        stream_handler.setFormatter(JSONFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"
+        ))
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+    queue_handler.addFilter(RequestIdFilter())
+    queue_handler.addFilter(ErrorSamplingFilter(
+        burst=settings.LOG_ERROR_BURST, window=settings.LOG_ERROR_WINDOW_SECONDS
+    ))
+
+    if _listener is not None:
+        _listener.stop()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(
+        queue_handler.queue, stream_handler, respect_handler_level=True
+    )
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread"""
+    global _listener  # pylint: disable=global-statement
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -3,21 +3,32 @@ Main FastAPI application
 """
 import logging
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Optional
 
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 from sqlalchemy.orm import Session
 
-from app import crud, schemas, models
-from app.database import get_db, engine
+from app import archive, crud, schemas, models, revisions, search
+from app.admission import AdmissionMiddleware, admission_controller
+from app.coalesce import CoalescingMiddleware, request_coalescer
+from app.database import client_key, engine, get_db, get_read_db, router
+from app.jobs import JobQueueFull, job_runner
 from app.config import get_settings
+from app.logging_config import REQUEST_ID_HEADER, new_request_id, request_id_var, setup_logging
+from app.static_files import CachedIndex, PrecompressedStaticFiles, accepted_encodings, etag_matches
+from app.thumbnails import FORMATS as THUMBNAIL_FORMATS, ThumbnailTimeout, thumbnail_service
+from app.tiles import tile_cache
+from app.write_behind import WriteBehindFull, position_buffer
+
+settings = get_settings()
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG)
+setup_logging(settings)
 logger = logging.getLogger(__name__)
 
 # Create tables
@@ -25,16 +36,40 @@ try:
     models.Base.metadata.create_all(bind=engine)
     logger.info("Database tables created/verified successfully")
 except Exception as e:
-    logger.error(f"Failed to create database tables: {str(e)}", exc_info=True)
+    logger.error("Failed to create database tables: %s", e, exc_info=True)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """Run the background workers while the app is up
+
+    Starts flushing buffered position updates and running jobs, including
+    ones left by a previous process. On shutdown pending positions are
+    flushed, running jobs handed back to the queue and the thumbnail
+    render processes shut down.
+    """
+    position_buffer.start()
+    job_runner.start()
+    try:
+        yield
+    finally:
+        position_buffer.stop()
+        job_runner.stop()
+        thumbnail_service.stop()
 
-settings = get_settings()
 
 app = FastAPI(
     title="Plant Simulation UI API",
     description="Backend API for Plant Simulation UI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
+# Admission control; added before CORS so rejections still get CORS headers
+app.add_middleware(AdmissionMiddleware, controller=admission_controller)
+# Outside admission control: requests waiting on another's response don't take a slot
+app.add_middleware(CoalescingMiddleware, coalescer=request_coalescer)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -46,6 +81,33 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    """Tag each request with an id used to correlate its log records"""
+    request_id = request.headers.get(REQUEST_ID_HEADER) or new_request_id()
+    # Not reset afterwards: the server runs each request in its own task, and
+    # the global exception handler runs outside this middleware but still
+    # needs the id.
+    request_id_var.set(request_id)
+    request.state.request_id = request_id
+    response = await call_next(request)
+    response.headers[REQUEST_ID_HEADER] = request_id
+    return response
+
+
+@app.middleware("http")
+async def read_your_writes_middleware(request: Request, call_next):
+    """Pin a client to the primary database for a while after it writes"""
+    response = await call_next(request)
+    if (
+        router.has_replicas
+        and request.method not in ("GET", "HEAD", "OPTIONS")
+        and response.status_code < 400
+    ):
+        router.pin(client_key(request))
+    return response
+
+
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
@@ -55,43 +117,136 @@ async def health_check():
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """Global exception handler to ensure CORS headers are always sent"""
-    logger.error(f"Unhandled exception: {str(exc)}", exc_info=True)
-    from fastapi.responses import JSONResponse
+    logger.error(
+        "Unhandled exception: %s", exc, exc_info=exc,
+        extra={"method": request.method, "path": request.url.path},
+    )
     return JSONResponse(
         status_code=500,
         content={"detail": f"Internal server error: {str(exc)}"},
         headers={
             "Access-Control-Allow-Origin": settings.CORS_ORIGINS[0] if settings.CORS_ORIGINS else "*",
             "Access-Control-Allow-Credentials": "true",
+            REQUEST_ID_HEADER: getattr(request.state, "request_id", "") or "",
         }
     )
 
 
+# Cold storage
+# Endpoints that read or change an archived project's frames depend on one
+# of these, so the project is rehydrated before the endpoint's own session
+# is chosen; the client is pinned to the primary until replicas catch up.
+def rehydrate_project(request: Request, project_id: Optional[int] = None, db: Session = Depends(get_db)) -> None:
+    """Rehydrate an archived project"""
+    if project_id is not None and archive.rehydrate(db, project_id):
+        router.pin(client_key(request))
+
+
+def rehydrate_frame(request: Request, frame_id: int, db: Session = Depends(get_db)) -> None:
+    """Rehydrate the archived project owning a frame"""
+    if archive.rehydrate_frame(db, frame_id):
+        router.pin(client_key(request))
+
+
+def rehydrate_component(request: Request, component_id: int, db: Session = Depends(get_db)) -> None:
+    """Rehydrate the archived project owning a component"""
+    if archive.rehydrate_components(db, [component_id]):
+        router.pin(client_key(request))
+
+
+def rehydrate_selection(request: Request, selection: schemas.ComponentSelection, db: Session) -> None:
+    """Rehydrate the archived projects a bulk selection refers to"""
+    rehydrated = selection.frame_id is not None and archive.rehydrate_frame(db, selection.frame_id)
+    if archive.rehydrate_components(db, selection.component_ids or []) or rehydrated:
+        router.pin(client_key(request))
+
+
 # Project endpoints
 @app.post("/api/projects", response_model=schemas.ProjectResponse)
 def create_project(project: schemas.ProjectCreate, db: Session = Depends(get_db)):
     """Create a new project"""
     try:
-        logger.info(f"Creating project with name: {project.name}")
+        logger.info("Creating project with name: %s", project.name)
         result = crud.create_project(db=db, project=project)
-        logger.info(f"Project created successfully with id: {result.id}")
+        logger.info("Project created successfully with id: %s", result.id)
         return result
     except Exception as e:
-        logger.error(f"Failed to create project: {str(e)}", exc_info=True)
+        logger.error("Failed to create project: %s", e, exc_info=True)
         db.rollback()
         raise HTTPException(status_code=500, detail=f"프로젝트 생성 중 오류가 발생했습니다: {str(e)}")
 
 
+def parse_fieldset(value: Optional[str], allowed: tuple, name: str) -> Optional[list[str]]:
+    """Parse a comma-separated fields/include parameter"""
+    if value is None:
+        return None
+    items = [item.strip() for item in value.split(",") if item.strip()]
+    unknown = sorted(set(items) - set(allowed))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown {name}: {', '.join(unknown)}")
+    return items
+
+
+def sparse_response(content) -> JSONResponse:
+    """Return sparse rows as-is, bypassing the full response model"""
+    return JSONResponse(content=jsonable_encoder(content))
+
+
 @app.get("/api/projects", response_model=list[schemas.ProjectResponse])
-def read_projects(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Get all projects"""
+def read_projects(
+    skip: int = 0,
+    limit: int = 100,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Get all projects
+
+    ``fields`` selects columns and ``include`` adds ``frame_count`` or
+    embedded ``frames`` summaries; either switches to a sparse response.
+    """
+    if fields is not None or include is not None:
+        return sparse_response(crud.get_projects_sparse(
+            db=db,
+            fields=parse_fieldset(fields, crud.PROJECT_FIELDS, "fields"),
+            include=parse_fieldset(include, crud.PROJECT_INCLUDES, "include") or (),
+            skip=skip,
+            limit=limit,
+        ))
     projects = crud.get_projects(db=db, skip=skip, limit=limit)
     return projects
 
 
-@app.get("/api/projects/{project_id}", response_model=schemas.ProjectResponse)
-def read_project(project_id: int, db: Session = Depends(get_db)):
+@app.get("/api/projects/summary", response_model=list[schemas.ProjectSummary])
+def read_project_summaries(skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
+    """Get project names with frame counts"""
+    return crud.get_projects_sparse(
+        db=db, fields=("name",), include=("frame_count",), skip=skip, limit=limit
+    )
+
+
+@app.get(
+    "/api/projects/{project_id}",
+    response_model=schemas.ProjectResponse,
+    dependencies=[Depends(rehydrate_project)],
+)
+def read_project(
+    project_id: int,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
     """Get project by ID"""
+    if fields is not None or include is not None:
+        rows = crud.get_projects_sparse(
+            db=db,
+            fields=parse_fieldset(fields, crud.PROJECT_FIELDS, "fields"),
+            include=parse_fieldset(include, crud.PROJECT_INCLUDES, "include") or (),
+            project_id=project_id,
+        )
+        if not rows:
+            raise HTTPException(status_code=404, detail="Project not found")
+        return sparse_response(rows[0])
     project = crud.get_project(db=db, project_id=project_id)
     if project is None:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -116,30 +271,145 @@ def delete_project(project_id: int, db: Session = Depends(get_db)):
     return {"message": "Project deleted successfully"}
 
 
+@app.post("/api/projects/archive", response_model=schemas.ArchiveRunResult)
+def archive_inactive_projects(
+    older_than_days: int = settings.ARCHIVE_AFTER_DAYS,
+    limit: int = settings.ARCHIVE_BATCH_LIMIT,
+    dry_run: bool = False,
+    db: Session = Depends(get_db)
+):
+    """Archive projects untouched for older_than_days and report the space reclaimed"""
+    return archive.archive_inactive(db=db, older_than_days=older_than_days, limit=limit, dry_run=dry_run)
+
+
+@app.post("/api/projects/{project_id}/archive", response_model=schemas.ProjectArchiveResult)
+def archive_project(project_id: int, db: Session = Depends(get_db)):
+    """Move a project's frames and components to cold storage"""
+    result = archive.archive_project(db=db, project_id=project_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return result
+
+
+# Search endpoint
+@app.get("/api/search", response_model=schemas.SearchResponse)
+def search_names(
+    q: str,
+    kinds: Optional[str] = None,
+    project_id: Optional[int] = None,
+    offset: int = 0,
+    limit: int = 20,
+    db: Session = Depends(get_read_db)
+):
+    """Find projects, frames and components by name
+
+    Exact matches rank first, then prefix, then substring matches (3+
+    characters). ``kinds`` restricts the result to some of ``project``,
+    ``frame`` and ``component``; ``project_id`` to one project.
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q must not be blank")
+    if not 1 <= limit <= search.MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {search.MAX_LIMIT}")
+    if not 0 <= offset <= search.MAX_OFFSET:
+        raise HTTPException(status_code=400, detail=f"offset must be between 0 and {search.MAX_OFFSET}")
+    return search.search(
+        db=db,
+        query=q,
+        kinds=parse_fieldset(kinds, search.KINDS, "kinds"),
+        project_id=project_id,
+        offset=offset,
+        limit=limit,
+    )
+
+
 # Frame endpoints
 @app.post("/api/frames", response_model=schemas.FrameResponse)
 def create_frame(frame: schemas.FrameCreate, db: Session = Depends(get_db)):
     """Create a new frame"""
+    archive.rehydrate(db, frame.project_id)
     return crud.create_frame(db=db, frame=frame)
 
 
-@app.get("/api/frames", response_model=list[schemas.FrameResponse])
-def read_frames(skip: int = 0, limit: int = 100, project_id: Optional[int] = None, db: Session = Depends(get_db)):
-    """Get all frames, optionally filtered by project_id"""
+@app.get(
+    "/api/frames",
+    response_model=list[schemas.FrameResponse],
+    dependencies=[Depends(rehydrate_project)],
+)
+def read_frames(
+    skip: int = 0,
+    limit: int = 100,
+    project_id: Optional[int] = None,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Get all frames, optionally filtered by project_id
+
+    ``fields`` selects columns and ``include`` adds ``component_count`` or
+    embedded ``components`` summaries; either switches to a sparse response.
+    """
+    if fields is not None or include is not None:
+        return sparse_response(crud.get_frames_sparse(
+            db=db,
+            fields=parse_fieldset(fields, crud.FRAME_FIELDS, "fields"),
+            include=parse_fieldset(include, crud.FRAME_INCLUDES, "include") or (),
+            skip=skip,
+            limit=limit,
+            project_id=project_id,
+        ))
     frames = crud.get_frames(db=db, skip=skip, limit=limit, project_id=project_id)
     return frames
 
 
-@app.get("/api/frames/{frame_id}", response_model=schemas.FrameResponse)
-def read_frame(frame_id: int, db: Session = Depends(get_db)):
+@app.get(
+    "/api/frames/summary",
+    response_model=list[schemas.FrameSummary],
+    dependencies=[Depends(rehydrate_project)],
+)
+def read_frame_summaries(
+    skip: int = 0, limit: int = 100, project_id: Optional[int] = None, db: Session = Depends(get_read_db)
+):
+    """Get frame names with component counts"""
+    return crud.get_frames_sparse(
+        db=db, fields=("project_id", "name"), include=("component_count",),
+        skip=skip, limit=limit, project_id=project_id,
+    )
+
+
+@app.get(
+    "/api/frames/{frame_id}",
+    response_model=schemas.FrameResponse,
+    dependencies=[Depends(rehydrate_frame)],
+)
+def read_frame(
+    frame_id: int,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
     """Get frame by ID"""
+    if fields is not None or include is not None:
+        rows = crud.get_frames_sparse(
+            db=db,
+            fields=parse_fieldset(fields, crud.FRAME_FIELDS, "fields"),
+            include=parse_fieldset(include, crud.FRAME_INCLUDES, "include") or (),
+            frame_id=frame_id,
+        )
+        if not rows:
+            raise HTTPException(status_code=404, detail="Frame not found")
+        return sparse_response(rows[0])
     frame = crud.get_frame(db=db, frame_id=frame_id)
     if frame is None:
         raise HTTPException(status_code=404, detail="Frame not found")
     return frame
 
 
-@app.put("/api/frames/{frame_id}", response_model=schemas.FrameResponse)
+@app.put(
+    "/api/frames/{frame_id}",
+    response_model=schemas.FrameResponse,
+    dependencies=[Depends(rehydrate_frame)],
+)
 def update_frame(frame_id: int, frame_update: schemas.FrameUpdate, db: Session = Depends(get_db)):
     """Update frame"""
     frame = crud.update_frame(db=db, frame_id=frame_id, frame_update=frame_update)
@@ -148,7 +418,7 @@ def update_frame(frame_id: int, frame_update: schemas.FrameUpdate, db: Session =
     return frame
 
 
-@app.delete("/api/frames/{frame_id}")
+@app.delete("/api/frames/{frame_id}", dependencies=[Depends(rehydrate_frame)])
 def delete_frame(frame_id: int, db: Session = Depends(get_db)):
     """Delete frame"""
     success = crud.delete_frame(db=db, frame_id=frame_id)
@@ -157,43 +427,276 @@ def delete_frame(frame_id: int, db: Session = Depends(get_db)):
     return {"message": "Frame deleted successfully"}
 
 
+@app.post(
+    "/api/frames/{frame_id}/layout",
+    response_model=schemas.BulkGeometryResult,
+    dependencies=[Depends(rehydrate_frame)],
+)
+def layout_frame(frame_id: int, request: schemas.LayoutRequest, db: Session = Depends(get_db)):
+    """Automatically lay out a frame's components along their connections"""
+    frame = crud.get_frame(db=db, frame_id=frame_id)
+    if frame is None:
+        raise HTTPException(status_code=404, detail="Frame not found")
+    return {"updated": crud.layout_frame(db=db, frame_id=frame_id, request=request)}
+
+
+@app.get(
+    "/api/frames/{frame_id}/overlaps",
+    response_model=schemas.OverlapResponse,
+    dependencies=[Depends(rehydrate_frame)],
+)
+def read_frame_overlaps(frame_id: int, db: Session = Depends(get_read_db)):
+    """Find overlapping components in a frame"""
+    frame = crud.get_frame(db=db, frame_id=frame_id)
+    if frame is None:
+        raise HTTPException(status_code=404, detail="Frame not found")
+    pairs = crud.get_frame_overlaps(db=db, frame_id=frame_id)
+    return {"frame_id": frame_id, "count": len(pairs), "pairs": pairs}
+
+
+# Tile endpoints
+@app.get("/api/frames/{frame_id}/tiles/{z}/{x}/{y}", dependencies=[Depends(rehydrate_frame)])
+def read_frame_tile(
+    frame_id: int,
+    z: int,
+    x: int,
+    y: int,
+    request: Request,
+    db: Session = Depends(get_read_db)
+):
+    """Get one tile of a frame's zoom pyramid
+
+    Sparse tiles list their shapes, busy ones aggregate them into counted
+    cells. The ETag changes with every write to the frame.
+    """
+    if not 0 <= z <= settings.TILE_MAX_ZOOM:
+        raise HTTPException(status_code=400, detail=f"z must be between 0 and {settings.TILE_MAX_ZOOM}")
+    if not (-2**31 <= x < 2**31 and -2**31 <= y < 2**31):
+        raise HTTPException(status_code=400, detail="Tile coordinates out of range")
+    if crud.get_frame(db=db, frame_id=frame_id) is None:
+        raise HTTPException(status_code=404, detail="Frame not found")
+
+    revision = revisions.latest_revision(db, frame_id)
+    etag = f'"{frame_id}-{revision}-{z}-{x}-{y}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match", ""), [etag]):
+        return Response(status_code=304, headers=headers)
+
+    _, body, gzipped = tile_cache.get(db, frame_id, z, x, y, revision=revision)
+    if gzipped is not None and "gzip" in accepted_encodings(request.headers):
+        body, headers["Content-Encoding"] = gzipped, "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/api/metrics/tiles", response_model=schemas.TileCacheMetrics)
+def read_tile_metrics():
+    """Hit rate and size of the tile cache"""
+    return tile_cache.metrics()
+
+
+# Thumbnail endpoints
+@app.get("/api/frames/{frame_id}/thumbnail", dependencies=[Depends(rehydrate_frame)])
+def read_frame_thumbnail(
+    frame_id: int,
+    request: Request,
+    format: str = "png",  # pylint: disable=redefined-builtin
+    db: Session = Depends(get_read_db)
+):
+    """Get a small PNG or SVG preview of a frame
+
+    The ETag changes with every write to the frame; a stale thumbnail is
+    rendered again on the next request.
+    """
+    if format not in THUMBNAIL_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(THUMBNAIL_FORMATS)}")
+    if crud.get_frame(db=db, frame_id=frame_id) is None:
+        raise HTTPException(status_code=404, detail="Frame not found")
+
+    revision = revisions.latest_revision(db, frame_id)
+    etag = f'"{frame_id}-{revision}-thumbnail-{format}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match", ""), [etag]):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        _, image = thumbnail_service.get(db, frame_id, format, revision=revision)
+    except ThumbnailTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"}) from e
+    return Response(content=image, media_type=THUMBNAIL_FORMATS[format], headers=headers)
+
+
+@app.get("/api/metrics/thumbnails", response_model=schemas.ThumbnailMetrics)
+def read_thumbnail_metrics():
+    """Hit rate of the thumbnail cache and render time"""
+    return thumbnail_service.metrics()
+
+
+# Revision endpoints
+@app.get(
+    "/api/frames/{frame_id}/revisions",
+    response_model=list[schemas.RevisionSummary],
+    dependencies=[Depends(rehydrate_frame)],
+)
+def read_frame_revisions(frame_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
+    """List revisions of a frame, newest first"""
+    frame = crud.get_frame(db=db, frame_id=frame_id)
+    if frame is None:
+        raise HTTPException(status_code=404, detail="Frame not found")
+    return revisions.list_revisions(db, frame_id, skip=skip, limit=limit)
+
+
+@app.get(
+    "/api/frames/{frame_id}/revisions/diff",
+    response_model=schemas.RevisionDiff,
+    dependencies=[Depends(rehydrate_frame)],
+)
+def diff_frame_revisions(
+    frame_id: int, from_revision: int, to_revision: int, db: Session = Depends(get_read_db)
+):
+    """Diff two revisions of a frame"""
+    old = revisions.reconstruct(db, frame_id, from_revision)
+    new = revisions.reconstruct(db, frame_id, to_revision)
+    if old is None or new is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return {
+        "frame_id": frame_id,
+        "from_revision": from_revision,
+        "to_revision": to_revision,
+        **revisions.describe_diff(old, new),
+    }
+
+
+@app.get(
+    "/api/frames/{frame_id}/revisions/{revision}",
+    response_model=schemas.RevisionState,
+    dependencies=[Depends(rehydrate_frame)],
+)
+def read_frame_revision(frame_id: int, revision: int, db: Session = Depends(get_read_db)):
+    """Get the contents of a frame at a revision"""
+    state = revisions.reconstruct(db, frame_id, revision)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return {
+        "frame_id": frame_id,
+        "revision": revision,
+        "name": state["frame"].get("name"),
+        "components": revisions.state_components(state),
+    }
+
+
+@app.post(
+    "/api/frames/{frame_id}/revisions/{revision}/restore",
+    response_model=schemas.RevisionRestoreResult,
+    dependencies=[Depends(rehydrate_frame)],
+)
+def restore_frame_revision(frame_id: int, revision: int, db: Session = Depends(get_db)):
+    """Restore a frame to a revision"""
+    new_revision = revisions.restore(db, frame_id, revision)
+    if new_revision is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return {"frame_id": frame_id, "restored_revision": revision, "revision": new_revision}
+
+
 # Component endpoints
+def check_no_overlaps(
+    db: Session, frame_id: int, component_type: str, box: tuple, exclude_id: Optional[int] = None
+):
+    """Reject a shape whose bounding box would intersect another shape"""
+    if component_type == "connection":
+        return
+    overlaps = crud.find_overlapping_components(db, frame_id, *box, exclude_id=exclude_id)
+    if overlaps:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Component overlaps existing components", "overlaps": overlaps},
+        )
+
+
 @app.post("/api/components", response_model=schemas.ComponentResponse)
-def create_component(component: schemas.ComponentCreate, db: Session = Depends(get_db)):
+def create_component(
+    component: schemas.ComponentCreate,
+    check_overlaps: bool = False,
+    db: Session = Depends(get_db)
+):
     """Create a new component"""
+    archive.rehydrate_frame(db, component.frame_id)
     # Verify frame exists
     frame = crud.get_frame(db=db, frame_id=component.frame_id)
     if frame is None:
         raise HTTPException(status_code=404, detail="Frame not found")
+    if check_overlaps:
+        check_no_overlaps(
+            db, component.frame_id, component.type,
+            (component.x, component.y, component.width, component.height),
+        )
     return crud.create_component(db=db, component=component)
 
 
-@app.get("/api/components/{component_id}", response_model=schemas.ComponentResponse)
-def read_component(component_id: int, db: Session = Depends(get_db)):
+@app.get(
+    "/api/components/{component_id}",
+    response_model=schemas.ComponentResponse,
+    dependencies=[Depends(rehydrate_component)],
+)
+def read_component(component_id: int, fields: Optional[str] = None, db: Session = Depends(get_read_db)):
     """Get component by ID"""
+    if fields is not None:
+        rows = crud.get_components_sparse(
+            db=db,
+            fields=parse_fieldset(fields, crud.COMPONENT_FIELDS, "fields"),
+            component_id=component_id,
+        )
+        if not rows:
+            raise HTTPException(status_code=404, detail="Component not found")
+        return sparse_response(rows[0])
     component = crud.get_component(db=db, component_id=component_id)
     if component is None:
         raise HTTPException(status_code=404, detail="Component not found")
     return component
 
 
-@app.get("/api/frames/{frame_id}/components", response_model=list[schemas.ComponentResponse])
-def read_frame_components(frame_id: int, db: Session = Depends(get_db)):
+@app.get(
+    "/api/frames/{frame_id}/components",
+    response_model=list[schemas.ComponentResponse],
+    dependencies=[Depends(rehydrate_frame)],
+)
+def read_frame_components(frame_id: int, fields: Optional[str] = None, db: Session = Depends(get_read_db)):
     """Get all components for a frame"""
     # Verify frame exists
     frame = crud.get_frame(db=db, frame_id=frame_id)
     if frame is None:
         raise HTTPException(status_code=404, detail="Frame not found")
+    if fields is not None:
+        return sparse_response(crud.get_components_sparse(
+            db=db,
+            fields=parse_fieldset(fields, crud.COMPONENT_FIELDS, "fields"),
+            frame_ids=[frame_id],
+        ))
     return crud.get_components_by_frame(db=db, frame_id=frame_id)
 
 
-@app.put("/api/components/{component_id}", response_model=schemas.ComponentResponse)
+@app.put(
+    "/api/components/{component_id}",
+    response_model=schemas.ComponentResponse,
+    dependencies=[Depends(rehydrate_component)],
+)
 def update_component(
     component_id: int,
     component_update: schemas.ComponentUpdate,
+    check_overlaps: bool = False,
     db: Session = Depends(get_db)
 ):
     """Update component"""
+    if check_overlaps:
+        current = crud.get_component(db=db, component_id=component_id)
+        if current is None:
+            raise HTTPException(status_code=404, detail="Component not found")
+        box = tuple(
+            getattr(component_update, field) if getattr(component_update, field) is not None
+            else getattr(current, field)
+            for field in ("x", "y", "width", "height")
+        )
+        check_no_overlaps(db, current.frame_id, current.type, box, exclude_id=component_id)
+    position_buffer.discard(component_id, component_update.model_dump(exclude_none=True))
     component = crud.update_component(
         db=db, component_id=component_id, component_update=component_update
     )
@@ -202,21 +705,149 @@ def update_component(
     return component
 
 
-@app.delete("/api/components/{component_id}")
+@app.delete("/api/components/{component_id}", dependencies=[Depends(rehydrate_component)])
 def delete_component(component_id: int, db: Session = Depends(get_db)):
     """Delete component"""
+    position_buffer.discard(component_id)
     success = crud.delete_component(db=db, component_id=component_id)
     if not success:
         raise HTTPException(status_code=404, detail="Component not found")
     return {"message": "Component deleted successfully"}
 
 
+# Write-behind position endpoints
+@app.post("/api/components/positions", response_model=schemas.PositionBatchResult, status_code=202)
+def queue_component_positions(batch: schemas.PositionBatch):
+    """Queue drag position updates; flush=true (drag end) commits them and records a revision"""
+    try:
+        accepted = position_buffer.submit([item.model_dump() for item in batch.updates])
+    except WriteBehindFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"}) from e
+    if batch.flush:
+        position_buffer.flush(record=True)
+    return {"accepted": accepted, "flushed": batch.flush}
+
+
+@app.get("/api/metrics/write-behind", response_model=schemas.WriteBehindMetrics)
+def read_write_behind_metrics():
+    """Coalescing ratio and flush latency of the position buffer"""
+    return position_buffer.metrics()
+
+
+@app.get("/api/metrics/admission", response_model=schemas.AdmissionMetrics)
+def read_admission_metrics():
+    """Load, queue depth and rejections of the admission controller"""
+    return admission_controller.metrics()
+
+
+@app.get("/api/metrics/coalescing", response_model=schemas.CoalescingMetrics)
+def read_coalescing_metrics():
+    """How many reads shared another request's response"""
+    return request_coalescer.metrics()
+
+
+# Bulk geometry endpoints
+@app.post("/api/components/bulk/translate", response_model=schemas.BulkGeometryResult)
+def translate_components(http_request: Request, request: schemas.TranslateRequest, db: Session = Depends(get_db)):
+    """Move a selection of components by dx/dy"""
+    rehydrate_selection(http_request, request, db)
+    return {"updated": crud.translate_components(db=db, request=request)}
+
+
+@app.post("/api/components/bulk/scale", response_model=schemas.BulkGeometryResult)
+def scale_components(http_request: Request, request: schemas.ScaleRequest, db: Session = Depends(get_db)):
+    """Scale a selection of components around a pivot"""
+    rehydrate_selection(http_request, request, db)
+    return {"updated": crud.scale_components(db=db, request=request)}
+
+
+@app.post("/api/components/bulk/align", response_model=schemas.BulkGeometryResult)
+def align_components(http_request: Request, request: schemas.AlignRequest, db: Session = Depends(get_db)):
+    """Align a selection of components to an edge"""
+    rehydrate_selection(http_request, request, db)
+    return {"updated": crud.align_components(db=db, request=request)}
+
+
+@app.post("/api/components/bulk/distribute", response_model=schemas.BulkGeometryResult)
+def distribute_components(
+    http_request: Request, request: schemas.DistributeRequest, db: Session = Depends(get_db)
+):
+    """Distribute a selection of components evenly"""
+    rehydrate_selection(http_request, request, db)
+    return {"updated": crud.distribute_components(db=db, request=request)}
+
+
+# Background job endpoints
+@app.post("/api/jobs", response_model=schemas.JobResponse, status_code=202)
+def create_job(request: schemas.JobCreate, db: Session = Depends(get_db)):
+    """Queue a long-running project operation; poll GET /api/jobs/{job_id} for progress"""
+    if crud.get_project(db, request.project_id) is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    params = request.model_dump(exclude={"kind"}, exclude_none=True)
+    try:
+        return job_runner.submit(db, request.kind, params)
+    except JobQueueFull:
+        raise HTTPException(status_code=503, detail="Too many queued jobs, retry later",
+                            headers={"Retry-After": "30"})
+
+
+@app.get("/api/jobs", response_model=list[schemas.JobResponse])
+def read_jobs(status: Optional[str] = None, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    """List jobs, newest first"""
+    query = db.query(models.Job)
+    if status is not None:
+        query = query.filter(models.Job.status == status)
+    return query.order_by(models.Job.id.desc()).offset(skip).limit(limit).all()
+
+
+@app.get("/api/jobs/{job_id}", response_model=schemas.JobResponse)
+def read_job(job_id: int, db: Session = Depends(get_db)):
+    """Get job status and progress"""
+    job = db.get(models.Job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/api/jobs/{job_id}/cancel", response_model=schemas.JobResponse)
+def cancel_job(job_id: int, db: Session = Depends(get_db)):
+    """Cancel a job; a running job stops after its current step"""
+    job = job_runner.cancel(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/api/jobs/{job_id}/download")
+def download_job_result(job_id: int, db: Session = Depends(get_db)):
+    """Download the file written by a finished export job"""
+    job = db.get(models.Job, job_id)
+    if job is None or job.kind != "export_project":
+        raise HTTPException(status_code=404, detail="Export not found")
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Export is {job.status}")
+    path = job_runner.export_path(job_id)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Export not found")
+    return FileResponse(
+        path,
+        media_type="application/gzip",
+        filename=f"project-{job.params['project_id']}.json.gz",
+    )
+
+
+@app.get("/api/metrics/jobs", response_model=schemas.JobMetrics)
+def read_job_metrics(db: Session = Depends(get_db)):
+    """Background job workers in use and jobs per status"""
+    return job_runner.metrics(db)
+
+
 # Serve static files (frontend)
 # Get the path to the frontend build directory
 BASE_DIR = Path(__file__).parent.parent.parent
 FRONTEND_BUILD_DIR = BASE_DIR / "frontend" / "build"
 
-logger.info(f"Checking for frontend build at: {FRONTEND_BUILD_DIR}")
+logger.info("Checking for frontend build at: %s", FRONTEND_BUILD_DIR)
 
 # Mount static files if build directory exists
 if FRONTEND_BUILD_DIR.exists() and (FRONTEND_BUILD_DIR / "index.html").exists():
@@ -225,21 +856,20 @@ if FRONTEND_BUILD_DIR.exists() and (FRONTEND_BUILD_DIR / "index.html").exists():
     # Serve static assets (JS, CSS, images, etc.)
     static_dir = FRONTEND_BUILD_DIR / "static"
     if static_dir.exists():
-        app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
-        logger.info(f"Static files mounted at /static from {static_dir}")
+        app.mount("/static", PrecompressedStaticFiles(directory=str(static_dir)), name="static")
+        logger.info("Static files mounted at /static from %s", static_dir)
     
+    # index.html is read once and served from memory
+    frontend_index = CachedIndex(FRONTEND_BUILD_DIR / "index.html")
+
     # Serve index.html for root and all non-API routes
     @app.get("/")
-    async def serve_root():
+    async def serve_root(request: Request):
         """Serve React app root"""
-        index_path = FRONTEND_BUILD_DIR / "index.html"
-        if index_path.exists():
-            return FileResponse(str(index_path))
-        else:
-            raise HTTPException(status_code=404, detail="Frontend index.html not found")
+        return frontend_index.response(request)
     
     @app.get("/{full_path:path}")
-    async def serve_frontend(full_path: str):
+    async def serve_frontend(full_path: str, request: Request):
         """Serve React app for all non-API routes"""
         # Don't serve frontend for API routes
         if full_path.startswith("api"):
@@ -250,12 +880,11 @@ if FRONTEND_BUILD_DIR.exists() and (FRONTEND_BUILD_DIR / "index.html").exists():
             raise HTTPException(status_code=404, detail="Not found")
         
         # Serve index.html for all other routes (React Router)
-        index_path = FRONTEND_BUILD_DIR / "index.html"
-        if index_path.exists():
-            return FileResponse(str(index_path))
-        else:
-            raise HTTPException(status_code=404, detail="Frontend not built. Run 'npm run build' in frontend directory.")
+        return frontend_index.response(request)
 else:
-    logger.warning(f"Frontend build directory not found at {FRONTEND_BUILD_DIR} or index.html missing. Frontend will not be served.")
-    logger.warning(f"Please run: cd frontend && npm run build")
+    logger.warning(
+        "Frontend build directory not found at %s or index.html missing. Frontend will not be served.",
+        FRONTEND_BUILD_DIR,
+    )
+    logger.warning("Please run: cd frontend && npm run build")
 
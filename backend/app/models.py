@@ -1,11 +1,101 @@
 """
 Database models
 """
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, JSON, DateTime
+from sqlalchemy import (
+    DDL, BigInteger, Boolean, Column, Index, Integer, String, Float, ForeignKey, JSON, DateTime, LargeBinary,
+    UniqueConstraint, event, text
+)
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from sqlalchemy.sql.functions import FunctionElement
 from app.database import Base
 
+def _trigram_available(ddl, target, bind, **kw) -> bool:
+    """Whether the server ships pg_trgm; without it substring search scans"""
+    return bind.dialect.name == "postgresql" and bind.execute(
+        text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+    ).first() is not None
+
+
+# Trigram operator classes for the name search indexes
+event.listen(
+    Base.metadata, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(callable_=_trigram_available),
+)
+
+
+class name_key(FunctionElement):  # pylint: disable=invalid-name
+    """Lowercased name compared bytewise, so prefix ranges and sorting agree on every backend"""
+    type = String()
+    name = "name_key"
+    inherit_cache = True
+
+
+@compiles(name_key)
+def _compile_name_key(element, compiler, **kw):
+    return f"lower({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(name_key, "postgresql")
+def _compile_name_key_postgresql(element, compiler, **kw):
+    return f'lower({compiler.process(element.clauses, **kw)}) COLLATE "C"'
+
+
+class name_lower(FunctionElement):  # pylint: disable=invalid-name
+    """Lowercased name for substring matches"""
+    type = String()
+    name = "name_lower"
+    inherit_cache = True
+
+
+@compiles(name_lower)
+def _compile_name_lower(element, compiler, **kw):
+    return f"lower({compiler.process(element.clauses, **kw)})"
+
+
+# SQLite's lower() only folds ASCII; name_fold is registered on every
+# connection by app.database
+@compiles(name_key, "sqlite")
+@compiles(name_lower, "sqlite")
+def _compile_name_fold_sqlite(element, compiler, **kw):
+    return f"name_fold({compiler.process(element.clauses, **kw)})"
+
+
+def name_search_indexes(table: str, column: Column) -> tuple:
+    """Prefix (b-tree) and substring (trigram, PostgreSQL only) indexes on a name column"""
+    return (
+        Index(f"ix_{table}_name_key", name_key(column)),
+        Index(
+            f"ix_{table}_name_trgm",
+            func.lower(column).label("name_lower"),
+            postgresql_using="gin",
+            postgresql_ops={"name_lower": "gin_trgm_ops"},
+        ).ddl_if(callable_=_trigram_available),
+    )
+
+
+def _rebuild_stale_name_key_indexes(target, connection, **kw) -> None:
+    """Rebuild SQLite name_key indexes created on lower() before name_fold
+
+    create_all leaves the indexes of existing tables alone.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    for table in target.sorted_tables:
+        for index in table.indexes:
+            if not index.name.endswith("_name_key"):
+                continue
+            sql = connection.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = :name"), {"name": index.name}
+            ).scalar()
+            if sql is not None and "name_fold(" not in sql:
+                index.drop(connection)
+                index.create(connection)
+
+
+event.listen(Base.metadata, "after_create", _rebuild_stale_name_key_indexes)
+
 
 class Project(Base):
     """Project model"""
@@ -16,7 +106,10 @@ class Project(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())  # pylint: disable=not-callable
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())  # pylint: disable=not-callable
 
+    __table_args__ = name_search_indexes("projects", name)
+
     frames = relationship("Frame", back_populates="project", cascade="all, delete-orphan")
+    archive = relationship("ProjectArchive", uselist=False, cascade="all, delete-orphan")
 
 
 class Frame(Base):
@@ -29,8 +122,11 @@ class Frame(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())  # pylint: disable=not-callable
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())  # pylint: disable=not-callable
 
+    __table_args__ = name_search_indexes("frames", name)
+
     project = relationship("Project", back_populates="frames")
     components = relationship("Component", back_populates="frame", cascade="all, delete-orphan")
+    revisions = relationship("FrameRevision", back_populates="frame", cascade="all, delete-orphan")
 
 
 class Component(Base):
@@ -38,7 +134,7 @@ class Component(Base):
     __tablename__ = "components"
 
     id = Column(Integer, primary_key=True, index=True)
-    frame_id = Column(Integer, ForeignKey("frames.id"), nullable=False)
+    frame_id = Column(Integer, ForeignKey("frames.id"), nullable=False, index=True)
     name = Column(String, nullable=False)
     type = Column(String, nullable=False)  # circle, triangle, rectangle, connection
     x = Column(Float, default=0.0)
@@ -49,5 +145,99 @@ class Component(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())  # pylint: disable=not-callable
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())  # pylint: disable=not-callable
 
+    __table_args__ = name_search_indexes("components", name)
+
     frame = relationship("Frame", back_populates="components")
 
+
+class FrameRevision(Base):
+    """Frame revision model
+
+    Every committed change to a frame stores a zlib-compressed JSON delta.
+    Some revisions also store a compressed checkpoint of the full frame
+    state so that any revision can be rebuilt from a nearby checkpoint.
+    """
+    __tablename__ = "frame_revisions"
+    __table_args__ = (UniqueConstraint("frame_id", "revision", name="uq_frame_revisions_frame_revision"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    frame_id = Column(Integer, ForeignKey("frames.id"), nullable=False)
+    revision = Column(Integer, nullable=False)
+    delta = Column(LargeBinary, nullable=False)
+    checkpoint = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())  # pylint: disable=not-callable
+
+    frame = relationship("Frame", back_populates="revisions")
+
+
+class ProjectArchive(Base):
+    """Project archive model
+
+    The frames, components and revisions of an inactive project moved out
+    of the hot tables into one zlib-compressed JSON blob. The project row
+    stays behind as a stub. ``hot_bytes`` is the row storage the archive
+    freed in the hot tables.
+    """
+    __tablename__ = "project_archives"
+
+    project_id = Column(Integer, ForeignKey("projects.id"), primary_key=True)
+    payload = Column(LargeBinary, nullable=False)
+    frame_count = Column(Integer, nullable=False)
+    component_count = Column(Integer, nullable=False)
+    revision_count = Column(Integer, nullable=False)
+    hot_bytes = Column(BigInteger, nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())  # pylint: disable=not-callable
+
+    frames = relationship("ArchivedFrame", cascade="all, delete-orphan")
+    components = relationship("ArchivedComponent", cascade="all, delete-orphan")
+
+
+class ArchivedFrame(Base):
+    """Archived frame model
+
+    Maps the id of an archived frame to its project so that requests for
+    the frame can rehydrate the project.
+    """
+    __tablename__ = "archived_frames"
+
+    frame_id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("project_archives.project_id"), nullable=False, index=True)
+
+
+class ArchivedComponent(Base):
+    """Archived component model
+
+    Maps the id of an archived component to its project so that requests
+    for the component by id can rehydrate the project.
+    """
+    __tablename__ = "archived_components"
+
+    component_id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("project_archives.project_id"), nullable=False, index=True)
+
+
+class Job(Base):
+    """Background job model
+
+    ``state`` is the handler's checkpoint, written in the same transaction
+    as the work it describes, so a job picked up again after a restart
+    resumes where it stopped. ``heartbeat_at`` is refreshed while a worker
+    runs the job; a running job whose heartbeat goes stale was orphaned.
+    """
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    params = Column(JSON, nullable=False, default=dict)
+    status = Column(String, nullable=False, default="queued", index=True)
+    progress = Column(Float, nullable=False, default=0.0)
+    message = Column(String, nullable=True)
+    state = Column(JSON, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())  # pylint: disable=not-callable
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,218 @@
+"""
+Hash partitioning of the components table (PostgreSQL only)
+
+With every component in one table, index depth, vacuum and the cost of
+deleting a project grow with the total number of rows. Partitioning
+``components`` by ``HASH (frame_id)`` splits it into a fixed number of
+tables of roughly equal size: queries that filter on ``frame_id`` (all
+per-frame reads and writes in ``crud``) are pruned to one partition with
+shallower indexes, and each partition is vacuumed on its own.
+
+The primary key becomes ``(frame_id, id)`` since PostgreSQL requires the
+partition key in unique constraints; ids still come from the same
+sequence and stay unique. A lookup by id alone probes every partition's
+index, which stays cheap for a few dozen partitions.
+
+An existing table is converted online:
+
+1. ``create_partitioned_table`` creates ``components_partitioned`` with
+   the same columns, defaults and indexes, split into its partitions;
+2. ``install_sync_trigger`` mirrors every later insert, update and delete
+   on ``components`` into it;
+3. ``backfill`` copies the existing rows in id ranges, one short
+   transaction each. Rows are read ``FOR SHARE`` so a row changed or
+   deleted while its batch runs is copied in its final state or not at
+   all; the trigger has already mirrored anything newer. Each batch
+   records the last id it covered in ``components_partition_progress``,
+   so an interrupted backfill resumes where it stopped (the trigger's
+   rows say nothing about that: new rows have the highest ids);
+4. ``swap`` briefly locks ``components``, drops it and renames the new
+   table into its place. Only this step blocks the application.
+
+Rows must not move between frames while the backfill runs; nothing in
+the application moves them.
+"""
+import re
+from typing import Callable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+TABLE = "components"
+NEW_TABLE = "components_partitioned"
+TRIGGER = "components_partition_sync"
+# One row: the highest id the backfill has covered
+PROGRESS_TABLE = "components_partition_progress"
+# Temporary suffix of the new table's indexes until the old ones are gone
+INDEX_SUFFIX = "_new"
+
+
+def is_partitioned(conn: Connection, table: str = TABLE) -> bool:
+    """Whether ``table`` in the current schema is a partitioned table"""
+    return bool(conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"),
+        {"table": table},
+    ).scalar())
+
+
+def partitions(conn: Connection, table: str = TABLE) -> list[str]:
+    """Names of the partitions of ``table``, in creation order"""
+    return list(conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table) ORDER BY c.oid"
+        ),
+        {"table": table},
+    ).scalars())
+
+
+def _secondary_indexes(conn: Connection, table: str) -> list[tuple[str, str]]:
+    """(name, definition after "ON table") of the non-primary-key indexes of ``table``"""
+    rows = conn.execute(
+        text(
+            "SELECT c.relname, pg_get_indexdef(i.indexrelid) FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE i.indrelid = to_regclass(:table) AND NOT i.indisprimary ORDER BY c.relname"
+        ),
+        {"table": table},
+    ).all()
+    # "CREATE INDEX name ON schema.table USING btree (column)" -> "USING btree (column)"
+    pattern = re.compile(r"CREATE (?:UNIQUE )?INDEX \S+ ON (?:ONLY )?\S+ (.*)$")
+    return [(name, pattern.match(ddl).group(1)) for name, ddl in rows]
+
+
+def create_partitioned_table(engine: Engine, count: int) -> None:
+    """Create the empty partitioned copy of ``components`` with ``count`` partitions and its indexes"""
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE TABLE {NEW_TABLE} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING STORAGE, "
+            f"PRIMARY KEY (frame_id, id), FOREIGN KEY (frame_id) REFERENCES frames (id)) "
+            f"PARTITION BY HASH (frame_id)"
+        ))
+        for remainder in range(count):
+            conn.execute(text(
+                f"CREATE TABLE {TABLE}_p{remainder} PARTITION OF {NEW_TABLE} "
+                f"FOR VALUES WITH (MODULUS {count}, REMAINDER {remainder})"
+            ))
+        # Built now, while the table is empty; later the trigger keeps writing to it
+        for name, definition in _secondary_indexes(conn, TABLE):
+            conn.execute(text(f"CREATE INDEX {name}{INDEX_SUFFIX} ON {NEW_TABLE} {definition}"))
+        conn.execute(text(f"CREATE TABLE {PROGRESS_TABLE} (last_id bigint NOT NULL)"))
+        conn.execute(text(f"INSERT INTO {PROGRESS_TABLE} VALUES (0)"))
+
+
+def backfilled_up_to(conn: Connection) -> int:
+    """Highest id of ``components`` the backfill has copied so far"""
+    return conn.execute(text(f"SELECT last_id FROM {PROGRESS_TABLE}")).scalar()
+
+
+def install_sync_trigger(engine: Engine) -> None:
+    """Mirror writes to ``components`` into the partitioned table"""
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE OR REPLACE FUNCTION {TRIGGER}() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    DELETE FROM {NEW_TABLE} WHERE frame_id = OLD.frame_id AND id = OLD.id;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO {NEW_TABLE} SELECT NEW.*;
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """))
+        conn.execute(text(
+            f"CREATE TRIGGER {TRIGGER} AFTER INSERT OR UPDATE OR DELETE ON {TABLE} "
+            f"FOR EACH ROW EXECUTE FUNCTION {TRIGGER}()"
+        ))
+
+
+def backfill(engine: Engine, batch_size: int, start_after: Optional[int] = None,
+             progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """Copy the rows of ``components`` with ids above ``start_after``; returns rows copied
+
+    ``start_after`` defaults to where the previous backfill stopped. Rows
+    inserted after the trigger was installed are already there and are
+    skipped.
+    """
+    with engine.connect() as conn:
+        last_id = conn.execute(text(f"SELECT max(id) FROM {TABLE}")).scalar() or 0
+        if start_after is None:
+            start_after = backfilled_up_to(conn)
+    copied = 0
+    low = start_after
+    while low < last_id:
+        high = min(low + batch_size, last_id)
+        with engine.begin() as conn:
+            copied += conn.execute(
+                text(
+                    f"INSERT INTO {NEW_TABLE} SELECT * FROM {TABLE} WHERE id > :low AND id <= :high "
+                    f"ORDER BY id FOR SHARE ON CONFLICT (frame_id, id) DO NOTHING"
+                ),
+                {"low": low, "high": high},
+            ).rowcount
+            conn.execute(text(f"UPDATE {PROGRESS_TABLE} SET last_id = :high"), {"high": high})
+        low = high
+        if progress is not None:
+            progress(high, last_id)
+    return copied
+
+
+def swap(engine: Engine, lock_timeout_ms: int = 2000) -> None:
+    """Replace ``components`` by the partitioned table
+
+    Gives up with an error (and changes nothing) if the table can't be
+    locked within ``lock_timeout_ms``, e.g. behind a long transaction.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}"))
+        conn.execute(text(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE"))
+        sequence = conn.execute(text(f"SELECT pg_get_serial_sequence('{TABLE}', 'id')")).scalar()
+        indexes = [name for name, _ in _secondary_indexes(conn, TABLE)]
+
+        conn.execute(text(f"DROP TRIGGER {TRIGGER} ON {TABLE}"))
+        conn.execute(text(f"DROP FUNCTION {TRIGGER}()"))
+        conn.execute(text(f"DROP TABLE {PROGRESS_TABLE}"))
+        if sequence is not None:
+            # Owned sequences are dropped with their table
+            conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {NEW_TABLE}.id"))
+        conn.execute(text(f"DROP TABLE {TABLE}"))
+
+        conn.execute(text(f"ALTER TABLE {NEW_TABLE} RENAME TO {TABLE}"))
+        conn.execute(text(f"ALTER TABLE {TABLE} RENAME CONSTRAINT {NEW_TABLE}_pkey TO {TABLE}_pkey"))
+        conn.execute(text(
+            f"ALTER TABLE {TABLE} RENAME CONSTRAINT {NEW_TABLE}_frame_id_fkey TO {TABLE}_frame_id_fkey"
+        ))
+        for name in indexes:
+            conn.execute(text(f"ALTER INDEX {name}{INDEX_SUFFIX} RENAME TO {name}"))
+    # After the lock is released; the partitions have no statistics yet
+    with engine.begin() as conn:
+        conn.execute(text(f"ANALYZE {TABLE}"))
+
+
+def create_index_concurrently(conn: Connection, name: str, table: str, definition: str) -> None:
+    """``CREATE INDEX CONCURRENTLY`` that also works on a partitioned table
+
+    Partitioned tables can't be indexed concurrently, so the index is
+    created on the parent alone (invalid until complete), built
+    concurrently on each partition and attached. ``conn`` must be in
+    autocommit mode.
+    """
+    if not is_partitioned(conn, table):
+        conn.execute(text(f"CREATE INDEX CONCURRENTLY {name} ON {table} {definition}"))
+        return
+    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY {table} {definition}"))
+    for partition in partitions(conn, table):
+        partition_index = f"{partition}_{name}"[:63]
+        valid = conn.execute(
+            text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+            {"name": partition_index},
+        ).scalar()
+        if not valid:
+            if valid is not None:
+                # Left behind by an interrupted run
+                conn.execute(text(f"DROP INDEX CONCURRENTLY {partition_index}"))
+            conn.execute(text(f"CREATE INDEX CONCURRENTLY {partition_index} ON {partition} {definition}"))
+        # Attaching the last partition's index makes the parent's valid
+        conn.execute(text(f"ALTER INDEX {name} ATTACH PARTITION {partition_index}"))
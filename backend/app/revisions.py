@@ -0,0 +1,261 @@
+"""
+Frame revision history
+
+Each committed change to a frame is recorded as a delta::
+
+    {"frame": {"name": ...},                  # only when the frame changed
+     "components": {"<id>": {field: value},   # created or changed fields
+                    "<id>": None}}            # deleted
+
+Every ``CHECKPOINT_INTERVAL`` revisions (and on a frame's first recorded
+revision) the full state after the change is stored as a checkpoint, so
+reconstructing a revision replays at most ``CHECKPOINT_INTERVAL - 1``
+deltas. Deltas and checkpoints are zlib-compressed JSON.
+
+Recording happens inside the caller's transaction; callers commit.
+"""
+import json
+import zlib
+from collections import defaultdict
+from typing import Any, Optional
+
+from sqlalchemy import func, select, text, update
+from sqlalchemy.orm import Session
+
+from app import models
+
+CHECKPOINT_INTERVAL = 50
+
+COMPONENT_FIELDS = ("name", "type", "x", "y", "width", "height", "properties")
+GEOMETRY_FIELDS = ("x", "y", "width", "height")
+
+
+def _pack(data: dict) -> bytes:
+    return zlib.compress(json.dumps(data, separators=(",", ":")).encode())
+
+
+def _unpack(data: bytes) -> dict:
+    return json.loads(zlib.decompress(data))
+
+
+def component_state(component: models.Component) -> dict[str, Any]:
+    """Versioned fields of a component"""
+    return {field: getattr(component, field) for field in COMPONENT_FIELDS}
+
+
+def current_state(db: Session, frame_id: int) -> dict:
+    """Live state of a frame in revision format"""
+    c = models.Component
+    frame_name = db.execute(select(models.Frame.name).where(models.Frame.id == frame_id)).scalar()
+    rows = db.execute(
+        select(c.id, *(getattr(c, field) for field in COMPONENT_FIELDS)).where(c.frame_id == frame_id)
+    ).all()
+    return {
+        "frame": {"name": frame_name},
+        "components": {str(row[0]): dict(zip(COMPONENT_FIELDS, row[1:])) for row in rows},
+    }
+
+
+def latest_revision(db: Session, frame_id: int) -> int:
+    """Latest recorded revision number of a frame, 0 if none"""
+    r = models.FrameRevision
+    return db.execute(select(func.max(r.revision)).where(r.frame_id == frame_id)).scalar() or 0
+
+
+def record(db: Session, frame_id: int, delta: dict) -> int:
+    """Record a delta for ``frame_id`` as its next revision
+
+    The frame row is locked so concurrent writers get consecutive
+    revision numbers. Returns the new revision number.
+    """
+    if not delta.get("components") and not delta.get("frame"):
+        return latest_revision(db, frame_id)
+
+    if db.get_bind().dialect.name == "sqlite":
+        # FOR UPDATE is ignored there; writing takes the database's write
+        # lock, which is held until commit
+        db.execute(text("UPDATE frames SET id = id WHERE id = :frame_id"), {"frame_id": frame_id})
+    else:
+        db.execute(
+            select(models.Frame.id).where(models.Frame.id == frame_id).with_for_update()
+        )
+    revision = latest_revision(db, frame_id) + 1
+
+    checkpoint = None
+    if revision == 1 or revision % CHECKPOINT_INTERVAL == 0:
+        db.flush()
+        checkpoint = _pack(current_state(db, frame_id))
+
+    db.add(models.FrameRevision(
+        frame_id=frame_id, revision=revision, delta=_pack(delta), checkpoint=checkpoint
+    ))
+    return revision
+
+
+def record_components(db: Session, changes: dict[int, dict[int, Optional[dict]]]) -> None:
+    """Record component changes grouped by frame id"""
+    for frame_id, components in changes.items():
+        record(db, frame_id, {
+            "components": {str(k): v for k, v in components.items() if v is None or v}
+        })
+
+
+def record_geometry(db: Session, where) -> None:
+    """Record the current geometry of the components matching ``where``
+
+    Used after set-based bulk updates, which don't have per-row values
+    in Python.
+    """
+    c = models.Component
+    db.flush()
+    rows = db.execute(
+        select(c.frame_id, c.id, *(getattr(c, field) for field in GEOMETRY_FIELDS)).where(where)
+    ).all()
+    changes: dict[int, dict[int, dict]] = defaultdict(dict)
+    for row in rows:
+        changes[row[0]][row[1]] = dict(zip(GEOMETRY_FIELDS, row[2:]))
+    record_components(db, changes)
+
+
+def apply_delta(state: dict, delta: dict) -> None:
+    """Apply a delta to a state in place"""
+    if delta.get("frame"):
+        state["frame"].update(delta["frame"])
+    components = state["components"]
+    for component_id, change in delta.get("components", {}).items():
+        if change is None:
+            components.pop(component_id, None)
+        elif component_id in components:
+            components[component_id].update(change)
+        else:
+            components[component_id] = dict(change)
+
+
+def reconstruct(db: Session, frame_id: int, revision: int) -> Optional[dict]:
+    """Rebuild the state of a frame at ``revision``
+
+    Returns None if the revision doesn't exist.
+    """
+    r = models.FrameRevision
+    base = db.execute(
+        select(r.revision, r.checkpoint)
+        .where(r.frame_id == frame_id, r.revision <= revision, r.checkpoint.isnot(None))
+        .order_by(r.revision.desc())
+        .limit(1)
+    ).first()
+    if base is None:
+        return None
+
+    state = _unpack(base.checkpoint)
+    deltas = db.execute(
+        select(r.revision, r.delta)
+        .where(r.frame_id == frame_id, r.revision > base.revision, r.revision <= revision)
+        .order_by(r.revision)
+    ).all()
+    if base.revision + len(deltas) != revision:
+        return None
+    for row in deltas:
+        apply_delta(state, _unpack(row.delta))
+    return state
+
+
+def diff(old: dict, new: dict) -> dict:
+    """Delta that turns state ``old`` into state ``new``"""
+    delta: dict[str, Any] = {"components": {}}
+    if old["frame"] != new["frame"]:
+        delta["frame"] = {
+            key: value for key, value in new["frame"].items() if old["frame"].get(key) != value
+        }
+    old_components, new_components = old["components"], new["components"]
+    for component_id in old_components.keys() - new_components.keys():
+        delta["components"][component_id] = None
+    for component_id, fields in new_components.items():
+        before = old_components.get(component_id)
+        if before is None:
+            delta["components"][component_id] = dict(fields)
+            continue
+        changed = {key: value for key, value in fields.items() if before.get(key) != value}
+        if changed:
+            delta["components"][component_id] = changed
+    return delta
+
+
+def state_components(state: dict) -> list[dict]:
+    """Components of a state as a list sorted by id"""
+    return [
+        {"id": int(component_id), **fields}
+        for component_id, fields in sorted(state["components"].items(), key=lambda item: int(item[0]))
+    ]
+
+
+def describe_diff(old: dict, new: dict) -> dict:
+    """Split the diff of two states into added, removed and changed parts"""
+    delta = diff(old, new)
+    added, removed, changed = [], [], {}
+    for component_id, change in delta["components"].items():
+        if change is None:
+            removed.append(int(component_id))
+        elif component_id not in old["components"]:
+            added.append({"id": int(component_id), **change})
+        else:
+            changed[int(component_id)] = change
+    return {
+        "frame": delta.get("frame", {}),
+        "added": sorted(added, key=lambda item: item["id"]),
+        "removed": sorted(removed),
+        "changed": dict(sorted(changed.items())),
+    }
+
+
+def list_revisions(db: Session, frame_id: int, skip: int = 0, limit: int = 100) -> list:
+    """Revision metadata of a frame, newest first"""
+    r = models.FrameRevision
+    return db.execute(
+        select(r.revision, r.created_at, r.checkpoint.isnot(None).label("is_checkpoint"))
+        .where(r.frame_id == frame_id)
+        .order_by(r.revision.desc())
+        .offset(skip)
+        .limit(limit)
+    ).all()
+
+
+def restore(db: Session, frame_id: int, revision: int) -> Optional[int]:
+    """Make ``revision`` the current state of the frame
+
+    Only the difference to the live state is written: deleted components
+    are re-inserted with their original ids, extra ones are deleted and
+    changed ones are updated with one executemany per field set. The
+    restore itself is recorded as a new revision. Returns the new
+    revision number, or None if ``revision`` doesn't exist.
+    """
+    target = reconstruct(db, frame_id, revision)
+    if target is None:
+        return None
+    current = current_state(db, frame_id)
+    delta = diff(current, target)
+
+    if delta.get("frame"):
+        db.execute(update(models.Frame).where(models.Frame.id == frame_id).values(delta["frame"]))
+
+    removed, added = [], []
+    changed: dict[tuple, list[dict]] = defaultdict(list)
+    for component_id, change in delta["components"].items():
+        if change is None:
+            removed.append(int(component_id))
+        elif component_id not in current["components"]:
+            added.append({"id": int(component_id), "frame_id": frame_id, **change})
+        else:
+            changed[tuple(sorted(change))].append({"id": int(component_id), **change})
+
+    # Matching on the frame too prunes to one partition of a partitioned components table
+    c = models.Component
+    if removed:
+        db.execute(c.__table__.delete().where(c.frame_id == frame_id, c.id.in_(removed)))
+    if added:
+        db.execute(c.__table__.insert(), added)
+    for params in changed.values():
+        db.execute(update(c).where(c.frame_id == frame_id).execution_options(synchronize_session=None), params)
+
+    new_revision = record(db, frame_id, delta)
+    db.commit()
+    return new_revision
@@ -2,9 +2,9 @@
 Pydantic schemas for API requests/responses
 """
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Literal, Tuple
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 
 class ComponentBase(BaseModel):
@@ -43,6 +43,201 @@ class ComponentResponse(ComponentBase):
     updated_at: Optional[datetime] = None
 
 
+# Write-behind position schemas
+class PositionUpdate(BaseModel):
+    """Latest position (and optionally size) of one component"""
+    id: int
+    x: Optional[float] = None
+    y: Optional[float] = None
+    width: Optional[float] = None
+    height: Optional[float] = None
+
+
+class PositionBatch(BaseModel):
+    """Position updates; ``flush`` (drag end) commits them and records a revision before responding"""
+    updates: List[PositionUpdate]
+    flush: bool = False
+
+
+class PositionBatchResult(BaseModel):
+    """Result of queueing position updates"""
+    accepted: int
+    flushed: bool
+
+
+class WriteBehindMetrics(BaseModel):
+    """Write-behind buffer counters"""
+    received: int
+    written: int
+    pending: int
+    coalescing_ratio: float
+    flushes: int
+    recorded: int
+    unrecorded: int
+    rejected: int
+    errors: int
+    last_flush_ms: float
+    avg_flush_ms: float
+    max_flush_ms: float
+
+
+class TileCacheMetrics(BaseModel):
+    """Tile cache counters"""
+    frames: int
+    tiles: int
+    hits: int
+    misses: int
+    index_builds: int
+
+
+class ThumbnailMetrics(BaseModel):
+    """Thumbnail cache and renderer counters"""
+    workers: int
+    entries: int
+    hits: int
+    misses: int
+    coalesced: int
+    renders: int
+    errors: int
+    avg_render_ms: float
+
+
+class JobMetrics(BaseModel):
+    """Background job worker usage and jobs per status"""
+    workers: int
+    running: int
+    statuses: Dict[str, int]
+
+
+class CoalescingMetrics(BaseModel):
+    """Request coalescing counters"""
+    requests: int
+    executed: int
+    coalesced: int
+    in_flight: int
+    max_shared: int
+    dedup_ratio: float
+
+
+class AdmissionMetrics(BaseModel):
+    """Admission control counters"""
+    in_flight: int
+    bulk_in_flight: int
+    queue_depth: int
+    interactive_queue_depth: int
+    bulk_queue_depth: int
+    max_queue_depth: int
+    admitted: int
+    queued: int
+    rejected: dict[str, int]
+
+
+# Bulk geometry schemas
+class ComponentSelection(BaseModel):
+    """Components targeted by a bulk operation: explicit ids or a whole frame"""
+    component_ids: Optional[List[int]] = None
+    frame_id: Optional[int] = None
+
+    @model_validator(mode="after")
+    def check_selection(self):
+        """Require at least one selector"""
+        if self.component_ids is None and self.frame_id is None:
+            raise ValueError("component_ids or frame_id is required")
+        return self
+
+
+class TranslateRequest(ComponentSelection):
+    """Move the selection by dx/dy"""
+    dx: float = 0.0
+    dy: float = 0.0
+
+
+class ScaleRequest(ComponentSelection):
+    """Scale the selection around a pivot (defaults to the selection center)"""
+    scale_x: float = 1.0
+    scale_y: float = 1.0
+    pivot_x: Optional[float] = None
+    pivot_y: Optional[float] = None
+
+
+class AlignRequest(ComponentSelection):
+    """Align the selection to one of its bounding box edges"""
+    edge: Literal["left", "right", "top", "bottom", "center_x", "center_y"]
+
+
+class DistributeRequest(ComponentSelection):
+    """Space the selection evenly along an axis"""
+    axis: Literal["horizontal", "vertical"]
+
+
+class BulkGeometryResult(BaseModel):
+    """Result of a bulk geometry operation"""
+    updated: int
+
+
+class LayoutRequest(BaseModel):
+    """Automatic layout options
+
+    ``layered`` flows left to right along connections; ``force`` is a
+    force-directed layout that uses ``spacing_x`` as the ideal edge length.
+    """
+    algorithm: Literal["layered", "force"] = "layered"
+    spacing_x: float = Field(200.0, gt=0)
+    spacing_y: float = Field(150.0, gt=0)
+    iterations: int = Field(50, ge=1, le=500)
+    seed: Optional[int] = 0
+
+
+class OverlapResponse(BaseModel):
+    """Overlapping component pairs in a frame"""
+    frame_id: int
+    count: int
+    pairs: List[Tuple[int, int]]
+
+
+# Search schemas
+class SearchAncestor(BaseModel):
+    """Project or frame containing a search hit"""
+    id: int
+    name: str
+
+
+class SearchHit(BaseModel):
+    """A project, frame or component whose name matches"""
+    kind: Literal["project", "frame", "component"]
+    id: int
+    name: str
+    match: Literal["exact", "prefix", "substring"]
+    type: Optional[str] = None
+    project: Optional[SearchAncestor] = None
+    frame: Optional[SearchAncestor] = None
+
+
+class SearchResponse(BaseModel):
+    """Ranked page of search hits"""
+    query: str
+    offset: int
+    limit: int
+    has_more: bool
+    items: List[SearchHit]
+
+
+# Summary schemas for tree views
+class FrameSummary(BaseModel):
+    """Frame name and component count"""
+    id: int
+    project_id: int
+    name: str
+    component_count: int
+
+
+class ProjectSummary(BaseModel):
+    """Project name and frame count"""
+    id: int
+    name: str
+    frame_count: int
+
+
 class FrameBase(BaseModel):
     """Base frame schema"""
     name: str
@@ -94,3 +289,92 @@ class ProjectResponse(ProjectBase):
     updated_at: Optional[datetime] = None
     frames: Optional[List[FrameResponse]] = None
 
+
+class ProjectArchiveResult(BaseModel):
+    """What archiving a project moved to cold storage"""
+    project_id: int
+    frames: int
+    components: int
+    revisions: int
+    hot_bytes: int
+    archive_bytes: int
+
+
+class ArchiveRunResult(BaseModel):
+    """Totals of an archiving run"""
+    candidates: list[int]
+    archived: list[int]
+    failed: list[int]
+    frames: int
+    components: int
+    revisions: int
+    hot_bytes: int
+    archive_bytes: int
+
+
+# Job schemas
+class JobCreate(BaseModel):
+    """Background job submission
+
+    ``name`` names the copy made by ``clone_project``; ``layout`` holds the
+    options of ``layout_project``.
+    """
+    kind: Literal["delete_project", "clone_project", "export_project", "layout_project"]
+    project_id: int
+    name: Optional[str] = None
+    layout: Optional[LayoutRequest] = None
+
+
+class JobResponse(BaseModel):
+    """Background job status"""
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    kind: str
+    params: Dict[str, Any]
+    status: str
+    progress: float
+    message: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    cancel_requested: bool
+    attempts: int
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+# Revision schemas
+class RevisionSummary(BaseModel):
+    """Revision metadata"""
+    model_config = ConfigDict(from_attributes=True)
+
+    revision: int
+    created_at: Optional[datetime] = None
+    is_checkpoint: bool
+
+
+class RevisionState(BaseModel):
+    """Frame contents at a revision"""
+    frame_id: int
+    revision: int
+    name: Optional[str] = None
+    components: List[Dict[str, Any]]
+
+
+class RevisionDiff(BaseModel):
+    """Changes between two revisions"""
+    frame_id: int
+    from_revision: int
+    to_revision: int
+    frame: Dict[str, Any] = {}
+    added: List[Dict[str, Any]]
+    removed: List[int]
+    changed: Dict[int, Dict[str, Any]]
+
+
+class RevisionRestoreResult(BaseModel):
+    """Result of restoring a revision"""
+    frame_id: int
+    restored_revision: int
+    revision: int
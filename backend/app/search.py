@@ -0,0 +1,161 @@
+"""
+Name search across projects, frames and components
+
+Names are matched case-insensitively in three tiers: exact matches, then
+other names starting with the query, then names containing it. Within a
+tier projects come before frames before components; exact and prefix
+matches are in name order, substring matches in id order.
+
+Each kind is searched with index-backed queries that stop after the
+requested page, so a search costs a few short index scans however many
+rows there are:
+
+* exact and prefix matches are a range scan on ``name_key(name)``;
+* substring matches use the trigram indexes on ``lower(name)`` and are
+  only looked up when prefix matches don't fill the page, since a broad
+  substring can match a large part of a table. Trigrams need at least
+  ``MIN_SUBSTRING`` characters, so shorter queries only match prefixes.
+  SQLite has no trigram indexes and scans instead.
+
+Frames and components of archived projects aren't in the hot tables and
+aren't found until the project is opened again.
+"""
+from typing import Optional
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.models import name_key, name_lower
+
+KINDS = ("project", "frame", "component")
+TIERS = ("exact", "prefix", "substring")
+MIN_SUBSTRING = 3
+MAX_LIMIT = 100
+MAX_OFFSET = 1000
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _successor(value: str) -> str:
+    """Smallest string greater than every string starting with ``value``"""
+    last = ord(value[-1])
+    if last == 0x10FFFF:
+        return value + chr(last)
+    return value[:-1] + chr(last + 1)
+
+
+def _base_query(kind: str, project_id: Optional[int]):
+    """Columns of a hit with its ancestry, and the searched model"""
+    p, f, c = models.Project, models.Frame, models.Component
+    if kind == "project":
+        query = select(p.id, p.name, name_key(p.name).label("key"))
+        model = p
+        if project_id is not None:
+            query = query.where(p.id == project_id)
+    elif kind == "frame":
+        query = select(
+            f.id, f.name, name_key(f.name).label("key"), p.id.label("project_id"), p.name.label("project_name")
+        ).join(p, f.project_id == p.id)
+        model = f
+        if project_id is not None:
+            query = query.where(f.project_id == project_id)
+    else:
+        query = select(
+            c.id, c.name, name_key(c.name).label("key"), c.type,
+            f.id.label("frame_id"), f.name.label("frame_name"),
+            p.id.label("project_id"), p.name.label("project_name"),
+        ).join(f, c.frame_id == f.id).join(p, f.project_id == p.id)
+        model = c
+        if project_id is not None:
+            query = query.where(f.project_id == project_id)
+    return query, model
+
+
+def _searched(model, project_id: Optional[int]) -> tuple:
+    """Name and id expressions a branch query filters and sorts on
+
+    Unscoped queries use the name indexes and walk them (or the id index)
+    in order until the page is full. Within one project those walks can
+    read most of the table before they reach a row of the project, so
+    scoped queries use expressions no index covers; the planner then
+    starts from the project's frames and filters and sorts their
+    components, which costs time proportional to the project's size.
+    """
+    if project_id is None:
+        return model.name, model.id
+    return model.name.concat(""), model.id + 0
+
+
+def _hit(kind: str, tier: str, row) -> dict:
+    hit = {"kind": kind, "id": row.id, "name": row.name, "match": tier, "type": None, "project": None, "frame": None}
+    if kind != "project":
+        hit["project"] = {"id": row.project_id, "name": row.project_name}
+    if kind == "component":
+        hit["type"] = row.type
+        hit["frame"] = {"id": row.frame_id, "name": row.frame_name}
+    return hit
+
+
+def search(
+    db: Session,
+    query: str,
+    kinds: Optional[list[str]] = None,
+    project_id: Optional[int] = None,
+    offset: int = 0,
+    limit: int = 20,
+) -> dict:
+    """Ranked page of names matching ``query`` (non-blank)
+
+    Each query reads at most ``offset + limit + 1`` rows, so callers
+    should keep ``offset`` bounded.
+    """
+    q = query.strip().lower()
+    above = _successor(q)
+    window = offset + limit + 1
+    targets = [
+        (kind_rank, kind, *_base_query(kind, project_id))
+        for kind_rank, kind in enumerate(KINDS)
+        if kinds is None or kind in kinds
+    ]
+
+    ranked = []
+    for kind_rank, kind, base, model in targets:
+        name, row_id = _searched(model, project_id)
+        key = name_key(name)
+        rows = db.execute(
+            base.where(key >= q, key < above).order_by(key, row_id).limit(window)
+        ).all()
+        for position, row in enumerate(rows):
+            # Exact matches sort first among the prefix matches
+            tier = 0 if row.key == q else 1
+            ranked.append(((tier, kind_rank, position), kind, row))
+
+    # Substring matches rank last; skip them when prefixes already fill the page
+    remaining = window - len(ranked)
+    if len(q) >= MIN_SUBSTRING and remaining > 0:
+        pattern = f"%{_escape_like(q)}%"
+        for kind_rank, kind, base, model in targets:
+            name, row_id = _searched(model, project_id)
+            key = name_key(name)
+            # Id order: matches of a broad substring cluster in name order but not in id order
+            rows = db.execute(
+                base.where(
+                    name_lower(name).like(pattern, escape="\\"),
+                    or_(key < q, key >= above),
+                ).order_by(row_id).limit(remaining)
+            ).all()
+            for position, row in enumerate(rows):
+                ranked.append(((2, kind_rank, position), kind, row))
+
+    ranked.sort(key=lambda item: item[0])
+    page = ranked[offset:offset + limit]
+    return {
+        "query": query,
+        "offset": offset,
+        "limit": limit,
+        "has_more": len(ranked) > offset + limit,
+        "items": [_hit(kind, TIERS[rank[0]], row) for rank, kind, row in page],
+    }
@@ -0,0 +1,207 @@
+"""
+Static file serving for the bundled frontend
+
+The build output is immutable once deployed, so ``index.html`` is held in
+memory (with its compressed variants) and per-file lookups for
+precompressed ``.br``/``.gz`` siblings are cached after the first hit.
+Precompressed files are produced by ``precompress_assets.py`` after
+``npm run build``; brotli is only used when the optional ``brotli``
+package is installed.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import Optional, Union
+
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+# CRA emits hashed bundles like main.1a2b3c4d.js / 453.8f2e1c9a.chunk.css
+HASHED_ASSET_RE = re.compile(r"\.[0-9a-f]{8,}\.(?:chunk\.)?[A-Za-z0-9]+$")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Preferred order when the client accepts several encodings
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE_SUFFIXES = {".js", ".css", ".html", ".json", ".map", ".svg", ".txt", ".ico"}
+
+
+def accepted_encodings(headers: Headers) -> set[str]:
+    """Parse Accept-Encoding, ignoring codings explicitly refused with q=0"""
+    accepted = set()
+    for part in headers.get("accept-encoding", "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding)
+    if "*" in accepted:
+        accepted.update(encoding for encoding, _ in ENCODINGS)
+    return accepted
+
+
+def cache_control_for(path: str) -> str:
+    """Hashed bundles never change; everything else must be revalidated"""
+    if HASHED_ASSET_RE.search(os.path.basename(path)):
+        return IMMUTABLE_CACHE_CONTROL
+    return REVALIDATE_CACHE_CONTROL
+
+
+def etag_matches(if_none_match: str, etags: list[str]) -> bool:
+    """Check an If-None-Match header (``*`` or a list of entity tags) against our ETags"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return any(etag in candidates for etag in etags)
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that prefers precompressed siblings and sets cache headers"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # full_path -> [(encoding, variant_path, stat_result), ...]
+        self._variants: dict[str, list[tuple[str, str, os.stat_result]]] = {}
+
+    def _lookup_variants(self, full_path: str) -> list[tuple[str, str, os.stat_result]]:
+        variants = self._variants.get(full_path)
+        if variants is None:
+            variants = []
+            for encoding, suffix in ENCODINGS:
+                variant_path = f"{full_path}{suffix}"
+                try:
+                    variants.append((encoding, variant_path, os.stat(variant_path)))
+                except OSError:
+                    continue
+            self._variants[full_path] = variants
+        return variants
+
+    def file_response(
+        self,
+        full_path: Union[str, "os.PathLike[str]"],
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        full_path = str(full_path)
+        method = scope["method"]
+        request_headers = Headers(scope=scope)
+        headers = {"Cache-Control": cache_control_for(full_path), "Vary": "Accept-Encoding"}
+        media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+
+        response = None
+        accepted = accepted_encodings(request_headers)
+        for encoding, variant_path, variant_stat in self._lookup_variants(full_path):
+            if encoding in accepted:
+                response = FileResponse(
+                    variant_path,
+                    status_code=status_code,
+                    headers={**headers, "Content-Encoding": encoding},
+                    media_type=media_type,
+                    stat_result=variant_stat,
+                    method=method,
+                )
+                break
+        if response is None:
+            response = FileResponse(
+                full_path,
+                status_code=status_code,
+                headers=headers,
+                media_type=media_type,
+                stat_result=stat_result,
+                method=method,
+            )
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+class CachedIndex:
+    """In-memory ``index.html`` with precomputed compressed variants"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        body = path.read_bytes()
+        digest = hashlib.sha256(body).hexdigest()[:32]
+
+        self.variants: dict[str, tuple[bytes, str]] = {"identity": (body, f'"{digest}"')}
+        self.variants["gzip"] = (gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gzip"')
+        if brotli is not None:
+            self.variants["br"] = (brotli.compress(body), f'"{digest}-br"')
+
+    def response(self, request: Request) -> Response:
+        """Build the response for ``request``, honouring conditional headers"""
+        headers = {"Cache-Control": REVALIDATE_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+
+        encoding = self._pick_encoding(request.headers)
+        body, etag = self.variants[encoding]
+        headers["ETag"] = etag
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, [tag for _, tag in self.variants.values()]):
+            return Response(status_code=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="text/html", headers=headers)
+
+    def _pick_encoding(self, headers: Headers) -> str:
+        accepted = accepted_encodings(headers)
+        for encoding, _ in ENCODINGS:
+            if encoding in accepted and encoding in self.variants:
+                return encoding
+        return "identity"
+
+
+def precompress_directory(directory: Path, min_size: int = 1024) -> int:
+    """Write ``.gz`` (and ``.br`` if available) siblings for text assets
+
+    Returns the number of files written. Existing variants that are newer
+    than their source are left alone.
+    """
+    written = 0
+    for path in directory.rglob("*"):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE_SUFFIXES:
+            continue
+        stat_result = path.stat()
+        if stat_result.st_size < min_size:
+            continue
+        data: Optional[bytes] = None
+        for encoding, suffix in ENCODINGS:
+            if encoding == "br" and brotli is None:
+                continue
+            target = path.with_name(path.name + suffix)
+            if target.exists() and target.stat().st_mtime >= stat_result.st_mtime:
+                continue
+            if data is None:
+                data = path.read_bytes()
+            if encoding == "br":
+                compressed = brotli.compress(data)
+            else:
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) >= len(data):
+                continue
+            target.write_bytes(compressed)
+            written += 1
+    return written
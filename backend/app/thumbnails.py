@@ -0,0 +1,369 @@
+"""
+Frame thumbnails for the project and frame pickers
+
+A thumbnail fits all of a frame's shapes into a ``size`` x ``size`` image,
+y pointing up as in the editor. Shapes are filled boxes, ellipses and
+triangles in their editor color and connections are lines between the
+centers of the shapes they join. Shapes smaller than a couple of pixels
+are drawn as boxes, so a frame of a million shapes costs a few vectorized
+passes rather than a million draws.
+
+Thumbnails come as an indexed PNG, encoded here with zlib so there's no
+imaging dependency, or as SVG. Rendering is CPU-bound and runs in a pool
+of worker processes; the request thread only loads the frame's geometry
+and waits for the image.
+
+Like tiles, thumbnails are cached per frame and keyed by the frame's
+latest revision. A write makes the cached image stale and it is rendered
+again on the next request; concurrent requests for the same missing
+thumbnail share one render.
+"""
+import multiprocessing
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import models, revisions
+from app.config import get_settings
+
+FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+SHAPE_KINDS = ("rectangle", "circle", "triangle")
+# Palette: background, connection, shape (the editor's shape color)
+PALETTE = ((255, 255, 255), (136, 136, 136), (255, 0, 0))
+BACKGROUND, LINE, FILL = range(3)
+# Empty border around the content, in pixels
+PADDING = 4
+# Shapes at most this many pixels across are drawn as boxes in one pass
+TINY_PIXELS = 2
+
+
+class ThumbnailTimeout(Exception):
+    """A thumbnail wasn't rendered in time"""
+
+
+def load_scene(db: Session, frame_id: int) -> dict:
+    """A frame's geometry as arrays, ready to send to a render process"""
+    c = models.Component
+    rows = db.execute(
+        select(c.id, c.type, c.x, c.y, c.width, c.height)
+        .where(c.frame_id == frame_id, c.type != "connection")
+        .order_by(c.id)
+    ).all()
+    connections = db.execute(
+        select(c.properties).where(c.frame_id == frame_id, c.type == "connection")
+    ).scalars().all()
+
+    if rows:
+        ids, types, x, y, width, height = zip(*rows)
+    else:
+        ids, types, x, y, width, height = (), (), (), (), (), ()
+    # Missing geometry (NULL) is treated as 0; unknown types are drawn as rectangles
+    x, y, width, height = (
+        np.nan_to_num(np.array(column, dtype=float)) for column in (x, y, width, height)
+    )
+    kinds = np.array(
+        [SHAPE_KINDS.index(t) if t in SHAPE_KINDS else 0 for t in types], dtype=np.int8
+    )
+
+    position = {shape_id: i for i, shape_id in enumerate(ids)}
+    ends = [
+        (position.get(props.get("sourceId")), position.get(props.get("targetId")))
+        for props in connections if props
+    ]
+    ends = np.array([end for end in ends if None not in end], dtype=np.int64).reshape(-1, 2)
+    return {
+        "kinds": kinds,
+        "x": x,
+        "y": y,
+        "width": np.abs(width),
+        "height": np.abs(height),
+        "edges": ends,
+    }
+
+
+def _to_pixels(scene: dict, size: int) -> tuple:
+    """Shape centers and sizes in image pixels, y flipped to point down"""
+    x, y, width, height = scene["x"], scene["y"], scene["width"], scene["height"]
+    left, right = (x - width / 2).min(), (x + width / 2).max()
+    bottom, top = (y - height / 2).min(), (y + height / 2).max()
+    extent = max(right - left, top - bottom)
+    inner = size - 2 * PADDING
+    scale = inner / extent if extent > 0 else 1.0
+    # Center the content along the shorter side
+    offset_x = PADDING + (inner - (right - left) * scale) / 2
+    offset_y = PADDING + (inner - (top - bottom) * scale) / 2
+    px = offset_x + (x - left) * scale
+    py = size - (offset_y + (y - bottom) * scale)
+    return px, py, width * scale, height * scale
+
+
+def _shape_boxes(px, py, pw, ph, size: int) -> tuple:
+    """Clipped pixel boxes [x0, x1) x [y0, y1) of at least one pixel"""
+    x0 = np.floor(px - pw / 2).astype(np.int64)
+    y0 = np.floor(py - ph / 2).astype(np.int64)
+    x1 = np.maximum(np.ceil(px + pw / 2).astype(np.int64), x0 + 1)
+    y1 = np.maximum(np.ceil(py + ph / 2).astype(np.int64), y0 + 1)
+    return (np.clip(x0, 0, size), np.clip(y0, 0, size), np.clip(x1, 0, size), np.clip(y1, 0, size))
+
+
+def _line_pixels(px, py, edges: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Pixels along each connection, about one sample per pixel"""
+    if len(edges) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    x1, y1 = px[edges[:, 0]], py[edges[:, 0]]
+    x2, y2 = px[edges[:, 1]], py[edges[:, 1]]
+    samples = np.ceil(np.maximum(np.abs(x2 - x1), np.abs(y2 - y1))).astype(np.int64) + 1
+    segment = np.repeat(np.arange(len(edges)), samples)
+    # Position of every sample within its segment, from 0 to 1
+    start = np.cumsum(samples) - samples
+    t = (np.arange(samples.sum()) - start[segment]) / np.maximum(samples[segment] - 1, 1)
+    lx = np.floor(x1[segment] + (x2 - x1)[segment] * t).astype(np.int64)
+    ly = np.floor(y1[segment] + (y2 - y1)[segment] * t).astype(np.int64)
+    return lx, ly
+
+
+def rasterize(scene: dict, size: int) -> np.ndarray:
+    """Palette indices of a ``size`` x ``size`` image of the scene"""
+    canvas = np.full((size, size), BACKGROUND, dtype=np.uint8)
+    if len(scene["kinds"]) == 0:
+        return canvas
+    px, py, pw, ph = _to_pixels(scene, size)
+
+    lx, ly = _line_pixels(px, py, scene["edges"])
+    inside = (lx >= 0) & (lx < size) & (ly >= 0) & (ly < size)
+    canvas[ly[inside], lx[inside]] = LINE
+
+    x0, y0, x1, y1 = _shape_boxes(px, py, pw, ph, size)
+    tiny = (x1 - x0 <= TINY_PIXELS) & (y1 - y0 <= TINY_PIXELS)
+    for dx in range(TINY_PIXELS):
+        for dy in range(TINY_PIXELS):
+            hit = tiny & (x0 + dx < x1) & (y0 + dy < y1)
+            canvas[y0[hit] + dy, x0[hit] + dx] = FILL
+
+    kinds = scene["kinds"]
+    for i in np.flatnonzero(~tiny):
+        if x0[i] >= x1[i] or y0[i] >= y1[i]:
+            continue
+        if kinds[i] == 0:
+            canvas[y0[i]:y1[i], x0[i]:x1[i]] = FILL
+            continue
+        # Pixel centers relative to the shape's center and top edge
+        cy = np.arange(y0[i], y1[i])[:, None] + 0.5 - py[i]
+        cx = np.arange(x0[i], x1[i])[None, :] + 0.5 - px[i]
+        if kinds[i] == 1:
+            mask = (cx / max(pw[i] / 2, 0.5)) ** 2 + (cy / max(ph[i] / 2, 0.5)) ** 2 <= 1
+        else:
+            # Apex at the top center, base along the bottom edge
+            depth = (cy + ph[i] / 2) / max(ph[i], 1.0)
+            mask = np.abs(cx) <= depth * pw[i] / 2 + 0.5
+        canvas[y0[i]:y1[i], x0[i]:x1[i]][mask] = FILL
+    return canvas
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def encode_png(canvas: np.ndarray) -> bytes:
+    """8-bit indexed PNG of a palette image"""
+    height, width = canvas.shape
+    # Filter type 0 (none) before every row
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), canvas]).tobytes()
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)),
+        _png_chunk(b"PLTE", bytes(channel for color in PALETTE for channel in color)),
+        _png_chunk(b"IDAT", zlib.compress(raw, 9)),
+        _png_chunk(b"IEND", b""),
+    ])
+
+
+def render_svg(scene: dict, size: int) -> bytes:
+    """SVG of the scene; tiny shapes are merged into one path of pixels"""
+    def color(index: int) -> str:
+        return "#%02x%02x%02x" % PALETTE[index]
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" viewBox="0 0 {size} {size}">',
+        f'<rect width="{size}" height="{size}" fill="{color(BACKGROUND)}"/>',
+    ]
+    if len(scene["kinds"]):
+        px, py, pw, ph = _to_pixels(scene, size)
+        edges = scene["edges"]
+        if len(edges):
+            path = "".join(
+                f"M{px[a]:.1f} {py[a]:.1f}L{px[b]:.1f} {py[b]:.1f}" for a, b in edges.tolist()
+            )
+            parts.append(f'<path d="{path}" stroke="{color(LINE)}" fill="none"/>')
+
+        x0, y0, x1, y1 = _shape_boxes(px, py, pw, ph, size)
+        tiny = (x1 - x0 <= TINY_PIXELS) & (y1 - y0 <= TINY_PIXELS)
+        cells = np.unique(y0[tiny] * size + x0[tiny])
+        if len(cells):
+            path = "".join(f"M{cell % size} {cell // size}h{TINY_PIXELS}v{TINY_PIXELS}h-{TINY_PIXELS}z"
+                           for cell in cells.tolist())
+            parts.append(f'<path d="{path}" fill="{color(FILL)}"/>')
+
+        fill = color(FILL)
+        for i in np.flatnonzero(~tiny).tolist():
+            cx, cy, w, h = px[i], py[i], pw[i], ph[i]
+            if scene["kinds"][i] == 1:
+                parts.append(f'<ellipse cx="{cx:.1f}" cy="{cy:.1f}" rx="{w / 2:.1f}" ry="{h / 2:.1f}" fill="{fill}"/>')
+            elif scene["kinds"][i] == 2:
+                points = f"{cx:.1f},{cy - h / 2:.1f} {cx - w / 2:.1f},{cy + h / 2:.1f} {cx + w / 2:.1f},{cy + h / 2:.1f}"
+                parts.append(f'<polygon points="{points}" fill="{fill}"/>')
+            else:
+                parts.append(f'<rect x="{cx - w / 2:.1f}" y="{cy - h / 2:.1f}" width="{w:.1f}" height="{h:.1f}" fill="{fill}"/>')
+    parts.append("</svg>")
+    return "".join(parts).encode()
+
+
+def render(scene: dict, size: int, fmt: str) -> bytes:
+    """Encoded thumbnail; runs in a worker process"""
+    if fmt == "svg":
+        return render_svg(scene, size)
+    return encode_png(rasterize(scene, size))
+
+
+class ThumbnailService:
+    """Renders thumbnails in worker processes and caches them by frame revision"""
+
+    def __init__(self, size: int, workers: int, max_entries: int, timeout: float):
+        self.size = size
+        self.workers = workers
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # (frame_id, format) -> (revision, image)
+        self._cache: OrderedDict[tuple[int, str], tuple[int, bytes]] = OrderedDict()
+        # (frame_id, revision, format) -> render in progress
+        self._pending: dict[tuple[int, int, str], Future] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.renders = 0
+        self.errors = 0
+        self.render_ms_total = 0.0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        """The worker pool, started on first use"""
+        with self._lock:
+            if self._pool is None:
+                # The server has threads of its own (write-behind, jobs), which
+                # forked workers would inherit in whatever state they were in
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def _render(self, scene: dict, fmt: str) -> bytes:
+        if self.workers <= 0:
+            return render(scene, self.size, fmt)
+        try:
+            return self._executor().submit(render, scene, self.size, fmt).result(timeout=self.timeout)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool next time
+            with self._lock:
+                self._pool = None
+            raise
+
+    def get(self, db: Session, frame_id: int, fmt: str = "png",
+            revision: Optional[int] = None) -> tuple[int, bytes]:
+        """Revision and encoded thumbnail of ``frame_id``"""
+        if revision is None:
+            revision = revisions.latest_revision(db, frame_id)
+        key = (frame_id, fmt)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] == revision:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            pending = self._pending.get((frame_id, revision, fmt))
+            if pending is None:
+                owner = True
+                pending = self._pending[(frame_id, revision, fmt)] = Future()
+            else:
+                owner = False
+                self.coalesced += 1
+
+        if not owner:
+            try:
+                return revision, pending.result(timeout=self.timeout)
+            except TimeoutError as e:
+                raise ThumbnailTimeout(f"Thumbnail of frame {frame_id} not rendered in time") from e
+
+        start = time.perf_counter()
+        try:
+            image = self._render(load_scene(db, frame_id), fmt)
+        except BaseException as e:
+            with self._lock:
+                self.errors += 1
+                del self._pending[(frame_id, revision, fmt)]
+            pending.set_exception(e)
+            if isinstance(e, TimeoutError):
+                raise ThumbnailTimeout(f"Thumbnail of frame {frame_id} not rendered in time") from e
+            raise
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            self.renders += 1
+            self.render_ms_total += elapsed_ms
+            del self._pending[(frame_id, revision, fmt)]
+            current = self._cache.get(key)
+            # Don't replace a thumbnail rendered for a newer revision in the meantime
+            if current is None or current[0] <= revision:
+                self._cache[key] = (revision, image)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        pending.set_result(image)
+        return revision, image
+
+    def stop(self) -> None:
+        """Shut the worker processes down"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def clear(self) -> None:
+        """Drop every cached thumbnail"""
+        with self._lock:
+            self._cache.clear()
+
+    def metrics(self) -> dict:
+        """Hit/miss counters, cache size and render time"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "entries": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "renders": self.renders,
+                "errors": self.errors,
+                "avg_render_ms": self.render_ms_total / self.renders if self.renders else 0.0,
+            }
+
+
+settings = get_settings()
+
+thumbnail_service = ThumbnailService(
+    size=settings.THUMBNAIL_SIZE,
+    workers=settings.THUMBNAIL_WORKERS,
+    max_entries=settings.THUMBNAIL_CACHE_ENTRIES,
+    timeout=settings.THUMBNAIL_TIMEOUT_SECONDS,
+)
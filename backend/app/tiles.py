@@ -0,0 +1,238 @@
+"""
+Tile pyramid for rendering large frames
+
+At zoom level ``z`` the plane is cut into square tiles of
+``world_size / 2**z`` world units; tile ``(x, y)`` covers
+``[x * size, (x + 1) * size)`` horizontally and the same vertically. Each
+shape belongs to the tile containing its center. Connections aren't
+tiled.
+
+A tile holding at most ``detail_limit`` shapes lists them individually.
+Busier tiles are aggregated on a ``grid`` x ``grid`` raster: every
+occupied cell becomes one glyph with its shape count and most common
+type. Either way arrays are sent column-wise so a tile stays small, and
+a whole zoomed-out view of a million shapes is a few tiles of aggregates.
+
+Tiles are cached per frame and keyed by the frame's latest revision.
+Every component write path records a revision, so a committed write makes
+the frame's cached tiles unreachable and they are rebuilt on the next
+request. Drags are the exception: they are recorded once the drag ends
+(see write_behind), so tiles show a dragged shape at its final position.
+"""
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import models, revisions
+from app.config import get_settings
+
+# Tile coordinates are packed into one int64 key: x in the high half, y in the low
+_KEY_OFFSET = 1 << 31
+
+
+def tile_keys(tx: np.ndarray, ty: np.ndarray) -> np.ndarray:
+    """Pack tile coordinates into sortable int64 keys"""
+    return ((tx + _KEY_OFFSET) << 32) | (ty + _KEY_OFFSET)
+
+
+class TileIndex:
+    """The shapes of one frame revision with per-zoom tile lookups"""
+
+    def __init__(self, ids, types, x, y, width, height, type_names: list[str], world_size: float):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.types = np.asarray(types, dtype=np.int64)
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.width = np.asarray(width, dtype=float)
+        self.height = np.asarray(height, dtype=float)
+        self.type_names = type_names
+        self.world_size = world_size
+        self._levels: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def from_rows(cls, rows, world_size: float) -> "TileIndex":
+        """Build from (id, type, x, y, width, height) rows"""
+        if not rows:
+            return cls([], [], [], [], [], [], [], world_size)
+        ids, names, x, y, width, height = zip(*rows)
+        type_names, types = np.unique(np.array(names, dtype=object).astype(str), return_inverse=True)
+        # Missing geometry (NULL) is treated as 0
+        x, y, width, height = (
+            np.nan_to_num(np.array(column, dtype=float)) for column in (x, y, width, height)
+        )
+        return cls(ids, types, x, y, width, height, type_names.tolist(), world_size)
+
+    def tile_size(self, z: int) -> float:
+        """World units covered by one tile side at zoom ``z``"""
+        return self.world_size / (1 << z)
+
+    def _level(self, z: int) -> tuple[np.ndarray, np.ndarray]:
+        """Sorted tile keys and the matching shape order for zoom ``z``"""
+        level = self._levels.get(z)
+        if level is None:
+            size = self.tile_size(z)
+            keys = tile_keys(
+                np.floor(self.x / size).astype(np.int64),
+                np.floor(self.y / size).astype(np.int64),
+            )
+            order = np.argsort(keys, kind="stable")
+            level = self._levels[z] = (keys[order], order)
+        return level
+
+    def members(self, z: int, tx: int, ty: int) -> np.ndarray:
+        """Indices of the shapes in tile ``(tx, ty)``"""
+        keys, order = self._level(z)
+        key = tile_keys(np.int64(tx), np.int64(ty))
+        start, stop = np.searchsorted(keys, [key, key + 1])
+        return order[start:stop]
+
+    def tile(self, z: int, tx: int, ty: int, grid: int, detail_limit: int) -> dict:
+        """Tile content, either individual shapes or aggregated cells"""
+        size = self.tile_size(z)
+        left, bottom = tx * size, ty * size
+        members = self.members(z, tx, ty)
+        tile = {
+            "z": z,
+            "x": tx,
+            "y": ty,
+            "bounds": [left, bottom, left + size, bottom + size],
+            "count": int(len(members)),
+            "types": self.type_names,
+        }
+        if len(members) <= detail_limit:
+            members = np.sort(members)
+            tile["mode"] = "detail"
+            tile["components"] = {
+                "id": self.ids[members].tolist(),
+                "type": self.types[members].tolist(),
+                "x": np.round(self.x[members], 2).tolist(),
+                "y": np.round(self.y[members], 2).tolist(),
+                "width": np.round(self.width[members], 2).tolist(),
+                "height": np.round(self.height[members], 2).tolist(),
+            }
+            return tile
+
+        cell_size = size / grid
+        i = np.clip(((self.x[members] - left) / cell_size).astype(np.int64), 0, grid - 1)
+        j = np.clip(((self.y[members] - bottom) / cell_size).astype(np.int64), 0, grid - 1)
+        cell = j * grid + i
+        n_types = max(len(self.type_names), 1)
+        # Shapes per (cell, type); the argmax over types is the cell's glyph
+        by_type = np.bincount(cell * n_types + self.types[members], minlength=grid * grid * n_types)
+        by_type = by_type.reshape(grid * grid, n_types)
+        counts = by_type.sum(axis=1)
+        occupied = np.flatnonzero(counts)
+        tile["mode"] = "aggregate"
+        tile["grid"] = grid
+        tile["cells"] = {
+            "i": (occupied % grid).tolist(),
+            "j": (occupied // grid).tolist(),
+            "count": counts[occupied].tolist(),
+            "type": by_type[occupied].argmax(axis=1).tolist(),
+        }
+        return tile
+
+
+def encode(tile: dict) -> tuple[bytes, Optional[bytes]]:
+    """Compact JSON of a tile and its gzip variant when worth it"""
+    body = json.dumps(tile, separators=(",", ":")).encode()
+    return body, gzip.compress(body, compresslevel=6) if len(body) > 1024 else None
+
+
+class TileCache:
+    """Per-frame tile indexes and encoded tiles, keyed by frame revision"""
+
+    def __init__(self, world_size: float, grid: int, detail_limit: int, max_frames: int,
+                 max_tiles_per_frame: int):
+        self.world_size = world_size
+        self.grid = grid
+        self.detail_limit = detail_limit
+        self.max_frames = max_frames
+        self.max_tiles_per_frame = max_tiles_per_frame
+        # frame_id -> (revision, TileIndex, OrderedDict[(z, x, y)] -> encoded tile)
+        self._frames: OrderedDict[int, tuple[int, TileIndex, OrderedDict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.index_builds = 0
+
+    def _index(self, db: Session, frame_id: int, revision: int) -> tuple[TileIndex, OrderedDict]:
+        with self._lock:
+            entry = self._frames.get(frame_id)
+            if entry is not None and entry[0] == revision:
+                self._frames.move_to_end(frame_id)
+                return entry[1], entry[2]
+
+        c = models.Component
+        rows = db.execute(
+            select(c.id, c.type, c.x, c.y, c.width, c.height)
+            .where(c.frame_id == frame_id, c.type != "connection")
+        ).all()
+        index = TileIndex.from_rows(rows, self.world_size)
+        tiles: OrderedDict = OrderedDict()
+        with self._lock:
+            self.index_builds += 1
+            current = self._frames.get(frame_id)
+            # Don't replace an index built for a newer revision in the meantime
+            if current is None or current[0] <= revision:
+                self._frames[frame_id] = (revision, index, tiles)
+                self._frames.move_to_end(frame_id)
+                while len(self._frames) > self.max_frames:
+                    self._frames.popitem(last=False)
+        return index, tiles
+
+    def get(self, db: Session, frame_id: int, z: int, x: int, y: int,
+            revision: Optional[int] = None) -> tuple[int, bytes, Optional[bytes]]:
+        """Revision and encoded (identity, gzip) tile for ``frame_id``"""
+        if revision is None:
+            revision = revisions.latest_revision(db, frame_id)
+        index, tiles = self._index(db, frame_id, revision)
+        key = (z, x, y)
+        with self._lock:
+            encoded = tiles.get(key)
+            if encoded is not None:
+                tiles.move_to_end(key)
+                self.hits += 1
+                return revision, *encoded
+            self.misses += 1
+
+        encoded = encode(index.tile(z, x, y, self.grid, self.detail_limit))
+        with self._lock:
+            tiles[key] = encoded
+            while len(tiles) > self.max_tiles_per_frame:
+                tiles.popitem(last=False)
+        return revision, *encoded
+
+    def clear(self) -> None:
+        """Drop every cached frame"""
+        with self._lock:
+            self._frames.clear()
+
+    def metrics(self) -> dict:
+        """Hit/miss counters and cache size"""
+        with self._lock:
+            return {
+                "frames": len(self._frames),
+                "tiles": sum(len(entry[2]) for entry in self._frames.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "index_builds": self.index_builds,
+            }
+
+
+settings = get_settings()
+
+tile_cache = TileCache(
+    world_size=settings.TILE_WORLD_SIZE,
+    grid=settings.TILE_GRID,
+    detail_limit=settings.TILE_DETAIL_LIMIT,
+    max_frames=settings.TILE_CACHE_FRAMES,
+    max_tiles_per_frame=settings.TILE_CACHE_TILES_PER_FRAME,
+)
@@ -0,0 +1,247 @@
+"""
+Write-behind buffer for high-frequency position updates
+
+While a shape is dragged the client streams position updates. Instead of
+a SELECT/UPDATE/commit cycle per update, updates are merged in memory
+(latest value per component and field wins) and a background thread
+flushes them in one batched transaction every ``flush_interval`` seconds.
+
+Periodic flushes don't record frame revisions: a drag would otherwise
+add ten revisions a second to the history and invalidate the frame's
+tiles and thumbnail on every flush. A component's geometry is recorded
+once, when the drag ends: on a ``flush=true`` request (drag release), or
+once no update for it arrived for ``settle_interval`` seconds, in case
+the client never sent one.
+
+Durability: an accepted update is only in memory until the next flush,
+so at most ``flush_interval`` worth of drag positions can be lost if the
+process dies. A request sent with ``flush=true`` is written synchronously
+before the response, so once it returns the final position is committed.
+Pending updates are also flushed on shutdown.
+
+A synchronous update or delete of a component discards its pending values
+for the fields it writes, so an older drag position never lands on top of
+it. The buffer holds at most ``max_pending`` components; updates for more
+are refused with ``WriteBehindFull``.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from app import archive, models, revisions
+from app.config import get_settings
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+POSITION_FIELDS = ("x", "y", "width", "height")
+
+
+class WriteBehindFull(Exception):
+    """Raised when the buffer already holds ``max_pending`` components"""
+
+
+class WriteBehindBuffer:
+    """Coalesce component position updates and flush them in batches"""
+
+    def __init__(self, session_factory: Callable[[], Session], flush_interval: float, max_pending: int,
+                 settle_interval: float = 1.0):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.settle_interval = settle_interval
+
+        self._pending: dict[int, dict[str, float]] = {}
+        # component id -> time of its last update, until its geometry is recorded as a revision
+        self._unrecorded: dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.received = 0
+        self.written = 0
+        self.flushes = 0
+        self.recorded = 0
+        self.rejected = 0
+        self.errors = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def submit(self, updates: list[dict]) -> int:
+        """Queue position updates; returns how many were accepted
+
+        Raises ``WriteBehindFull``, accepting none of them, if they would
+        take the buffer past ``max_pending`` components.
+        """
+        items = []
+        for item in updates:
+            fields = {key: item[key] for key in POSITION_FIELDS if item.get(key) is not None}
+            if fields:
+                items.append((item["id"], fields))
+        now = time.monotonic()
+        with self._lock:
+            new = {component_id for component_id, _ in items if component_id not in self._pending}
+            if len(self._pending) + len(new) > self.max_pending:
+                self.rejected += 1
+                raise WriteBehindFull(f"{len(self._pending)} components already pending")
+            for component_id, fields in items:
+                self._pending.setdefault(component_id, {}).update(fields)
+                self._unrecorded[component_id] = now
+            self.received += len(items)
+            pending = len(self._pending)
+        # Flush early rather than start refusing updates
+        if pending >= self.max_pending // 2:
+            self._wake.set()
+        return len(items)
+
+    def discard(self, component_id: int, fields: Optional[Iterable[str]] = None) -> None:
+        """Drop pending values of ``component_id`` (only ``fields`` if given)
+
+        Called before a synchronous write of the component. Waits for a
+        flush in progress, which may hold older values of it.
+        """
+        with self._flush_lock, self._lock:
+            pending = self._pending.get(component_id)
+            if pending is None:
+                return
+            for field in POSITION_FIELDS if fields is None else fields:
+                pending.pop(field, None)
+            if not pending:
+                del self._pending[component_id]
+
+    def flush(self, record: bool = False) -> int:
+        """Write all pending updates in one transaction; returns rows written
+
+        Records a revision for components whose drag settled, or for all
+        moved components with ``record``.
+        """
+        with self._flush_lock:
+            settled_before = time.monotonic() - self.settle_interval
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                settled = {
+                    component_id: at for component_id, at in self._unrecorded.items()
+                    if record or at <= settled_before
+                }
+                for component_id in settled:
+                    del self._unrecorded[component_id]
+            if not batch and not settled:
+                return 0
+
+            start = time.perf_counter()
+            try:
+                self._write(batch, list(settled))
+            except Exception:
+                self.errors += 1
+                logger.error("Write-behind flush of %d components failed", len(batch), exc_info=True)
+                with self._lock:
+                    # Keep newer values that arrived while we were writing
+                    for component_id, fields in batch.items():
+                        self._pending[component_id] = {**fields, **self._pending.get(component_id, {})}
+                    for component_id, at in settled.items():
+                        self._unrecorded.setdefault(component_id, at)
+                raise
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.flushes += 1
+            self.written += len(batch)
+            self.recorded += len(settled)
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+            return len(batch)
+
+    def _write(self, batch: dict[int, dict[str, float]], record_ids: list[int]) -> None:
+        table = models.Component.__table__
+        groups: dict[tuple, list[dict]] = defaultdict(list)
+        for component_id, fields in batch.items():
+            groups[tuple(sorted(fields))].append(
+                {"b_id": component_id, **{f"b_{key}": value for key, value in fields.items()}}
+            )
+
+        db = self.session_factory()
+        try:
+            # The client may have loaded the frame before its project was archived
+            archive.rehydrate_components(db, list(batch))
+            for keys, params in groups.items():
+                db.execute(
+                    update(table)
+                    .where(table.c.id == bindparam("b_id"))
+                    .values({key: bindparam(f"b_{key}") for key in keys}),
+                    params,
+                )
+            if record_ids:
+                revisions.record_geometry(db, models.Component.id.in_(record_ids))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def start(self) -> None:
+        """Start the background flush thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flush thread and write whatever is still pending"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.flush(record=True)
+        except Exception:  # already logged
+            pass
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:  # already logged; retried on the next tick
+                pass
+
+    def metrics(self) -> dict:
+        """Counters for coalescing and flush latency"""
+        with self._lock:
+            pending = len(self._pending)
+            unrecorded = len(self._unrecorded)
+        return {
+            "received": self.received,
+            "written": self.written,
+            "pending": pending,
+            "coalescing_ratio": self.received / self.written if self.written else 0.0,
+            "flushes": self.flushes,
+            "recorded": self.recorded,
+            "unrecorded": unrecorded,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "last_flush_ms": self.last_flush_ms,
+            "avg_flush_ms": self._total_flush_ms / self.flushes if self.flushes else 0.0,
+            "max_flush_ms": self.max_flush_ms,
+        }
+
+
+settings = get_settings()
+
+position_buffer = WriteBehindBuffer(
+    SessionLocal,
+    flush_interval=settings.WRITE_BEHIND_FLUSH_INTERVAL_MS / 1000,
+    max_pending=settings.WRITE_BEHIND_MAX_PENDING,
+    settle_interval=settings.WRITE_BEHIND_SETTLE_MS / 1000,
+)
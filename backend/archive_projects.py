@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Archive inactive projects to cold storage (run from cron)
+"""
+import argparse
+import json
+
+from app import archive
+from app.config import get_settings
+from app.database import SessionLocal
+
+if __name__ == "__main__":
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--older-than-days", type=int, default=settings.ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--limit", type=int, default=settings.ARCHIVE_BATCH_LIMIT)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        report = archive.archive_inactive(db, args.older_than_days, args.limit, args.dry_run)
+    finally:
+        db.close()
+    print(json.dumps(report, indent=2))
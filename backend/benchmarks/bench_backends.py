@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Compare request latency of the SQLite and PostgreSQL backends
+
+Seeds a frame of 200 components on each backend and times the crud calls
+behind the common API requests, each in its own session the way a request
+gets one. SQLite uses a temporary file with the production pragmas.
+PostgreSQL is only measured when BENCH_POSTGRES_URL is set; the benchmark
+works in its own schema there and drops it afterwards.
+
+Run from the backend directory:
+    BENCH_POSTGRES_URL=postgresql://postgres@localhost/postgres \\
+        python -m benchmarks.bench_backends [iterations]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, schemas
+from app.database import create_database_engine
+
+SCHEMA = "bench_backends"
+COMPONENTS = 200
+
+
+def seed(session_factory) -> tuple[int, list[int]]:
+    """One project with one frame of COMPONENTS components"""
+    with session_factory() as db:
+        project = crud.create_project(db, schemas.ProjectCreate(name="Bench"))
+        frame = crud.create_frame(db, schemas.FrameCreate(name="Plant", project_id=project.id))
+        ids = [
+            crud.create_component(db, schemas.ComponentCreate(
+                frame_id=frame.id, name=f"Machine-{i}", type="rectangle",
+                x=float(i % 20) * 150, y=float(i // 20) * 150, properties={"color": "#888"},
+            )).id
+            for i in range(COMPONENTS)
+        ]
+        return frame.id, ids
+
+
+def operations(frame_id: int, ids: list[int]) -> dict:
+    """Crud calls behind the common requests"""
+    counter = iter(range(10 ** 9))
+    return {
+        "get frame": lambda db: crud.get_frame(db, frame_id),
+        "get frame components": lambda db: crud.get_components_by_frame(db, frame_id),
+        "frame summaries": lambda db: crud.get_frames_sparse(
+            db, fields=("name",), include=("component_count",)
+        ),
+        "create component": lambda db: crud.create_component(db, schemas.ComponentCreate(
+            frame_id=frame_id, name="New", type="circle", x=float(next(counter)),
+        )),
+        "update component": lambda db: crud.update_component(
+            db, ids[0], schemas.ComponentUpdate(x=float(next(counter)))
+        ),
+        "bulk translate": lambda db: crud.translate_components(
+            db, schemas.TranslateRequest(frame_id=frame_id, dx=1.0, dy=0.0)
+        ),
+    }
+
+
+def measure(engine, iterations: int) -> dict:
+    """Median and p95 milliseconds per operation"""
+    models.Base.metadata.create_all(bind=engine, checkfirst=False)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    frame_id, ids = seed(session_factory)
+    results = {}
+    for label, call in operations(frame_id, ids).items():
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            with session_factory() as db:
+                call(db)
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        results[label] = (statistics.median(samples), samples[int(len(samples) * 0.95) - 1])
+    return results
+
+
+def main() -> None:
+    """Print a latency table per backend"""
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    backends = {}
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    sqlite_engine = create_database_engine(f"sqlite:///{path}")
+    try:
+        backends["sqlite"] = measure(sqlite_engine, iterations)
+    finally:
+        sqlite_engine.dispose()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.unlink(path + suffix)
+
+    postgres_url = os.environ.get("BENCH_POSTGRES_URL")
+    if postgres_url:
+        admin = create_database_engine(postgres_url)
+        with admin.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        postgres_engine = create_engine(
+            postgres_url, pool_size=10, max_overflow=20,
+            connect_args={"options": f"-csearch_path={SCHEMA},public"},
+        )
+        try:
+            backends["postgresql"] = measure(postgres_engine, iterations)
+        finally:
+            postgres_engine.dispose()
+            with admin.begin() as conn:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            admin.dispose()
+
+    names = list(backends)
+    header = f"{'operation (ms, median / p95)':<30}" + "".join(f"{name:>22}" for name in names)
+    print(header)
+    for label in next(iter(backends.values())):
+        row = f"{label:<30}"
+        for name in names:
+            median, p95 = backends[name][label]
+            row += f"{median:>12.2f} / {p95:>7.2f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Load test request coalescing under a thundering herd
+
+Seeds a temporary SQLite database with one shared project, then for
+several rounds makes an edit and has every client call
+``GET /api/frames?project_id=`` at the same moment, as their
+``refreshFrames`` would. Runs the herd through the real app with
+coalescing off and on and reports the database queries and latency of
+each. Admission control still applies, so refreshes that wait too long
+for a slot are rejected with 503 and counted.
+
+Run from the backend directory:
+    python -m benchmarks.bench_coalescing [clients] [rounds]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+FRAMES = 20
+COMPONENTS_PER_FRAME = 200
+
+
+def seed(session_factory, models) -> int:
+    """One project with FRAMES frames of COMPONENTS_PER_FRAME shapes"""
+    with session_factory() as db:
+        project = models.Project(name="Shared plant")
+        db.add(project)
+        db.flush()
+        for f in range(FRAMES):
+            frame = models.Frame(project_id=project.id, name=f"Line {f}")
+            db.add(frame)
+            db.flush()
+            db.add_all([
+                models.Component(frame_id=frame.id, name=f"Pump-{i}", type="rectangle", x=i * 150.0, y=0.0)
+                for i in range(COMPONENTS_PER_FRAME)
+            ])
+        db.commit()
+        return project.id
+
+
+async def herd(app, project_id: int, clients: int, rounds: int) -> tuple[list[float], int]:
+    """Latencies of the successful refreshes and the number rejected, one edit before each round"""
+    latencies = []
+    rejected = 0
+    async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=None) as client:
+        frame_id = (await client.get("/api/frames", params={"project_id": project_id, "limit": 1})).json()[0]["id"]
+
+        async def refresh(client_id: int) -> None:
+            nonlocal rejected
+            start = time.perf_counter()
+            response = await client.get(
+                "/api/frames", params={"project_id": project_id}, headers={"X-Client-ID": str(client_id)}
+            )
+            if response.status_code == 503:
+                rejected += 1
+                return
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        for r in range(rounds):
+            await client.put(f"/api/frames/{frame_id}", json={"name": f"Line 0 (edit {r})"})
+            await asyncio.gather(*(refresh(i) for i in range(clients)))
+    return latencies, rejected
+
+
+def main() -> None:
+    """Print queries and latency per refresh with coalescing off and on"""
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The app reads its settings at import time
+        os.environ["DB_BACKEND"] = "sqlite"
+        os.environ["SQLITE_PATH"] = str(Path(tmp) / "bench.db")
+        from sqlalchemy import event
+
+        from app import models
+        from app.coalesce import request_coalescer
+        from app.database import SessionLocal, engine
+        from app.main import app
+
+        project_id = seed(SessionLocal, models)
+        queries = 0
+
+        def count(*args) -> None:
+            nonlocal queries
+            queries += 1
+
+        event.listen(engine, "before_cursor_execute", count)
+
+        paths = request_coalescer.paths
+        print(f"{clients} clients x {rounds} rounds, {FRAMES} frames of {COMPONENTS_PER_FRAME} components")
+        print(f"{'coalescing':<12}{'queries':>9}{'per refresh':>13}{'median ms':>11}{'p95 ms':>9}"
+              f"{'total s':>9}{'rejected':>10}")
+        for label, enabled in (("off", False), ("on", True)):
+            request_coalescer.paths = paths if enabled else ()
+            queries = 0
+            start = time.perf_counter()
+            latencies, rejected = asyncio.run(herd(app, project_id, clients, rounds))
+            latencies.sort()
+            elapsed = time.perf_counter() - start
+            # The edits and the frame lookup run queries of their own
+            print(f"{label:<12}{queries:>9}{queries / (clients * rounds):>13.2f}"
+                  f"{statistics.median(latencies):>11.1f}{latencies[int(len(latencies) * 0.95) - 1]:>9.1f}"
+                  f"{elapsed:>9.2f}{rejected:>10}")
+        print(f"deduplicated: {request_coalescer.metrics()['coalesced']} of {request_coalescer.metrics()['requests']}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
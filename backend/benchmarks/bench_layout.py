@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Benchmark the layout engine across graph sizes
+
+Graphs are random sparse DAGs shaped like plant flows (each node feeds one
+or two later nodes). Only the layout math is timed; the database round
+trip is one SELECT and one executemany UPDATE regardless of size.
+
+Run from the backend directory:
+    python -m benchmarks.bench_layout [sizes...]
+"""
+import sys
+import time
+
+import numpy as np
+
+from app.layout import edge_index, force_layout, layered_layout
+
+DEFAULT_SIZES = [100, 1000, 5000, 10000, 20000]
+
+
+def random_flow_graph(n: int, seed: int = 0) -> np.ndarray:
+    """Random DAG with roughly 1.5 edges per node"""
+    rng = np.random.default_rng(seed)
+    edges = []
+    for i in range(n - 1):
+        for _ in range(1 + int(rng.random() < 0.5)):
+            edges.append((i, int(rng.integers(i + 1, min(n, i + 50)))))
+    return edge_index(list(range(n)), edges)
+
+
+def timed(func, *args, **kwargs) -> float:
+    """Wall time of one call in seconds"""
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    """Time both algorithms for each size"""
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    print(f"{'nodes':>8} {'edges':>8} {'layered':>10} {'force':>10}")
+    for n in sizes:
+        edges = random_flow_graph(n)
+        layered = timed(layered_layout, n, edges)
+        force = timed(force_layout, n, edges)
+        print(f"{n:>8} {len(edges):>8} {layered:>9.3f}s {force:>9.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark the latency the log path adds to a request
+
+Compares a synchronous file handler (what ``logging.basicConfig`` gives us)
+with the queue-based pipeline from ``app.logging_config``. Each simulated
+request logs two INFO lines and, every tenth request, an ERROR with a
+traceback, which matches the shape of the project endpoints.
+
+Run from the backend directory:
+    python -m benchmarks.bench_logging
+"""
+import logging
+import statistics
+import sys
+import tempfile
+import time
+
+from app.config import Settings
+from app import logging_config
+
+REQUESTS = 20000
+
+
+def simulate_request(logger: logging.Logger, i: int) -> None:
+    """Emit the log records of one request"""
+    logger.info("Creating project with name: %s", f"project-{i}")
+    logger.info("Project created successfully with id: %s", i)
+    if i % 10 == 0:
+        try:
+            raise ValueError(f"failure {i}")
+        except ValueError as e:
+            logger.error("Failed to create project: %s", e, exc_info=True)
+
+
+def run(label: str, logger: logging.Logger) -> None:
+    """Time the log path of ``REQUESTS`` simulated requests"""
+    samples = []
+    for i in range(REQUESTS):
+        start = time.perf_counter()
+        simulate_request(logger, i)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    print(
+        f"{label:<12} mean={statistics.fmean(samples):8.2f}us "
+        f"p50={samples[len(samples) // 2]:8.2f}us "
+        f"p99={samples[int(len(samples) * 0.99)]:8.2f}us",
+        file=sys.__stdout__,
+    )
+
+
+def main() -> None:
+    """Run both configurations against a temporary log file"""
+    with tempfile.NamedTemporaryFile("w", suffix=".log") as log_file:
+        root = logging.getLogger()
+        logger = logging.getLogger("bench")
+
+        handler = logging.StreamHandler(log_file)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        root.handlers = [handler]
+        root.setLevel(logging.DEBUG)
+        run("sync", logger)
+
+        settings = Settings(LOG_LEVEL="DEBUG", LOG_QUEUE_SIZE=REQUESTS * 3)
+        stdout = sys.stdout
+        sys.stdout = log_file
+        try:
+            logging_config.setup_logging(settings)
+            run("queue+json", logger)
+            logging_config.shutdown_logging()
+        finally:
+            sys.stdout = stdout
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark overlap detection
+
+Scatters machine-sized boxes over a plant-sized area at a density where a
+few percent of them collide, and times the grid search. The brute-force
+check is only run for sizes where its n^2 matrix still fits in memory.
+
+Run from the backend directory:
+    python -m benchmarks.bench_overlaps [sizes...]
+"""
+import sys
+import time
+
+import numpy as np
+
+from app.geometry import find_overlaps
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+BRUTE_FORCE_LIMIT = 5000
+
+
+def random_plant(n: int, seed: int = 0):
+    """Random boxes with roughly constant density"""
+    rng = np.random.default_rng(seed)
+    side = 320.0 * np.sqrt(n)
+    return (
+        np.arange(n),
+        rng.uniform(0, side, n),
+        rng.uniform(0, side, n),
+        rng.uniform(50, 150, n),
+        rng.uniform(50, 150, n),
+    )
+
+
+def brute_force(x, y, width, height) -> int:
+    """Count overlapping pairs with an n^2 comparison"""
+    left, right = x - width / 2, x + width / 2
+    bottom, top = y - height / 2, y + height / 2
+    hit = (
+        (left[:, None] < right[None, :]) & (left[None, :] < right[:, None])
+        & (bottom[:, None] < top[None, :]) & (bottom[None, :] < top[:, None])
+    )
+    return int(np.triu(hit, 1).sum())
+
+
+def main() -> None:
+    """Time the grid search for each size"""
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    print(f"{'boxes':>9} {'pairs':>8} {'grid':>9} {'brute':>9}")
+    for n in sizes:
+        ids, x, y, width, height = random_plant(n)
+        start = time.perf_counter()
+        pairs = find_overlaps(ids, x, y, width, height)
+        grid = time.perf_counter() - start
+
+        brute = "-"
+        if n <= BRUTE_FORCE_LIMIT:
+            start = time.perf_counter()
+            assert brute_force(x, y, width, height) == len(pairs)
+            brute = f"{time.perf_counter() - start:.3f}s"
+        print(f"{n:>9} {len(pairs):>8} {grid:>8.3f}s {brute:>9}")
+
+
+if __name__ == "__main__":
+    main()
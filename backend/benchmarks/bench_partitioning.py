@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-frame reads and project deletes on a partitioned components table
+
+For each total size, seeds PostgreSQL with projects of 10 frames of 200
+components each, so frames and projects stay the same size while the
+table grows, then times reading whole frames and deleting projects with
+the plain table and after hash-partitioning it online (the same steps
+migrate_partition_components.py runs). Needs BENCH_POSTGRES_URL; works
+in its own schema and drops it afterwards.
+
+Run from the backend directory:
+    BENCH_POSTGRES_URL=postgresql://postgres@localhost/postgres \\
+        python -m benchmarks.bench_partitioning [sizes] [partitions] [iterations]
+
+e.g. ``python -m benchmarks.bench_partitioning 100000,1000000,4000000 16 200``.
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app import crud, models, partitioning
+
+SCHEMA = "bench_partitioning"
+FRAMES_PER_PROJECT = 10
+COMPONENTS_PER_FRAME = 200
+DELETES = 5
+
+
+def seed(engine, components: int) -> tuple[int, int]:
+    """Projects of FRAMES_PER_PROJECT frames of COMPONENTS_PER_FRAME components; returns (projects, frames)"""
+    frames = max(components // COMPONENTS_PER_FRAME, FRAMES_PER_PROJECT * (DELETES + 1))
+    projects = frames // FRAMES_PER_PROJECT
+    frames = projects * FRAMES_PER_PROJECT
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO projects (id, name) SELECT g, 'Plant ' || g FROM generate_series(1, :n) g"
+        ), {"n": projects})
+        conn.execute(text(
+            "INSERT INTO frames (id, project_id, name) "
+            "SELECT g, (g - 1) / :per_project + 1, 'Line ' || g FROM generate_series(1, :n) g"
+        ), {"n": frames, "per_project": FRAMES_PER_PROJECT})
+        # Interleaved like rows written over time, not clustered by frame
+        conn.execute(text(
+            "INSERT INTO components (frame_id, name, type, x, y, width, height, properties) "
+            "SELECT (g - 1) % :frames + 1, 'Pump-' || g, 'rectangle', g % 1000, g / 1000, 100, 100, '{}'::json "
+            "FROM generate_series(1, :n) g"
+        ), {"n": frames * COMPONENTS_PER_FRAME, "frames": frames})
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE"))
+    return projects, frames
+
+
+def partition(engine, count: int) -> None:
+    """Convert the seeded table the way the migration does"""
+    partitioning.create_partitioned_table(engine, count)
+    partitioning.install_sync_trigger(engine)
+    partitioning.backfill(engine, 100_000)
+    partitioning.swap(engine)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE components"))
+
+
+def measure(engine, frame_ids: list[int], project_ids: list[int]) -> tuple[list[float], list[float]]:
+    """Latencies in ms of reading each frame and of deleting each project"""
+    reads = []
+    for frame_id in frame_ids:
+        with Session(engine) as db:
+            begin = time.perf_counter()
+            crud.get_components_by_frame(db, frame_id)
+            reads.append((time.perf_counter() - begin) * 1000)
+    deletes = []
+    for project_id in project_ids:
+        with Session(engine) as db:
+            begin = time.perf_counter()
+            crud.delete_project(db, project_id)
+            deletes.append((time.perf_counter() - begin) * 1000)
+    return sorted(reads), sorted(deletes)
+
+
+def main() -> None:
+    """Print read and delete latency per table size, unpartitioned and partitioned"""
+    url = os.environ.get("BENCH_POSTGRES_URL")
+    if not url:
+        sys.exit("BENCH_POSTGRES_URL is not set")
+    sizes = [int(size) for size in sys.argv[1].split(",")] if len(sys.argv) > 1 else [100_000, 1_000_000]
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    iterations = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    admin = create_engine(url)
+    engine = create_engine(url, connect_args={"options": f"-csearch_path={SCHEMA},public"})
+    print(f"frames of {COMPONENTS_PER_FRAME} components, projects of {FRAMES_PER_PROJECT} frames; "
+          f"{iterations} frame reads, {DELETES} project deletes")
+    print(f"{'components':>12}{'partitions':>12}{'read median ms':>16}{'read p95 ms':>13}{'delete median ms':>18}")
+    try:
+        for size in sizes:
+            for label, partitions in (("-", 0), (str(count), count)):
+                with admin.begin() as conn:
+                    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+                    conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+                engine.dispose()
+                models.Base.metadata.create_all(bind=engine, checkfirst=False)
+                projects, frames = seed(engine, size)
+                if partitions:
+                    partition(engine, partitions)
+
+                rng = random.Random(size)
+                # Deleted projects are the last ones; reads stay clear of them
+                frame_ids = [rng.randint(1, frames - DELETES * FRAMES_PER_PROJECT) for _ in range(iterations)]
+                project_ids = list(range(projects - DELETES + 1, projects + 1))
+                reads, deletes = measure(engine, frame_ids, project_ids)
+                print(f"{frames * COMPONENTS_PER_FRAME:>12,}{label:>12}{statistics.median(reads):>16.2f}"
+                      f"{reads[int(len(reads) * 0.95) - 1]:>13.2f}{statistics.median(deletes):>18.1f}")
+    finally:
+        engine.dispose()
+        with admin.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        admin.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark revision reconstruction and restore on a large frame
+
+Builds a 10k-component frame in a temporary SQLite database, records it
+as one import revision, applies a series of edits (bulk moves and single
+component updates, crossing a checkpoint), then times reconstructing and
+restoring the import revision.
+
+Run from the backend directory:
+    python -m benchmarks.bench_revisions [components]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, revisions, schemas
+from app.database import create_database_engine
+
+
+def timed(label: str, func, *args):
+    """Run ``func`` and print its wall time"""
+    start = time.perf_counter()
+    result = func(*args)
+    print(f"{label:<32} {time.perf_counter() - start:8.3f}s")
+    return result
+
+
+def main() -> None:
+    """Build the frame, edit it and restore the original"""
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine = create_database_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    try:
+        project = crud.create_project(db, schemas.ProjectCreate(name="Bench"))
+        frame = crud.create_frame(db, schemas.FrameCreate(name="Plant", project_id=project.id))
+        rows = [
+            {"frame_id": frame.id, "name": f"Machine-{i}", "type": "rectangle",
+             "x": float(i % 100) * 150, "y": float(i // 100) * 150,
+             "width": 100.0, "height": 100.0, "properties": {"color": "#888"}}
+            for i in range(n)
+        ]
+        db.execute(models.Component.__table__.insert(), rows)
+        import_revision = revisions.record(db, frame.id, revisions.diff(
+            {"frame": {"name": "Plant"}, "components": {}},
+            revisions.current_state(db, frame.id),
+        ))
+        db.commit()
+
+        component_ids = [c.id for c in crud.get_components_by_frame(db, frame.id)[:60]]
+        for i in range(5):
+            crud.translate_components(db, schemas.TranslateRequest(frame_id=frame.id, dx=10, dy=i))
+        for component_id in component_ids:
+            crud.update_component(db, component_id, schemas.ComponentUpdate(x=-1.0))
+        latest = revisions.latest_revision(db, frame.id)
+        print(f"{n} components, {latest} revisions")
+
+        timed("read current components", crud.get_components_by_frame, db, frame.id)
+        timed(f"reconstruct revision {import_revision}", revisions.reconstruct, db, frame.id, import_revision)
+        timed(f"reconstruct revision {latest}", revisions.reconstruct, db, frame.id, latest)
+        timed(f"restore revision {import_revision}", revisions.restore, db, frame.id, import_revision)
+    finally:
+        db.close()
+        engine.dispose()
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
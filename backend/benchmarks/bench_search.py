@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark name search at the million-row scale
+
+Seeds PostgreSQL with 200 projects, 10 000 frames and a million components
+named like a plant ("Pump-17", "Valve-42", ...) and times typical sidebar
+searches: exact names, prefixes, substrings and a search scoped to one
+project. Needs BENCH_POSTGRES_URL; works in its own schema and drops it
+afterwards.
+
+Run from the backend directory:
+    BENCH_POSTGRES_URL=postgresql://postgres@localhost/postgres \\
+        python -m benchmarks.bench_search [components] [iterations]
+"""
+import os
+import statistics
+import sys
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app import models, search
+
+SCHEMA = "bench_search"
+PROJECTS = 200
+FRAMES = 10_000
+DEFAULT_COMPONENTS = 1_000_000
+KINDS = ["Pump", "Valve", "Tank", "Conveyor", "Mixer", "Sensor", "Heat Exchanger", "Compressor"]
+
+QUERIES = [
+    ("exact", "Pump-17", None),
+    ("prefix", "valve-4", None),
+    ("short prefix", "ta", None),
+    ("substring", "exchanger-99", None),
+    ("broad substring", "ump", None),
+    ("no match", "reactor", None),
+    ("in project", "pump", PROJECTS // 2),
+]
+
+
+def seed(engine, components: int) -> None:
+    """Deterministic plant-like names"""
+    kinds = "ARRAY[" + ", ".join(f"'{kind}'" for kind in KINDS) + "]"
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO projects (id, name) SELECT g, 'Plant ' || g FROM generate_series(1, :n) g"
+        ), {"n": PROJECTS})
+        conn.execute(text(
+            "INSERT INTO frames (id, project_id, name) "
+            "SELECT g, (g - 1) % :projects + 1, 'Line ' || g FROM generate_series(1, :n) g"
+        ), {"n": FRAMES, "projects": PROJECTS})
+        conn.execute(text(
+            "INSERT INTO components (frame_id, name, type, x, y, width, height, properties) "
+            f"SELECT (g - 1) % :frames + 1, ({kinds})[g % {len(KINDS)} + 1] || '-' || (g / {len(KINDS)}), "
+            "'rectangle', 0, 0, 100, 100, '{}'::json FROM generate_series(1, :n) g"
+        ), {"n": components, "frames": FRAMES})
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE"))
+
+
+def main() -> None:
+    """Print median and p95 latency per query"""
+    url = os.environ.get("BENCH_POSTGRES_URL")
+    if not url:
+        sys.exit("BENCH_POSTGRES_URL is not set")
+    components = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COMPONENTS
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    admin = create_engine(url)
+    with admin.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    engine = create_engine(url, connect_args={"options": f"-csearch_path={SCHEMA},public"})
+    try:
+        start = time.perf_counter()
+        models.Base.metadata.create_all(bind=engine, checkfirst=False)
+        seed(engine, components)
+        print(f"Seeded {components:,} components in {time.perf_counter() - start:.1f}s")
+
+        print(f"{'query':<34}{'hits':>6}{'median ms':>12}{'p95 ms':>10}")
+        for label, query, project_id in QUERIES:
+            samples = []
+            for _ in range(iterations):
+                with Session(engine) as db:
+                    begin = time.perf_counter()
+                    result = search.search(db, query, project_id=project_id)
+                    samples.append((time.perf_counter() - begin) * 1000)
+            samples.sort()
+            hits = len(result["items"])
+            print(f"{label + ' (' + query + ')':<34}{hits:>6}"
+                  f"{statistics.median(samples):>12.2f}{samples[int(len(samples) * 0.95) - 1]:>10.2f}")
+    finally:
+        engine.dispose()
+        with admin.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        admin.dispose()
+
+
+if __name__ == "__main__":
+    main()
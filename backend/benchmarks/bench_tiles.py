@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark the frame tile pyramid
+
+Scatters shapes over a plant-sized area and, for each zoom level, times
+building the level index and encoding the tiles of a 1920x1080 viewport
+at the center of the plant, and reports what the viewport transfers
+gzipped compared to sending every visible shape as component JSON.
+
+Run from the backend directory:
+    python -m benchmarks.bench_tiles [shapes]
+"""
+import math
+import sys
+import time
+
+import numpy as np
+
+from app.config import get_settings
+from app.tiles import TileIndex, encode
+
+DEFAULT_SHAPES = 1_000_000
+VIEWPORT = (1920, 1080)
+TILE_PIXELS = 256
+
+
+def random_plant(n: int, seed: int = 0) -> TileIndex:
+    """Random shapes with roughly constant density"""
+    settings = get_settings()
+    rng = np.random.default_rng(seed)
+    side = 320.0 * np.sqrt(n)
+    return TileIndex(
+        ids=np.arange(1, n + 1),
+        types=rng.integers(0, 3, n),
+        x=rng.uniform(0, side, n),
+        y=rng.uniform(0, side, n),
+        width=rng.uniform(50, 150, n),
+        height=rng.uniform(50, 150, n),
+        type_names=["circle", "rectangle", "triangle"],
+        world_size=settings.TILE_WORLD_SIZE,
+    )
+
+
+def main() -> None:
+    """Time each zoom level for a viewport at the plant's center"""
+    settings = get_settings()
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SHAPES
+    index = random_plant(n)
+    center = index.x.mean(), index.y.mean()
+    # Component JSON is roughly this many bytes per shape
+    per_shape = 250
+
+    print(f"{n} shapes")
+    print(f"{'z':>3} {'tiles':>6} {'shapes':>9} {'index':>8} {'encode':>8} {'gzip KB':>8} {'full MB':>8}")
+    for z in range(0, 12):
+        size = index.tile_size(z)
+        # Pixels per world unit when one tile fills TILE_PIXELS
+        half_w = VIEWPORT[0] / 2 / (TILE_PIXELS / size)
+        half_h = VIEWPORT[1] / 2 / (TILE_PIXELS / size)
+        xs = range(math.floor((center[0] - half_w) / size), math.floor((center[0] + half_w) / size) + 1)
+        ys = range(math.floor((center[1] - half_h) / size), math.floor((center[1] + half_h) / size) + 1)
+
+        start = time.perf_counter()
+        index.members(z, 0, 0)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        shapes = transferred = 0
+        for tx in xs:
+            for ty in ys:
+                tile = index.tile(z, tx, ty, settings.TILE_GRID, settings.TILE_DETAIL_LIMIT)
+                body, gzipped = encode(tile)
+                shapes += tile["count"]
+                transferred += len(gzipped or body)
+        elapsed = time.perf_counter() - start
+        tiles = len(xs) * len(ys)
+        print(
+            f"{z:>3} {tiles:>6} {shapes:>9} {build:>7.3f}s {elapsed:>7.3f}s "
+            f"{transferred / 1024:>8.1f} {shapes * per_shape / 1e6:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
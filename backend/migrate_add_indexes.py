@@ -0,0 +1,67 @@
+"""
+Migration script to add the indexes the hot queries in crud.py rely on
+
+``create_all`` only creates indexes together with new tables, so existing
+databases need this once. Indexes are built CONCURRENTLY so the tables
+stay writable while it runs, partition by partition on a partitioned
+components table.
+"""
+import sys
+from sqlalchemy import text
+from app import partitioning
+from app.database import engine
+
+# Extensions the indexes need
+EXTENSIONS = ["pg_trgm"]
+
+# (index name, table, definition after "ON table"); must match what the models generate
+INDEXES = [
+    # get_components_by_frame, sparse/overlap/layout queries, frame delete cascade
+    ("ix_components_frame_id", "components", "(frame_id)"),
+    # Name search: prefix ranges and ordering, then substring matches
+    ("ix_projects_name_key", "projects", '(lower(name) COLLATE "C")'),
+    ("ix_projects_name_trgm", "projects", "USING gin (lower(name) gin_trgm_ops)"),
+    ("ix_frames_name_key", "frames", '(lower(name) COLLATE "C")'),
+    ("ix_frames_name_trgm", "frames", "USING gin (lower(name) gin_trgm_ops)"),
+    ("ix_components_name_key", "components", '(lower(name) COLLATE "C")'),
+    ("ix_components_name_trgm", "components", "USING gin (lower(name) gin_trgm_ops)"),
+]
+
+
+def migrate():
+    """Run migration to add missing indexes"""
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        try:
+            for extension in EXTENSIONS:
+                conn.execute(text(f"CREATE EXTENSION IF NOT EXISTS {extension};"))
+
+            for name, table, definition in INDEXES:
+                result = conn.execute(
+                    text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+                    {"name": name},
+                )
+                valid = result.scalar()
+                if valid:
+                    print(f"Index {name} already exists.")
+                    continue
+                if valid is not None and not partitioning.is_partitioned(conn, table):
+                    # Left behind by an interrupted concurrent build; on a
+                    # partitioned table the build resumes where it stopped
+                    print(f"Dropping invalid index {name}...")
+                    conn.execute(text(f"DROP INDEX CONCURRENTLY {name};"))
+
+                print(f"Creating index {name} on {table} {definition}...")
+                partitioning.create_index_concurrently(conn, name, table, definition)
+                conn.execute(text(f"ANALYZE {table};"))
+
+            print("Migration completed successfully!")
+
+        except Exception as e:
+            print(f"Migration failed: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            sys.exit(1)
+
+if __name__ == "__main__":
+    migrate()
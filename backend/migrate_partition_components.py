@@ -0,0 +1,78 @@
+"""
+Migration script to hash-partition the components table by frame_id (PostgreSQL)
+
+Copies the table into a partitioned one while the application keeps
+running; only the final rename takes a lock, for a moment. An interrupted
+run can simply be started again. See app/partitioning.py.
+"""
+import argparse
+import sys
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app import partitioning
+from app.database import engine
+
+SWAP_ATTEMPTS = 10
+
+
+def migrate(count: int, batch_size: int):
+    """Run migration to partition components"""
+    try:
+        with engine.connect() as conn:
+            if partitioning.is_partitioned(conn):
+                print(f"Table components already has {len(partitioning.partitions(conn))} partitions.")
+                return
+            resuming = conn.execute(text("SELECT to_regclass(:table)"), {"table": partitioning.NEW_TABLE}).scalar()
+            has_trigger = conn.execute(
+                text("SELECT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = :name)"),
+                {"name": partitioning.TRIGGER},
+            ).scalar()
+
+        if resuming:
+            print(f"Resuming: {partitioning.NEW_TABLE} already exists.")
+        else:
+            print(f"Creating {partitioning.NEW_TABLE} with {count} partitions...")
+            partitioning.create_partitioned_table(engine, count)
+        if not has_trigger:
+            partitioning.install_sync_trigger(engine)
+        print("Writes to components are now mirrored into the new table.")
+
+        with engine.connect() as conn:
+            resume_after = partitioning.backfilled_up_to(conn)
+        if resume_after:
+            print(f"Continuing the copy after id {resume_after:,}.")
+        start = time.monotonic()
+
+        def progress(done: int, last: int) -> None:
+            print(f"\rCopied ids up to {done:,} of {last:,} ({time.monotonic() - start:.0f}s)", end="", flush=True)
+
+        copied = partitioning.backfill(engine, batch_size, start_after=resume_after, progress=progress)
+        print(f"\nCopied {copied:,} rows.")
+
+        for attempt in range(1, SWAP_ATTEMPTS + 1):
+            try:
+                partitioning.swap(engine)
+                break
+            except OperationalError as e:
+                if "lock timeout" not in str(e) or attempt == SWAP_ATTEMPTS:
+                    raise
+                print(f"Table busy, retrying the swap ({attempt}/{SWAP_ATTEMPTS})...")
+                time.sleep(1)
+        print("Migration completed successfully!")
+
+    except Exception as e:
+        print(f"Migration failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--partitions", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=50000, help="ids per copy transaction")
+    args = parser.parse_args()
+    migrate(args.partitions, args.batch_size)
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+"""
+Precompress the frontend build so the backend can serve .br/.gz variants
+"""
+import sys
+from pathlib import Path
+
+from app.static_files import precompress_directory
+
+FRONTEND_BUILD_DIR = Path(__file__).parent.parent / "frontend" / "build"
+
+if __name__ == "__main__":
+    build_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else FRONTEND_BUILD_DIR
+    if not build_dir.exists():
+        print(f"Build directory not found: {build_dir}")
+        sys.exit(1)
+    count = precompress_directory(build_dir)
+    print(f"Wrote {count} precompressed files under {build_dir}")
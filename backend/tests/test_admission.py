@@ -0,0 +1,160 @@
+"""
+Unit tests for admission control
+"""
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.admission import (
+    BULK, INTERACTIVE, AdmissionController, AdmissionMiddleware, AdmissionRejected, request_priority
+)
+
+
+def controller(**overrides) -> AdmissionController:
+    """Controller with small limits"""
+    options = dict(capacity=2, bulk_capacity=1, max_queue=2, queue_timeout=0.2, per_client=5)
+    options.update(overrides)
+    return AdmissionController(**options)
+
+
+def test_bulk_writes_leave_room_for_reads():
+    """Writes only use bulk_capacity slots; reads still get in"""
+    async def scenario():
+        admission = controller(queue_timeout=0.05)
+        await admission.acquire(BULK, "a", None)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire(BULK, "b", None)
+        await admission.acquire(INTERACTIVE, "c", None)
+        return admission, rejected.value
+
+    admission, rejected = asyncio.run(scenario())
+    assert rejected.status_code == 503
+    assert rejected.reason == "queue_timeout"
+    assert admission.in_flight == 2
+
+
+def test_reads_are_woken_before_writes():
+    """A freed slot goes to a queued read even if a write queued first"""
+    async def scenario():
+        admission = controller(bulk_capacity=2)
+        await admission.acquire(BULK, "a", None)
+        await admission.acquire(BULK, "a", None)
+        order = []
+
+        async def request(priority, client):
+            await admission.acquire(priority, client, None)
+            order.append(priority)
+
+        write = asyncio.create_task(request(BULK, "b"))
+        await asyncio.sleep(0)
+        read = asyncio.create_task(request(INTERACTIVE, "c"))
+        await asyncio.sleep(0)
+        assert admission.metrics()["queue_depth"] == 2
+
+        admission.release(BULK, "a", None)
+        await read
+        admission.release(BULK, "a", None)
+        await write
+        return order
+
+    assert asyncio.run(scenario()) == [INTERACTIVE, BULK]
+
+
+def test_full_queue_is_rejected_immediately():
+    """Requests beyond max_queue get 503 without waiting"""
+    async def scenario():
+        admission = controller(capacity=1, max_queue=1, queue_timeout=5.0)
+        await admission.acquire(INTERACTIVE, "a", None)
+        waiting = asyncio.create_task(admission.acquire(INTERACTIVE, "b", None))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire(INTERACTIVE, "c", None)
+        admission.release(INTERACTIVE, "a", None)
+        await waiting
+        return admission, rejected.value
+
+    admission, rejected = asyncio.run(scenario())
+    assert rejected.status_code == 503
+    assert rejected.reason == "queue_full"
+    assert rejected.retry_after == 5
+    assert admission.metrics()["rejected"] == {"queue_full": 1}
+    assert admission.in_flight == 1
+
+
+def test_client_and_route_limits():
+    """Per-client and per-route limits answer 429"""
+    async def scenario():
+        admission = controller(capacity=10, bulk_capacity=10, per_client=1,
+                               route_limits={"POST /api/components": 1, "POST /api/components/bulk/*": 1})
+        await admission.acquire(INTERACTIVE, "a", None)
+        with pytest.raises(AdmissionRejected) as client_limit:
+            await admission.acquire(INTERACTIVE, "a", None)
+        assert admission.route_key("POST", "/api/components") == "POST /api/components"
+        assert admission.route_key("POST", "/api/components/positions") is None
+        route = admission.route_key("POST", "/api/components/bulk/translate")
+        assert route == "POST /api/components/bulk/*"
+        await admission.acquire(BULK, "b", route)
+        with pytest.raises(AdmissionRejected) as route_limit:
+            await admission.acquire(BULK, "c", route)
+        admission.release(BULK, "b", route)
+        await admission.acquire(BULK, "c", route)
+        return client_limit.value, route_limit.value
+
+    client_limit, route_limit = asyncio.run(scenario())
+    assert (client_limit.status_code, client_limit.reason) == (429, "client_limit")
+    assert (route_limit.status_code, route_limit.reason) == (429, "route_limit")
+
+
+def test_only_bulk_operations_are_bulk():
+    """Single-component edits and drags are interactive; bulk edits, layouts and jobs aren't"""
+    assert request_priority("GET", "/api/frames/1") == INTERACTIVE
+    assert request_priority("PUT", "/api/components/7") == INTERACTIVE
+    assert request_priority("DELETE", "/api/components/7") == INTERACTIVE
+    assert request_priority("POST", "/api/components/positions") == INTERACTIVE
+    assert request_priority("POST", "/api/components/bulk/translate") == BULK
+    assert request_priority("POST", "/api/frames/3/layout") == BULK
+    assert request_priority("POST", "/api/jobs") == BULK
+    assert request_priority("POST", "/api/jobs/4/cancel") == INTERACTIVE
+
+
+def test_cancelled_waiter_releases_its_place():
+    """A client that disconnects while queued doesn't leak counts"""
+    async def scenario():
+        admission = controller(capacity=1, queue_timeout=5.0)
+        await admission.acquire(INTERACTIVE, "a", None)
+        waiting = asyncio.create_task(admission.acquire(INTERACTIVE, "b", None))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        admission.release(INTERACTIVE, "a", None)
+        return admission
+
+    admission = asyncio.run(scenario())
+    assert admission.metrics()["in_flight"] == 0
+    assert admission.metrics()["queue_depth"] == 0
+    assert not admission._clients
+
+
+def test_middleware_rejects_with_retry_after():
+    """Rejected requests get JSON, the status code and Retry-After"""
+    app = FastAPI()
+    admission = controller(per_client=0)
+    app.add_middleware(AdmissionMiddleware, controller=admission)
+
+    @app.get("/api/items")
+    def items():
+        return []
+
+    @app.get("/api/health")
+    def health():
+        return {"status": "healthy"}
+
+    client = TestClient(app)
+    response = client.get("/api/items", headers={"X-Client-ID": "flood"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert "client_limit" in response.json()["detail"]
+    assert client.get("/api/health").status_code == 200
@@ -0,0 +1,101 @@
+"""
+Unit tests for project cold storage
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import sessionmaker
+
+from app import archive, models, revisions
+from app.database import create_database_engine
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Session on a fresh SQLite database with two projects"""
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'archive.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    for project_id in (1, 2):
+        session.add(models.Project(id=project_id, name=f"P{project_id}"))
+        session.add(models.Frame(id=project_id, project_id=project_id, name=f"F{project_id}"))
+    session.add_all([
+        models.Component(id=1, frame_id=1, name="a", type="circle", x=1.0, y=2.0, properties={"color": "red"}),
+        models.Component(id=2, frame_id=1, name="b", type="rectangle", x=3.0, y=4.0),
+        models.Component(id=3, frame_id=2, name="c", type="circle"),
+    ])
+    session.flush()
+    revisions.record(session, 1, {"frame": {"name": "F1"}})
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def count(db, model) -> int:
+    """Rows in a table"""
+    return db.execute(select(func.count()).select_from(model)).scalar()
+
+
+def test_archive_and_rehydrate_round_trip(db):
+    """Archived rows come back with their ids and values"""
+    before = revisions.current_state(db, 1)
+    summary = archive.archive_project(db, 1)
+
+    assert summary["frames"] == 1
+    assert summary["components"] == 2
+    assert summary["revisions"] == 1
+    assert summary["hot_bytes"] > 0
+    assert archive.is_archived(db, 1)
+    assert count(db, models.Component) == 1
+    assert count(db, models.FrameRevision) == 0
+    assert db.get(models.Project, 1) is not None
+    assert archive.archive_project(db, 1) == summary
+
+    assert archive.rehydrate_frame(db, 1)
+    assert not archive.is_archived(db, 1)
+    assert count(db, models.ArchivedFrame) == 0
+    assert revisions.current_state(db, 1) == before
+    assert revisions.reconstruct(db, 1, 1) is not None
+    assert not archive.rehydrate(db, 1)
+
+
+def test_rehydrate_by_component_id(db):
+    """Archived component ids lead back to their project"""
+    archive.archive_project(db, 1)
+    assert count(db, models.ArchivedComponent) == 2
+    assert not archive.rehydrate_components(db, [3, 99])
+    assert archive.rehydrate_components(db, [2])
+    assert not archive.is_archived(db, 1)
+    assert count(db, models.ArchivedComponent) == 0
+    assert db.get(models.Component, 2).name == "b"
+
+
+def test_inactive_projects_follow_latest_activity(db):
+    """A project counts as active if any of its rows changed recently"""
+    old = datetime.now(timezone.utc) - timedelta(days=200)
+    for model in (models.Project, models.Frame, models.Component):
+        db.execute(update(model).values(created_at=old, updated_at=old))
+    db.execute(update(models.FrameRevision).values(created_at=old))
+    db.commit()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=90)
+    assert archive.inactive_projects(db, cutoff, limit=10) == [1, 2]
+
+    db.execute(update(models.Component).where(models.Component.id == 3).values(updated_at=func.now()))
+    db.commit()
+    assert archive.inactive_projects(db, cutoff, limit=10) == [1]
+
+    report = archive.archive_inactive(db, older_than_days=90, limit=10)
+    assert report["archived"] == [1]
+    assert report["components"] == 2
+    assert report["hot_bytes"] >= report["archive_bytes"] > 0
+    assert archive.inactive_projects(db, cutoff, limit=10) == []
+
+
+def test_dry_run_changes_nothing(db):
+    """A dry run only lists candidates"""
+    report = archive.archive_inactive(db, older_than_days=-1, limit=10, dry_run=True)
+    assert report["candidates"] == [1, 2]
+    assert report["archived"] == []
+    assert not archive.is_archived(db, 1)
@@ -0,0 +1,124 @@
+"""
+Unit tests for request coalescing
+"""
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from app.coalesce import CoalescingMiddleware, RequestCoalescer
+
+
+def coalesced_app(coalescer: RequestCoalescer):
+    """App whose reads wait for ``release`` and count how often they run"""
+    app = FastAPI()
+    app.add_middleware(CoalescingMiddleware, coalescer=coalescer)
+    app.state.calls = 0
+    app.state.release = asyncio.Event()
+    app.state.items = []
+
+    @app.get("/api/items")
+    async def items(page: int = 0):
+        app.state.calls += 1
+        await app.state.release.wait()
+        return {"page": page, "items": list(app.state.items)}
+
+    @app.post("/api/items")
+    async def add_item():
+        app.state.items.append(len(app.state.items))
+        return {"count": len(app.state.items)}
+
+    @app.get("/api/other")
+    async def other():
+        app.state.calls += 1
+        return {}
+
+    return app
+
+
+async def settle():
+    """Let started requests reach the endpoint"""
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+def test_identical_reads_share_one_response():
+    """A herd of identical reads runs once; different queries run separately"""
+    async def scenario():
+        coalescer = RequestCoalescer(paths=["/api/items"])
+        app = coalesced_app(coalescer)
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            herd = [asyncio.create_task(client.get("/api/items")) for _ in range(20)]
+            other_page = asyncio.create_task(client.get("/api/items", params={"page": 1}))
+            await settle()
+            app.state.release.set()
+            responses = await asyncio.gather(*herd)
+            await other_page
+            # Paths outside ``paths`` are never coalesced
+            await asyncio.gather(client.get("/api/other"), client.get("/api/other"))
+        return app.state.calls, responses, coalescer.metrics()
+
+    calls, responses, metrics = asyncio.run(scenario())
+    assert calls == 4
+    assert {response.status_code for response in responses} == {200}
+    assert {response.content for response in responses} == {b'{"page":0,"items":[]}'}
+    assert metrics["requests"] == 21
+    assert metrics["executed"] == 2
+    assert metrics["coalesced"] == 19
+    assert metrics["max_shared"] == 20
+    assert metrics["in_flight"] == 0
+
+
+def test_reads_after_a_write_start_a_new_flight():
+    """A read sent after a write returned doesn't get a response started before it"""
+    async def scenario():
+        coalescer = RequestCoalescer(paths=["/api/items"])
+        app = coalesced_app(coalescer)
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            before = asyncio.create_task(client.get("/api/items"))
+            await settle()
+            await client.post("/api/items")
+            after = asyncio.create_task(client.get("/api/items"))
+            await settle()
+            app.state.release.set()
+            return app.state.calls, (await before).json(), (await after).json()
+
+    calls, before, after = asyncio.run(scenario())
+    assert calls == 2
+    assert after["items"] == [0]
+
+
+def test_pinned_clients_only_share_with_each_other():
+    """Clients reading from the primary don't join flights that may read a replica"""
+    async def scenario():
+        coalescer = RequestCoalescer(paths=["/api/items"], is_pinned=lambda client: client == "writer")
+        app = coalesced_app(coalescer)
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            reads = [
+                asyncio.create_task(client.get("/api/items", headers={"X-Client-ID": client_id}))
+                for client_id in ("reader", "writer", "reader")
+            ]
+            await settle()
+            app.state.release.set()
+            await asyncio.gather(*reads)
+        return app.state.calls
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_disconnected_leader_does_not_cancel_the_flight():
+    """The shared request keeps running when the client that started it goes away"""
+    async def scenario():
+        coalescer = RequestCoalescer(paths=["/api/items"])
+        app = coalesced_app(coalescer)
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            leader = asyncio.create_task(client.get("/api/items"))
+            await settle()
+            follower = asyncio.create_task(client.get("/api/items"))
+            await settle()
+            leader.cancel()
+            await settle()
+            app.state.release.set()
+            return (await follower).status_code, app.state.calls
+
+    assert asyncio.run(scenario()) == (200, 1)
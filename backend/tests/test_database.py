@@ -0,0 +1,148 @@
+"""
+Unit tests for engine setup and read replica session routing
+"""
+import threading
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+
+from app import crud, models, schemas
+from app.config import Settings
+from app.database import SessionRouter, client_key, create_database_engine, scope_client_key
+
+
+@pytest.fixture
+def replica_router(tmp_path):
+    """Router with two SQLite files standing in for replica instances"""
+    urls = [f"sqlite:///{tmp_path / name}" for name in ("replica1.db", "replica2.db")]
+    router = SessionRouter(urls, pin_seconds=60.0)
+    for index, replica in enumerate(router.replica_engines):
+        with replica.begin() as conn:
+            conn.execute(text("CREATE TABLE whoami (name TEXT)"))
+            conn.execute(text("INSERT INTO whoami VALUES (:name)"), {"name": f"replica{index + 1}"})
+    yield router
+    for replica in router.replica_engines:
+        replica.dispose()
+
+
+def test_no_replicas_uses_primary():
+    """Without replicas every read goes to the primary"""
+    router = SessionRouter([], pin_seconds=5.0)
+    assert not router.has_replicas
+    assert router.replica_session("client") is None
+
+
+def test_reads_round_robin_over_replicas(replica_router):
+    """Reads alternate between the configured replicas"""
+    seen = []
+    for _ in range(4):
+        session = replica_router.replica_session("client")
+        seen.append(session.execute(text("SELECT name FROM whoami")).scalar())
+        session.close()
+    assert seen == ["replica1", "replica2", "replica1", "replica2"]
+
+
+def test_pinned_client_reads_primary(replica_router):
+    """A client that just wrote is kept on the primary"""
+    replica_router.pin("writer")
+    assert replica_router.replica_session("writer") is None
+
+    other = replica_router.replica_session("reader")
+    assert other is not None
+    other.close()
+
+
+def test_pin_expires(replica_router):
+    """Pinning only lasts for the configured window"""
+    replica_router.pin_seconds = 0.0
+    replica_router.pin("writer")
+    session = replica_router.replica_session("writer")
+    assert session is not None
+    session.close()
+
+
+def test_client_key_of_request_and_scope_agree():
+    """Pinning, admission and coalescing identify a client the same way"""
+    by_header = {"type": "http", "headers": [(b"x-client-id", b"tab-1")], "client": ("10.0.0.1", 5000)}
+    by_host = {"type": "http", "headers": [(b"x-client-id", b"")], "client": ("10.0.0.1", 5000)}
+    for scope, expected in ((by_header, "tab-1"), (by_host, "10.0.0.1"), ({"type": "http"}, "unknown")):
+        assert scope_client_key(scope) == client_key(Request(scope)) == expected
+
+
+def test_sqlite_engine_is_tuned(tmp_path):
+    """SQLite engines run in WAL mode and enforce foreign keys"""
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'nested' / 'app.db'}")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 1
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+    engine.dispose()
+
+
+def test_sqlite_backend_stores_models(tmp_path):
+    """Component properties round-trip as JSON and dangling frame ids are refused"""
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.add(models.Project(id=1, name="P"))
+        db.add(models.Frame(id=1, project_id=1, name="F"))
+        db.add(models.Component(
+            id=1, frame_id=1, name="c", type="connection",
+            properties={"sourceId": 2, "targetId": 3, "style": {"dash": [4, 2]}},
+        ))
+        db.commit()
+        assert db.get(models.Component, 1).properties["style"] == {"dash": [4, 2]}
+
+        db.add(models.Component(frame_id=99, name="orphan", type="circle"))
+        with pytest.raises(IntegrityError):
+            db.commit()
+    engine.dispose()
+
+
+def test_sqlite_concurrent_updates_get_consecutive_revisions(tmp_path):
+    """Concurrent component updates on one frame all succeed with distinct revisions"""
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        project = crud.create_project(db, schemas.ProjectCreate(name="P"))
+        frame_id = crud.create_frame(db, schemas.FrameCreate(name="F", project_id=project.id)).id
+        ids = [
+            crud.create_component(db, schemas.ComponentCreate(frame_id=frame_id, name=f"c{i}", type="circle")).id
+            for i in range(16)
+        ]
+        first = db.execute(select(models.FrameRevision.revision).order_by(models.FrameRevision.revision.desc())).scalar()
+
+    errors = []
+
+    def drag(component_id: int) -> None:
+        try:
+            for step in range(10):
+                with Session(engine, autoflush=False) as db:
+                    crud.update_component(db, component_id, schemas.ComponentUpdate(x=float(step + 1)))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=drag, args=(component_id,)) for component_id in ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with Session(engine) as db:
+        numbers = db.execute(
+            select(models.FrameRevision.revision).where(models.FrameRevision.frame_id == frame_id)
+        ).scalars().all()
+        assert sorted(numbers) == list(range(1, first + 161))
+        assert {component.x for component in crud.get_components_by_frame(db, frame_id)} == {10.0}
+    engine.dispose()
+
+
+def test_sqlite_phase_config():
+    """DB_BACKEND=sqlite builds a file URL and disables replicas"""
+    settings = Settings(DB_BACKEND="sqlite", SQLITE_PATH="/tmp/ps-ui.db", DB_REPLICA_HOSTS=["replica"])
+    assert settings.database_url == "sqlite:////tmp/ps-ui.db"
+    assert settings.replica_database_urls == []
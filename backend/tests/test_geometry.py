@@ -0,0 +1,37 @@
+"""
+Unit tests for bounding box geometry
+"""
+import numpy as np
+
+from app.geometry import bounds, find_overlaps
+
+
+def brute_force_overlaps(ids, x, y, width, height):
+    """Reference O(n^2) overlap check"""
+    left, bottom, right, top = bounds(x, y, width, height)
+    hit = (
+        (left[:, None] < right[None, :]) & (left[None, :] < right[:, None])
+        & (bottom[:, None] < top[None, :]) & (bottom[None, :] < top[:, None])
+    )
+    a, b = np.nonzero(np.triu(hit, 1))
+    ids = np.asarray(ids)
+    return sorted(zip(np.minimum(ids[a], ids[b]).tolist(), np.maximum(ids[a], ids[b]).tolist()))
+
+
+def test_touching_boxes_do_not_overlap():
+    """Boxes sharing an edge are not reported"""
+    assert find_overlaps([1, 2], [0, 10], [0, 0], [10, 10], [10, 10]) == []
+    assert find_overlaps([1, 2], [0, 9], [0, 0], [10, 10], [10, 10]) == [(1, 2)]
+
+
+def test_matches_brute_force():
+    """Grid search finds exactly the brute-force pairs, each once"""
+    rng = np.random.default_rng(7)
+    n = 800
+    ids = rng.permutation(n) + 100
+    x, y = rng.uniform(0, 1000, n), rng.uniform(0, 1000, n)
+    width, height = rng.uniform(1, 80, n), rng.uniform(1, 80, n)
+    # A couple of huge panels exercise the direct comparison path
+    width[:2], height[:2] = 4000, 2500
+
+    assert find_overlaps(ids, x, y, width, height) == brute_force_overlaps(ids, x, y, width, height)
@@ -0,0 +1,190 @@
+"""
+Unit tests for the background job runner
+"""
+import gzip
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import sessionmaker
+
+from app import jobs, models, revisions
+from app.database import create_database_engine
+
+
+@pytest.fixture
+def runner(tmp_path):
+    """Job runner on a fresh SQLite database with one two-frame project"""
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        db.add(models.Project(id=1, name="Plant"))
+        db.add_all([models.Frame(id=1, project_id=1, name="F1"), models.Frame(id=2, project_id=1, name="F2")])
+        db.add_all([
+            models.Component(id=1, frame_id=1, name="a", type="rectangle", x=0.0, y=0.0),
+            models.Component(id=2, frame_id=1, name="b", type="rectangle", x=300.0, y=0.0),
+            models.Component(id=3, frame_id=1, name="ab", type="connection",
+                             properties={"sourceId": 1, "targetId": 2}),
+            models.Component(id=4, frame_id=2, name="c", type="circle", x=5.0, y=5.0),
+        ])
+        db.commit()
+    yield jobs.JobRunner(
+        session_factory, workers=2, max_queued=10, poll_interval=0.01, heartbeat_interval=0.05,
+        stale_after=60, max_attempts=2, export_dir=tmp_path / "exports",
+    )
+    engine.dispose()
+
+
+def submit(runner, kind, **params) -> int:
+    with runner.session_factory() as db:
+        return runner.submit(db, kind, {"project_id": 1, **params}).id
+
+
+def get_job(runner, job_id) -> models.Job:
+    with runner.session_factory() as db:
+        return db.get(models.Job, job_id)
+
+
+def test_clone_project_remaps_connections(runner):
+    """A clone copies every frame and points connections at the copied shapes"""
+    job_id = submit(runner, "clone_project", name="Copy")
+    assert runner.run_once() == job_id
+    job = get_job(runner, job_id)
+    assert job.status == jobs.SUCCEEDED
+    assert job.progress == 1.0
+    assert job.result["frames"] == 2
+
+    clone_id = job.result["project_id"]
+    with runner.session_factory() as db:
+        assert db.get(models.Project, clone_id).name == "Copy"
+        frame_ids = jobs._frame_ids(db, clone_id)
+        c = models.Component
+        shapes = dict(db.execute(
+            select(c.name, c.id).where(c.frame_id == frame_ids[0], c.type != "connection")
+        ).all())
+        connection = db.execute(
+            select(c.properties).where(c.frame_id == frame_ids[0], c.type == "connection")
+        ).scalar_one()
+        assert connection == {"sourceId": shapes["a"], "targetId": shapes["b"]}
+        assert revisions.reconstruct(db, frame_ids[0], 1) == revisions.current_state(db, frame_ids[0])
+    assert runner.run_once() is None
+
+
+def test_delete_and_export_project(runner):
+    """Export writes the whole project to a file; delete removes it"""
+    export_id = submit(runner, "export_project")
+    delete_id = submit(runner, "delete_project")
+    runner.run_once()
+    runner.run_once()
+
+    assert get_job(runner, export_id).result["components"] == 4
+    with gzip.open(runner.export_path(export_id), "rt") as export:
+        data = json.load(export)
+    assert data["project"] == {"id": 1, "name": "Plant"}
+    assert [len(frame["components"]) for frame in data["frames"]] == [3, 1]
+
+    assert get_job(runner, delete_id).status == jobs.SUCCEEDED
+    with runner.session_factory() as db:
+        assert db.get(models.Project, 1) is None
+        assert db.execute(select(func.count()).select_from(models.Component)).scalar() == 0
+
+
+def test_cancel_queued_and_running_jobs(runner, monkeypatch):
+    """Queued jobs are cancelled at once, running ones at their next progress report"""
+    queued_id = submit(runner, "delete_project")
+    with runner.session_factory() as db:
+        assert runner.cancel(db, queued_id).status == jobs.CANCELLED
+    assert runner.run_once() is None
+
+    def cancelled_midway(db, job):
+        with runner.session_factory() as other:
+            runner.cancel(other, job.id)
+        job.progress(1, 2)
+        return {}
+
+    monkeypatch.setitem(jobs.HANDLERS, "slow", cancelled_midway)
+    running_id = submit(runner, "slow")
+    runner.run_once()
+    job = get_job(runner, running_id)
+    assert job.status == jobs.CANCELLED
+    assert job.cancel_requested
+
+
+def test_cancelled_export_removes_partial_file(runner, monkeypatch):
+    """An export stopped midway leaves neither the file nor its partial"""
+    current_state = revisions.current_state
+
+    def cancel_after_first_frame(db, frame_id):
+        with runner.session_factory() as other:
+            runner.cancel(other, job_id)
+        return current_state(db, frame_id)
+
+    monkeypatch.setattr(revisions, "current_state", cancel_after_first_frame)
+    job_id = submit(runner, "export_project")
+    runner.run_once()
+    assert get_job(runner, job_id).status == jobs.CANCELLED
+    assert list(runner.export_path(job_id).parent.iterdir()) == []
+
+
+def test_failed_job_records_error(runner):
+    """A handler exception fails the job with its message"""
+    with runner.session_factory() as db:
+        job_id = runner.submit(db, "clone_project", {"project_id": 99}).id
+    runner.run_once()
+    job = get_job(runner, job_id)
+    assert job.status == jobs.FAILED
+    assert job.error == "Project not found"
+
+
+def test_orphaned_job_is_resumed(runner):
+    """A running job with a stale heartbeat is queued again and resumes from its checkpoint"""
+    job_id = submit(runner, "clone_project")
+    assert runner.claim() == job_id
+    # The first run copied frame 1 and then its process died
+    with runner.session_factory() as db:
+        context = jobs.JobContext(runner, job_id, {"project_id": 1}, None)
+        project = models.Project(name="Partial")
+        db.add(project)
+        db.flush()
+        context.save_state(db, {"project_id": project.id, "frames": {"1": jobs._clone_frame(db, 1, project.id)}})
+        stale = datetime.now(timezone.utc) - timedelta(minutes=5)
+        db.execute(update(models.Job).where(models.Job.id == job_id).values(heartbeat_at=stale))
+        db.commit()
+
+    assert runner.recover() == 1
+    assert get_job(runner, job_id).status == jobs.QUEUED
+    runner.run_once()
+    job = get_job(runner, job_id)
+    assert job.status == jobs.SUCCEEDED
+    assert job.attempts == 2
+    with runner.session_factory() as db:
+        assert len(jobs._frame_ids(db, job.result["project_id"])) == 2
+
+    # Past max_attempts an orphaned job fails instead
+    with runner.session_factory() as db:
+        db.execute(update(models.Job).where(models.Job.id == job_id).values(status=jobs.RUNNING, heartbeat_at=stale))
+        db.commit()
+    assert runner.recover() == 0
+    assert get_job(runner, job_id).status == jobs.FAILED
+
+
+def test_worker_pool_runs_jobs(runner):
+    """Started runners pick up submitted jobs; full queues are refused"""
+    runner.max_queued = 1
+    job_id = submit(runner, "export_project")
+    with pytest.raises(jobs.JobQueueFull):
+        submit(runner, "export_project")
+
+    runner.start()
+    try:
+        deadline = time.monotonic() + 10
+        while get_job(runner, job_id).status != jobs.SUCCEEDED and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        runner.stop()
+    assert get_job(runner, job_id).status == jobs.SUCCEEDED
+    with runner.session_factory() as db:
+        assert runner.metrics(db)["statuses"] == {jobs.SUCCEEDED: 1}
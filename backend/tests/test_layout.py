@@ -0,0 +1,44 @@
+"""
+Unit tests for the layout engine
+"""
+import numpy as np
+
+from app.layout import edge_index, force_layout, layered_layout
+
+
+def test_edge_index_drops_unknown_and_self_edges():
+    """Only edges between known, distinct nodes are kept"""
+    edges = edge_index([10, 20, 30], [(10, 20), (20, 20), (20, 99), (10, 20), (None, 30)])
+    assert edges.tolist() == [[0, 1]]
+
+
+def test_layered_layout_follows_edges():
+    """Each step along a chain moves one layer to the right"""
+    edges = edge_index([1, 2, 3, 4], [(1, 2), (2, 3), (1, 4)])
+    x, y = layered_layout(4, edges, spacing_x=100.0, spacing_y=50.0)
+    assert x.tolist() == [0.0, 100.0, 200.0, 100.0]
+    # Nodes sharing a layer are stacked, centered on y=0
+    assert sorted([y[1], y[3]]) == [-25.0, 25.0]
+
+
+def test_layered_layout_handles_cycles():
+    """Cycles are broken instead of looping forever"""
+    edges = edge_index([1, 2, 3], [(1, 2), (2, 3), (3, 1)])
+    x, _ = layered_layout(3, edges, spacing_x=1.0)
+    assert sorted(x.tolist()) == [0.0, 1.0, 2.0]
+
+
+def test_force_layout_separates_nodes():
+    """Force layout spreads nodes out and keeps connected ones closer"""
+    n = 200
+    chain = edge_index(list(range(n)), [(i, i + 1) for i in range(n - 1)])
+    x, y = force_layout(n, chain, spacing=100.0, iterations=60, seed=1)
+    assert np.isfinite(x).all() and np.isfinite(y).all()
+
+    pos = np.column_stack([x, y])
+    dist = np.hypot(*(pos[:, None, :] - pos[None, :, :]).transpose(2, 0, 1))
+    np.fill_diagonal(dist, np.inf)
+    assert dist.min() > 1.0
+
+    edge_length = np.hypot(x[1:] - x[:-1], y[1:] - y[:-1]).mean()
+    assert edge_length < dist[np.triu_indices(n, 1)].mean()
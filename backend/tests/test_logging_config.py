@@ -0,0 +1,69 @@
+"""
+Unit tests for the logging pipeline
+"""
+import json
+import logging
+import queue
+
+from app.logging_config import (
+    ErrorSamplingFilter,
+    JSONFormatter,
+    NonBlockingQueueHandler,
+    RequestIdFilter,
+    request_id_var,
+)
+
+
+def make_record(msg="boom %s", args=("x",), level=logging.ERROR, exc_info=None):
+    """Build a log record for the filters under test"""
+    return logging.LogRecord("test", level, __file__, 1, msg, args, exc_info)
+
+
+def test_json_formatter_includes_request_id_and_extra():
+    """Records are rendered as JSON with request id and extra fields"""
+    token = request_id_var.set("req-1")
+    try:
+        record = make_record(level=logging.INFO)
+        record.path = "/api/health"
+        RequestIdFilter().filter(record)
+    finally:
+        request_id_var.reset(token)
+
+    data = json.loads(JSONFormatter().format(record))
+    assert data["message"] == "boom x"
+    assert data["level"] == "INFO"
+    assert data["request_id"] == "req-1"
+    assert data["path"] == "/api/health"
+
+
+def test_error_sampling_suppresses_repeats():
+    """Repeated errors beyond the burst are dropped and counted"""
+    sampler = ErrorSamplingFilter(burst=2, window=60.0)
+    results = [sampler.filter(make_record()) for _ in range(5)]
+    assert results == [True, True, False, False, False]
+
+    # Other messages and lower levels are not affected
+    assert sampler.filter(make_record(msg="other"))
+    assert sampler.filter(make_record(level=logging.WARNING))
+
+
+def test_error_sampling_reports_suppressed_count():
+    """The first record after a window reports how many were dropped"""
+    sampler = ErrorSamplingFilter(burst=1, window=60.0)
+    assert sampler.filter(make_record())
+    assert not sampler.filter(make_record())
+    assert not sampler.filter(make_record())
+
+    sampler.window = 0.0
+    record = make_record()
+    assert sampler.filter(record)
+    assert record.suppressed == 2
+
+
+def test_queue_handler_drops_when_full():
+    """A full queue drops records instead of blocking"""
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(make_record())
+    handler.handle(make_record())
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 1
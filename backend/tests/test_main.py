@@ -3,19 +3,20 @@ Unit tests for main API endpoints
 """
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from app.database import Base, get_db, engine as app_engine
+from app.database import Base, create_database_engine, get_db, engine as app_engine
 
 # Use SQLite file database for testing (in-memory doesn't work well with multiple connections)
 import tempfile
 import os
+import time
 test_db_file = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
 test_db_path = test_db_file.name
 test_db_file.close()
 
-SQLALCHEMY_DATABASE_URL = f"sqlite:///{test_db_path}"
-test_engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+# TEST_DATABASE_URL runs the API tests against another backend, e.g. a local PostgreSQL
+SQLALCHEMY_DATABASE_URL = os.environ.get("TEST_DATABASE_URL", f"sqlite:///{test_db_path}")
+test_engine = create_database_engine(SQLALCHEMY_DATABASE_URL)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
 
 # Override the app's engine with test engine before importing app
@@ -249,3 +250,416 @@ def test_delete_component(client):
     get_response = client.get(f"/api/components/{component_id}")
     assert get_response.status_code == 404
 
+
+
+def test_request_id_header(client):
+    """Test request id is generated or propagated"""
+    response = client.get("/api/health")
+    assert response.headers.get("X-Request-ID")
+
+    response = client.get("/api/health", headers={"X-Request-ID": "abc123"})
+    assert response.headers["X-Request-ID"] == "abc123"
+
+
+def create_frame_with_components(client, shapes):
+    """Create a project, a frame and one rectangle per (x, y, width, height)"""
+    project_id = client.post("/api/projects", json={"name": "Test Project"}).json()["id"]
+    frame_id = client.post("/api/frames", json={"name": "Test Frame", "project_id": project_id}).json()["id"]
+    ids = []
+    for i, (x, y, width, height) in enumerate(shapes):
+        response = client.post("/api/components", json={
+            "frame_id": frame_id,
+            "name": f"Shape {i}",
+            "type": "rectangle",
+            "x": x,
+            "y": y,
+            "width": width,
+            "height": height,
+            "properties": {}
+        })
+        ids.append(response.json()["id"])
+    return frame_id, ids
+
+
+def component_positions(client, frame_id):
+    """Map component id to (x, y, width, height)"""
+    return {
+        c["id"]: (c["x"], c["y"], c["width"], c["height"])
+        for c in client.get(f"/api/frames/{frame_id}/components").json()
+    }
+
+
+def test_bulk_translate(client):
+    """Test translating a whole frame"""
+    frame_id, ids = create_frame_with_components(client, [(0, 0, 10, 10), (50, 20, 10, 10)])
+    response = client.post("/api/components/bulk/translate", json={"frame_id": frame_id, "dx": 5, "dy": -5})
+    assert response.status_code == 200
+    assert response.json()["updated"] == 2
+
+    positions = component_positions(client, frame_id)
+    assert positions[ids[0]][:2] == (5, -5)
+    assert positions[ids[1]][:2] == (55, 15)
+
+
+def test_bulk_scale_around_center(client):
+    """Test scaling a selection around its bounding box center"""
+    frame_id, ids = create_frame_with_components(client, [(0, 0, 10, 10), (100, 0, 10, 10)])
+    response = client.post("/api/components/bulk/scale", json={"component_ids": ids, "scale_x": 2, "scale_y": 1})
+    assert response.json()["updated"] == 2
+
+    positions = component_positions(client, frame_id)
+    assert positions[ids[0]] == (-50, 0, 20, 10)
+    assert positions[ids[1]] == (150, 0, 20, 10)
+
+
+def test_bulk_align_left(client):
+    """Test aligning left edges"""
+    frame_id, ids = create_frame_with_components(client, [(10, 0, 20, 10), (100, 50, 40, 10)])
+    client.post("/api/components/bulk/align", json={"frame_id": frame_id, "edge": "left"})
+
+    positions = component_positions(client, frame_id)
+    assert positions[ids[0]][0] == 10
+    assert positions[ids[1]][0] == 20
+
+
+def test_bulk_distribute_horizontal(client):
+    """Test equal gaps after distributing"""
+    frame_id, ids = create_frame_with_components(client, [(0, 0, 10, 10), (20, 0, 10, 10), (100, 0, 10, 10)])
+    response = client.post("/api/components/bulk/distribute", json={"frame_id": frame_id, "axis": "horizontal"})
+    assert response.json()["updated"] == 3
+
+    positions = component_positions(client, frame_id)
+    assert [positions[i][0] for i in ids] == [0, 50, 100]
+
+
+def test_bulk_requires_selection(client):
+    """Test a bulk request without a selection is rejected"""
+    response = client.post("/api/components/bulk/translate", json={"dx": 1})
+    assert response.status_code == 422
+
+
+def test_layout_frame(client):
+    """Test layered layout of a connected frame"""
+    frame_id, ids = create_frame_with_components(client, [(0, 0, 10, 10)] * 3)
+    client.post("/api/components", json={
+        "frame_id": frame_id,
+        "name": "Connection",
+        "type": "connection",
+        "properties": {"sourceId": ids[0], "targetId": ids[1]}
+    })
+    response = client.post(f"/api/frames/{frame_id}/layout", json={"algorithm": "layered", "spacing_x": 100})
+    assert response.status_code == 200
+    assert response.json()["updated"] == 3
+
+    positions = component_positions(client, frame_id)
+    assert positions[ids[1]][0] - positions[ids[0]][0] == 100
+
+
+def test_layout_missing_frame(client):
+    """Test layout of a missing frame"""
+    response = client.post("/api/frames/999999/layout", json={})
+    assert response.status_code == 404
+
+
+def test_frame_overlaps(client):
+    """Test overlap detection for a frame"""
+    frame_id, ids = create_frame_with_components(
+        client, [(0, 0, 10, 10), (5, 5, 10, 10), (100, 100, 10, 10)]
+    )
+    response = client.get(f"/api/frames/{frame_id}/overlaps")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == 1
+    assert data["pairs"] == [[ids[0], ids[1]]]
+
+
+def test_check_overlaps_on_create_and_update(client):
+    """Test check mode rejects overlapping shapes"""
+    frame_id, ids = create_frame_with_components(client, [(0, 0, 10, 10), (100, 0, 10, 10)])
+    response = client.post("/api/components?check_overlaps=true", json={
+        "frame_id": frame_id,
+        "name": "Overlapping",
+        "type": "circle",
+        "x": 4,
+        "y": 4,
+        "width": 10,
+        "height": 10
+    })
+    assert response.status_code == 409
+    assert response.json()["detail"]["overlaps"] == [ids[0]]
+
+    response = client.put(f"/api/components/{ids[1]}?check_overlaps=true", json={"x": 5})
+    assert response.status_code == 409
+
+    response = client.put(f"/api/components/{ids[1]}?check_overlaps=true", json={"x": 50})
+    assert response.status_code == 200
+
+
+def test_frame_revisions_restore(client):
+    """Test revision history, diff and restore"""
+    frame_id, ids = create_frame_with_components(client, [(0, 0, 10, 10), (50, 0, 10, 10)])
+    revisions = client.get(f"/api/frames/{frame_id}/revisions").json()
+    before_edit = revisions[0]["revision"]
+    assert before_edit == 3  # frame creation + two components
+
+    client.put(f"/api/components/{ids[0]}", json={"x": 25})
+    client.delete(f"/api/components/{ids[1]}")
+    client.put(f"/api/frames/{frame_id}", json={"name": "Renamed"})
+
+    diff = client.get(
+        f"/api/frames/{frame_id}/revisions/diff",
+        params={"from_revision": before_edit, "to_revision": before_edit + 3},
+    ).json()
+    assert diff["frame"] == {"name": "Renamed"}
+    assert diff["removed"] == [ids[1]]
+    assert diff["changed"] == {str(ids[0]): {"x": 25}}
+
+    response = client.post(f"/api/frames/{frame_id}/revisions/{before_edit}/restore")
+    assert response.status_code == 200
+    assert response.json()["revision"] == before_edit + 4
+
+    assert client.get(f"/api/frames/{frame_id}").json()["name"] == "Test Frame"
+    positions = component_positions(client, frame_id)
+    assert positions == {ids[0]: (0, 0, 10, 10), ids[1]: (50, 0, 10, 10)}
+
+    state = client.get(f"/api/frames/{frame_id}/revisions/{before_edit + 2}").json()
+    assert [c["id"] for c in state["components"]] == [ids[0]]
+
+    response = client.get(f"/api/frames/{frame_id}/revisions/999")
+    assert response.status_code == 404
+
+
+def test_queue_component_positions(client):
+    """Test buffered position updates are committed on flush"""
+    frame_id, ids = create_frame_with_components(client, [(0, 0, 10, 10)])
+    response = client.post("/api/components/positions", json={"updates": [{"id": ids[0], "x": 1}]})
+    assert response.status_code == 202
+    response = client.post("/api/components/positions", json={
+        "updates": [{"id": ids[0], "x": 2, "y": 3}],
+        "flush": True
+    })
+    assert response.json() == {"accepted": 1, "flushed": True}
+
+    assert component_positions(client, frame_id)[ids[0]][:2] == (2, 3)
+    assert client.get("/api/metrics/write-behind").json()["pending"] == 0
+
+    # A later synchronous update isn't overwritten by an older buffered position
+    client.post("/api/components/positions", json={"updates": [{"id": ids[0], "x": 5}]})
+    client.put(f"/api/components/{ids[0]}", json={"x": 7})
+    client.post("/api/components/positions", json={"updates": [], "flush": True})
+    assert component_positions(client, frame_id)[ids[0]][:2] == (7, 3)
+
+
+def test_admission_metrics(client):
+    """Test admission counters after a request"""
+    before = client.get("/api/metrics/admission").json()["admitted"]
+    client.get("/api/projects")
+    metrics = client.get("/api/metrics/admission").json()
+    assert metrics["admitted"] == before + 1
+    assert metrics["in_flight"] == 0
+    assert metrics["queue_depth"] == 0
+
+
+def test_coalescing_metrics(client):
+    """Test coalesced reads are counted and writes aren't coalesced"""
+    before = client.get("/api/metrics/coalescing").json()
+    client.get("/api/projects")
+    client.post("/api/projects", json={"name": "Coalesced"})
+    metrics = client.get("/api/metrics/coalescing").json()
+    assert metrics["requests"] == before["requests"] + 1
+    assert metrics["executed"] == before["executed"] + 1
+    assert metrics["in_flight"] == 0
+
+
+def test_sparse_fieldsets_and_summaries(client):
+    """Test fields/include parameters and summary endpoints"""
+    frame_id, ids = create_frame_with_components(client, [(0, 0, 10, 10), (20, 0, 10, 10)])
+    project_id = client.get(f"/api/frames/{frame_id}").json()["project_id"]
+
+    response = client.get("/api/projects", params={"fields": "name", "include": "frame_count"})
+    assert response.status_code == 200
+    project = next(p for p in response.json() if p["id"] == project_id)
+    assert project == {"id": project_id, "name": "Test Project", "frame_count": 1}
+
+    response = client.get(f"/api/projects/{project_id}", params={"include": "frames"})
+    frames = response.json()["frames"]
+    assert frames == [{"id": frame_id, "project_id": project_id, "name": "Test Frame", "component_count": 2}]
+
+    response = client.get(f"/api/frames/{frame_id}/components", params={"fields": "x,y"})
+    assert response.json() == [{"id": ids[0], "x": 0, "y": 0}, {"id": ids[1], "x": 20, "y": 0}]
+
+    summaries = client.get("/api/frames/summary", params={"project_id": project_id}).json()
+    assert summaries == [{"id": frame_id, "project_id": project_id, "name": "Test Frame", "component_count": 2}]
+
+    response = client.get("/api/projects", params={"fields": "password"})
+    assert response.status_code == 400
+
+
+def test_archived_project_is_rehydrated_on_access(client):
+    """Test archiving a project and reading it back"""
+    frame_id, ids = create_frame_with_components(client, [(0, 0, 10, 10), (20, 0, 10, 10)])
+    project_id = client.get(f"/api/frames/{frame_id}").json()["project_id"]
+
+    response = client.post(f"/api/projects/{project_id}/archive")
+    assert response.status_code == 200
+    assert response.json()["components"] == 2
+
+    response = client.get(f"/api/frames/{frame_id}/components")
+    assert response.status_code == 200
+    assert sorted(item["id"] for item in response.json()) == ids
+
+    # By component id and by bulk selection
+    client.post(f"/api/projects/{project_id}/archive")
+    assert client.get(f"/api/components/{ids[0]}").status_code == 200
+    client.post(f"/api/projects/{project_id}/archive")
+    assert client.put(f"/api/components/{ids[1]}", json={"name": "Renamed"}).json()["name"] == "Renamed"
+    client.post(f"/api/projects/{project_id}/archive")
+    response = client.post("/api/components/bulk/translate", json={"frame_id": frame_id, "dx": 5, "dy": 0})
+    assert response.json() == {"updated": 2}
+    client.post(f"/api/projects/{project_id}/archive")
+    response = client.post("/api/components/bulk/translate", json={"component_ids": [ids[0]], "dx": 5, "dy": 0})
+    assert response.json() == {"updated": 1}
+    assert component_positions(client, frame_id)[ids[0]][0] == 10
+
+    client.post(f"/api/projects/{project_id}/archive")
+    assert len(client.get(f"/api/projects/{project_id}").json()["frames"]) == 1
+    assert client.post("/api/projects/999999/archive").status_code == 404
+
+    client.post(f"/api/projects/{project_id}/archive")
+    assert client.delete(f"/api/projects/{project_id}").status_code == 200
+    assert client.get(f"/api/frames/{frame_id}").status_code == 404
+
+
+def test_project_jobs(client):
+    """Test cloning a project in the background and polling the job"""
+    frame_id, ids = create_frame_with_components(client, [(0, 0, 10, 10), (20, 0, 10, 10)])
+    project_id = client.get(f"/api/frames/{frame_id}").json()["project_id"]
+
+    response = client.post("/api/jobs", json={"kind": "clone_project", "project_id": project_id, "name": "Copy"})
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] in ("queued", "running", "succeeded")
+
+    deadline = time.monotonic() + 10
+    while job["status"] in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(0.05)
+        job = client.get(f"/api/jobs/{job['id']}").json()
+    assert job["status"] == "succeeded"
+    clone = client.get(f"/api/projects/{job['result']['project_id']}").json()
+    assert clone["name"] == "Copy"
+    assert len(clone["frames"]) == 1
+    assert client.get("/api/metrics/jobs").json()["statuses"]["succeeded"] >= 1
+
+    assert client.post("/api/jobs", json={"kind": "clone_project", "project_id": 999999}).status_code == 404
+    assert client.post("/api/jobs/999999/cancel").status_code == 404
+    assert client.get(f"/api/jobs/{job['id']}/download").status_code == 404
+
+
+def test_search(client):
+    """Test name search with ancestry and parameter validation"""
+    frame_id, ids = create_frame_with_components(client, [(0, 0, 10, 10), (20, 0, 10, 10)])
+    project_id = client.get(f"/api/frames/{frame_id}").json()["project_id"]
+
+    response = client.get("/api/search", params={"q": "shape 1", "project_id": project_id})
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert [(item["kind"], item["id"], item["match"]) for item in items] == [("component", ids[1], "exact")]
+    assert items[0]["frame"] == {"id": frame_id, "name": "Test Frame"}
+    assert items[0]["project"]["id"] == project_id
+
+    response = client.get("/api/search", params={"q": "test", "project_id": project_id, "kinds": "frame"})
+    assert [item["id"] for item in response.json()["items"]] == [frame_id]
+
+    assert client.get("/api/search", params={"q": " "}).status_code == 400
+    assert client.get("/api/search", params={"q": "a", "limit": 0}).status_code == 400
+    assert client.get("/api/search", params={"q": "a", "kinds": "shape"}).status_code == 400
+
+
+def test_frame_tiles(client):
+    """Test tile content, ETag revalidation and invalidation on writes"""
+    frame_id, ids = create_frame_with_components(client, [(10, 10, 10, 10), (20, 20, 10, 10)])
+
+    response = client.get(f"/api/frames/{frame_id}/tiles/0/0/0")
+    assert response.status_code == 200
+    tile = response.json()
+    assert tile["mode"] == "detail"
+    assert sorted(tile["components"]["id"]) == ids
+    etag = response.headers["ETag"]
+
+    response = client.get(f"/api/frames/{frame_id}/tiles/0/0/0", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    for if_none_match in ("*", f'"other", W/{etag}'):
+        response = client.get(f"/api/frames/{frame_id}/tiles/0/0/0", headers={"If-None-Match": if_none_match})
+        assert response.status_code == 304
+
+    client.put(f"/api/components/{ids[0]}", json={"x": -10})
+    response = client.get(f"/api/frames/{frame_id}/tiles/0/0/0", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["components"]["id"] == [ids[1]]
+    assert client.get(f"/api/frames/{frame_id}/tiles/0/-1/0").json()["components"]["id"] == [ids[0]]
+
+    assert client.get(f"/api/frames/{frame_id}/tiles/99/0/0").status_code == 400
+    assert client.get("/api/frames/999999/tiles/0/0/0").status_code == 404
+
+
+def test_frame_thumbnail(client):
+    """Test thumbnail formats, ETag revalidation and re-rendering after writes"""
+    frame_id, ids = create_frame_with_components(client, [(0, 0, 50, 50), (200, 0, 50, 50)])
+
+    response = client.get(f"/api/frames/{frame_id}/thumbnail")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert response.content.startswith(b"\x89PNG")
+    etag = response.headers["ETag"]
+    response = client.get(f"/api/frames/{frame_id}/thumbnail", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    for if_none_match in ("*", f'"other", W/{etag}'):
+        response = client.get(f"/api/frames/{frame_id}/thumbnail", headers={"If-None-Match": if_none_match})
+        assert response.status_code == 304
+
+    client.put(f"/api/components/{ids[0]}", json={"y": 300})
+    response = client.get(f"/api/frames/{frame_id}/thumbnail", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    response = client.get(f"/api/frames/{frame_id}/thumbnail", params={"format": "svg"})
+    assert response.headers["content-type"] == "image/svg+xml"
+    assert response.text.count("<rect") == 3
+
+    assert client.get(f"/api/frames/{frame_id}/thumbnail", params={"format": "gif"}).status_code == 400
+    assert client.get("/api/frames/999999/thumbnail").status_code == 404
+    assert client.get("/api/metrics/thumbnails").json()["renders"] >= 3
+
+
+def test_coalesced_reads_keep_their_own_headers(client, monkeypatch):
+    """Requests sharing one response still get their own request id and CORS headers"""
+    import asyncio
+    import httpx
+    from app import crud
+    from app.coalesce import request_coalescer
+
+    get_projects = crud.get_projects
+
+    def slow_get_projects(*args, **kwargs):
+        # Keeps the first request in flight while the others arrive
+        time.sleep(0.2)
+        return get_projects(*args, **kwargs)
+
+    monkeypatch.setattr(crud, "get_projects", slow_get_projects)
+    origin = "http://localhost:8600"
+    coalesced = request_coalescer.coalesced
+
+    async def herd():
+        async with httpx.AsyncClient(app=app, base_url="http://test") as http:
+            return await asyncio.gather(*(
+                http.get("/api/projects", headers={"Origin": origin, "X-Request-ID": f"req-{i}"})
+                for i in range(8)
+            ))
+
+    responses = asyncio.run(herd())
+    assert request_coalescer.coalesced > coalesced
+    for i, response in enumerate(responses):
+        assert response.status_code == 200
+        assert response.headers["X-Request-ID"] == f"req-{i}"
+        assert response.headers["Access-Control-Allow-Origin"] == origin
+        assert response.headers["Vary"] == "Origin"
@@ -0,0 +1,168 @@
+"""
+Tests for partitioning the components table
+
+Need PostgreSQL: they run when TEST_DATABASE_URL points at one, in a
+schema of their own that is dropped afterwards.
+"""
+import os
+
+import pytest
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, partitioning, revisions, schemas
+
+SCHEMA = "partitioning_test"
+
+
+@pytest.fixture
+def engine():
+    """Engine on an empty schema with the app's tables"""
+    url = os.environ.get("TEST_DATABASE_URL", "")
+    if not url.startswith("postgresql"):
+        pytest.skip("TEST_DATABASE_URL is not a PostgreSQL database")
+    admin = create_engine(url)
+    with admin.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    # public stays on the path for extensions installed there (pg_trgm)
+    engine = create_engine(url, connect_args={"options": f"-csearch_path={SCHEMA},public"})
+    try:
+        models.Base.metadata.create_all(bind=engine, checkfirst=False)
+        yield engine
+    finally:
+        engine.dispose()
+        with admin.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        admin.dispose()
+
+
+def seed(db) -> list[int]:
+    """Two projects of two frames with 30 shapes each, every pair of neighbours connected"""
+    frame_ids = []
+    for p in range(2):
+        project = crud.create_project(db, schemas.ProjectCreate(name=f"Project {p}"))
+        for f in range(2):
+            frame = crud.create_frame(db, schemas.FrameCreate(name=f"Frame {f}", project_id=project.id))
+            frame_ids.append(frame.id)
+            ids = [
+                crud.create_component(db, schemas.ComponentCreate(
+                    frame_id=frame.id, name=f"Shape {i}", type="rectangle", x=i * 10.0, y=0.0,
+                )).id
+                for i in range(30)
+            ]
+            for source, target in zip(ids, ids[1:]):
+                crud.create_component(db, schemas.ComponentCreate(
+                    frame_id=frame.id, name="link", type="connection",
+                    properties={"sourceId": source, "targetId": target},
+                ))
+    return frame_ids
+
+
+def snapshot(engine) -> list[tuple]:
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT * FROM components ORDER BY id")).all()
+
+
+def test_online_migration_keeps_concurrent_writes(engine):
+    """Writes during the copy end up in the partitioned table exactly once"""
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        frame_ids = seed(db)
+        last_id = db.execute(select(models.Component.id).order_by(models.Component.id.desc())).scalars().first()
+
+    partitioning.create_partitioned_table(engine, 4)
+    partitioning.install_sync_trigger(engine)
+
+    def write_during_copy(done: int, last: int) -> None:
+        if done != 50:
+            return
+        with session_factory() as db:
+            # Rows already copied and rows not copied yet
+            crud.update_component(db, 10, schemas.ComponentUpdate(name="Changed early"))
+            crud.update_component(db, 200, schemas.ComponentUpdate(name="Changed late"))
+            crud.delete_component(db, 20)
+            crud.delete_component(db, 210)
+            crud.create_component(db, schemas.ComponentCreate(
+                frame_id=frame_ids[0], name="Added", type="circle",
+            ))
+
+    copied = partitioning.backfill(engine, 25, progress=write_during_copy)
+    # 200 was mirrored by the trigger and 210 deleted before their batches
+    assert copied == last_id - 2
+    expected = snapshot(engine)
+    partitioning.swap(engine)
+
+    with engine.connect() as conn:
+        assert partitioning.is_partitioned(conn)
+        assert len(partitioning.partitions(conn)) == 4
+    assert snapshot(engine) == expected
+    names = {row.id: row.name for row in expected}
+    assert names[10] == "Changed early" and names[200] == "Changed late"
+    assert 20 not in names and 210 not in names
+
+    # The id sequence moved over with the table
+    with session_factory() as db:
+        added = crud.create_component(db, schemas.ComponentCreate(frame_id=frame_ids[1], name="New", type="circle"))
+        assert added.id == last_id + 2
+
+
+def test_interrupted_backfill_resumes(engine):
+    """A new backfill continues after the last copied batch, not after the trigger's rows"""
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        frame_ids = seed(db)
+    partitioning.create_partitioned_table(engine, 4)
+    partitioning.install_sync_trigger(engine)
+
+    def crash(done: int, last: int) -> None:
+        if done == 50:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        partitioning.backfill(engine, 25, progress=crash)
+    with session_factory() as db:
+        crud.create_component(db, schemas.ComponentCreate(frame_id=frame_ids[3], name="Added", type="circle"))
+    with engine.connect() as conn:
+        assert partitioning.backfilled_up_to(conn) == 50
+
+    assert partitioning.backfill(engine, 25) == 236 - 50
+    expected = snapshot(engine)
+    partitioning.swap(engine)
+    assert snapshot(engine) == expected
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT to_regclass(:name)"), {"name": partitioning.PROGRESS_TABLE}).scalar() is None
+
+
+def test_crud_on_partitioned_table(engine):
+    """Per-frame queries touch one partition; deletes, layouts and restores still work"""
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        frame_ids = seed(db)
+    partitioning.create_partitioned_table(engine, 4)
+    partitioning.install_sync_trigger(engine)
+    partitioning.backfill(engine, 1000)
+    partitioning.swap(engine)
+
+    with session_factory() as db:
+        assert len(crud.get_components_by_frame(db, frame_ids[0])) == 59
+        plan = "\n".join(db.execute(
+            text("EXPLAIN SELECT * FROM components WHERE frame_id = :frame_id"), {"frame_id": frame_ids[0]}
+        ).scalars())
+        assert plan.count(" on components_p") == 1
+
+        assert crud.layout_frame(db, frame_ids[1], schemas.LayoutRequest()) == 30
+        assert revisions.restore(db, frame_ids[1], 2) is not None
+        assert len(crud.get_components_by_frame(db, frame_ids[1])) == 1
+
+        project_id = crud.get_frame(db, frame_ids[2]).project_id
+        assert crud.delete_project(db, project_id)
+        assert db.execute(
+            select(models.Component.id).where(models.Component.frame_id.in_(frame_ids[2:]))
+        ).first() is None
+        assert len(crud.get_components_by_frame(db, frame_ids[0])) == 59
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        partitioning.create_index_concurrently(conn, "ix_components_type", "components", "(type)")
+        valid = conn.execute(text("SELECT indisvalid FROM pg_index WHERE indexrelid = 'ix_components_type'::regclass"))
+        assert valid.scalar()
@@ -0,0 +1,208 @@
+"""
+Query plan regression tests for the hot queries in crud.py
+
+The plan checks need PostgreSQL and are skipped without it::
+
+    QUERY_PLAN_DATABASE_URL=postgresql://postgres@localhost/postgres \\
+        pytest tests/test_query_plans.py
+
+They work in their own schema (recreated on every run and dropped
+afterwards), seed it with realistic volumes, run each hot access path
+through crud while capturing its SELECTs and EXPLAIN them. A query fails
+if its plan sequentially scans a table its baseline doesn't, or if its
+estimated cost grows more than ``QUERY_PLAN_COST_TOLERANCE`` (default
+0.25) past the baseline in ``query_plan_baselines.json``. Run with
+``QUERY_PLAN_UPDATE_BASELINES=1`` to rewrite the baselines after an
+intended change.
+"""
+import json
+import os
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex
+
+import migrate_add_indexes
+from app import crud, models, revisions, search
+
+BASELINE_PATH = Path(__file__).parent / "query_plan_baselines.json"
+SCHEMA = "query_plan_harness"
+
+PROJECTS = 50
+FRAMES_PER_PROJECT = 20
+COMPONENTS_PER_FRAME = 200
+REVISIONS_PER_FRAME = 60
+
+PROJECT_ID = PROJECTS // 2
+FRAME_ID = (PROJECT_ID - 1) * FRAMES_PER_PROJECT + 1
+COMPONENT_ID = (FRAME_ID - 1) * COMPONENTS_PER_FRAME + 1
+
+HOT_QUERIES = {
+    "get_project": lambda db: crud.get_project(db, PROJECT_ID),
+    "get_frame": lambda db: crud.get_frame(db, FRAME_ID),
+    "get_frames_by_project": lambda db: crud.get_frames(db, project_id=PROJECT_ID),
+    "get_component": lambda db: crud.get_component(db, COMPONENT_ID),
+    "get_components_by_frame": lambda db: crud.get_components_by_frame(db, FRAME_ID),
+    "get_projects_sparse_with_frames": lambda db: crud.get_projects_sparse(
+        db, fields=("name",), include=("frame_count", "frames"), project_id=PROJECT_ID
+    ),
+    "get_frames_sparse_with_components": lambda db: crud.get_frames_sparse(
+        db, fields=("name",), include=("component_count", "components"), frame_id=FRAME_ID
+    ),
+    "get_frame_overlaps": lambda db: crud.get_frame_overlaps(db, FRAME_ID),
+    "find_overlapping_components": lambda db: crud.find_overlapping_components(
+        db, FRAME_ID, 2500.0, 2500.0, 100.0, 100.0
+    ),
+    "latest_revision": lambda db: revisions.latest_revision(db, FRAME_ID),
+    "reconstruct_revision": lambda db: revisions.reconstruct(db, FRAME_ID, REVISIONS_PER_FRAME - 5),
+    "search_prefix": lambda db: search.search(db, f"Shape {COMPONENT_ID}"),
+    "search_substring": lambda db: search.search(db, f"ape {COMPONENT_ID}"),
+    "search_in_project": lambda db: search.search(db, "shape 1", project_id=PROJECT_ID),
+}
+
+
+def test_migration_indexes_match_models():
+    """Every index the migration adds is declared on the models"""
+    declared = {
+        index.name: str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+        for table in models.Base.metadata.tables.values()
+        for index in table.indexes
+    }
+    for name, table, definition in migrate_add_indexes.INDEXES:
+        assert declared.get(name) == f"CREATE INDEX {name} ON {table} {definition}"
+
+
+def seed(engine) -> None:
+    """Fill the harness schema with deterministic data"""
+    frames = PROJECTS * FRAMES_PER_PROJECT
+    with engine.begin() as conn:
+        conn.execute(text("SELECT setseed(0.42)"))
+        conn.execute(text(
+            "INSERT INTO projects (id, name) SELECT g, 'Project ' || g FROM generate_series(1, :n) g"
+        ), {"n": PROJECTS})
+        conn.execute(text(
+            "INSERT INTO frames (id, project_id, name) "
+            "SELECT g, (g - 1) / :per + 1, 'Frame ' || g FROM generate_series(1, :n) g"
+        ), {"n": frames, "per": FRAMES_PER_PROJECT})
+        # Ids interleave frames the way concurrent editing does
+        conn.execute(text(
+            "INSERT INTO components (id, frame_id, name, type, x, y, width, height, properties) "
+            "SELECT g, (g - 1) / :per + 1, 'Shape ' || g, "
+            "CASE WHEN g % 10 = 0 THEN 'connection' ELSE 'rectangle' END, "
+            "random() * 5000, random() * 5000, 40 + random() * 80, 40 + random() * 80, '{}'::json "
+            "FROM generate_series(1, :n) g ORDER BY random()"
+        ), {"n": frames * COMPONENTS_PER_FRAME, "per": COMPONENTS_PER_FRAME})
+        conn.execute(text(
+            "INSERT INTO frame_revisions (frame_id, revision, delta, checkpoint) "
+            "SELECT f, r, :delta, CASE WHEN r = 1 OR r % :interval = 0 THEN :checkpoint END "
+            "FROM generate_series(1, :frames) f, generate_series(1, :per) r"
+        ), {
+            "frames": frames,
+            "per": REVISIONS_PER_FRAME,
+            "interval": revisions.CHECKPOINT_INTERVAL,
+            "delta": revisions._pack({"frame": {"name": "Frame"}}),
+            "checkpoint": revisions._pack({"frame": {"name": "Frame"}, "components": {}}),
+        })
+        for table in ("projects", "frames", "components", "frame_revisions"):
+            conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"))
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE"))
+
+
+@pytest.fixture(scope="module")
+def plan_engine():
+    """Engine on a freshly seeded harness schema"""
+    url = os.environ.get("QUERY_PLAN_DATABASE_URL")
+    if not url:
+        pytest.skip("QUERY_PLAN_DATABASE_URL is not set")
+    admin = create_engine(url)
+    with admin.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    # public stays on the path for extensions installed there (pg_trgm)
+    engine = create_engine(url, connect_args={"options": f"-csearch_path={SCHEMA},public"})
+    try:
+        # The schema is new; don't let tables of the same name in public count as existing
+        models.Base.metadata.create_all(bind=engine, checkfirst=False)
+        seed(engine)
+        yield engine
+    finally:
+        engine.dispose()
+        with admin.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        admin.dispose()
+
+
+def capture_selects(engine, call) -> list[tuple[str, object]]:
+    """SELECT statements and parameters issued by ``call(session)``"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        with Session(engine) as db:
+            call(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def explain(engine, statement: str, parameters) -> dict:
+    """Root plan node of EXPLAIN (FORMAT JSON)"""
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()[0]["Plan"]
+
+
+def seq_scans(plan: dict) -> list[str]:
+    """Tables a plan reads with a sequential scan"""
+    tables = [plan["Relation Name"]] if plan["Node Type"] == "Seq Scan" else []
+    for child in plan.get("Plans", []):
+        tables.extend(seq_scans(child))
+    return sorted(set(tables))
+
+
+def load_baselines() -> dict:
+    if BASELINE_PATH.exists():
+        return json.loads(BASELINE_PATH.read_text())
+    return {}
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_plan(plan_engine, name):
+    """Hot query plans don't regress to seq scans or past their cost baseline"""
+    statements = capture_selects(plan_engine, HOT_QUERIES[name])
+    assert statements, f"{name} issued no SELECT"
+    plans = {}
+    for i, (statement, parameters) in enumerate(statements):
+        key = name if len(statements) == 1 else f"{name}#{i + 1}"
+        plan = explain(plan_engine, statement, parameters)
+        plans[key] = {"cost": plan["Total Cost"], "seq_scans": seq_scans(plan), "sql": statement}
+
+    baselines = load_baselines()
+    if os.environ.get("QUERY_PLAN_UPDATE_BASELINES"):
+        stale = [key for key in baselines if key == name or key.startswith(f"{name}#")]
+        for key in stale:
+            del baselines[key]
+        baselines.update({
+            key: {"cost": round(plan["cost"], 2), "seq_scans": plan["seq_scans"]}
+            for key, plan in plans.items()
+        })
+        BASELINE_PATH.write_text(json.dumps(dict(sorted(baselines.items())), indent=2) + "\n")
+        return
+
+    tolerance = float(os.environ.get("QUERY_PLAN_COST_TOLERANCE", "0.25"))
+    for key, plan in plans.items():
+        baseline = baselines.get(key)
+        assert baseline is not None, f"No baseline for {key}; run with QUERY_PLAN_UPDATE_BASELINES=1"
+        new_scans = sorted(set(plan["seq_scans"]) - set(baseline["seq_scans"]))
+        assert not new_scans, f"{key} now seq scans {new_scans}:\n{plan['sql']}"
+        limit = baseline["cost"] * (1 + tolerance)
+        assert plan["cost"] <= limit, (
+            f"{key} estimated cost {plan['cost']:.2f} exceeds baseline {baseline['cost']:.2f}:\n{plan['sql']}"
+        )
@@ -0,0 +1,59 @@
+"""
+Unit tests for revision deltas
+"""
+from sqlalchemy.orm import Session
+
+from app import crud, models, revisions
+from app.database import create_database_engine
+from app.revisions import apply_delta, diff
+
+
+def make_state(name, components):
+    """Build a revision state"""
+    return {"frame": {"name": name}, "components": components}
+
+
+def test_diff_then_apply_round_trips():
+    """Applying diff(old, new) to old yields new"""
+    old = make_state("A", {
+        "1": {"name": "p1", "x": 0.0, "properties": {"color": "red"}},
+        "2": {"name": "p2", "x": 5.0, "properties": {}},
+    })
+    new = make_state("B", {
+        "1": {"name": "p1", "x": 3.0, "properties": {"color": "blue"}},
+        "3": {"name": "p3", "x": 9.0, "properties": {}},
+    })
+
+    delta = diff(old, new)
+    assert delta["frame"] == {"name": "B"}
+    assert delta["components"] == {
+        "1": {"x": 3.0, "properties": {"color": "blue"}},
+        "2": None,
+        "3": {"name": "p3", "x": 9.0, "properties": {}},
+    }
+
+    apply_delta(old, delta)
+    assert old == new
+
+
+def test_identical_states_have_empty_diff():
+    """No changes produce no component entries"""
+    state = make_state("A", {"1": {"x": 1.0}})
+    assert diff(state, make_state("A", {"1": {"x": 1.0}})) == {"components": {}}
+
+
+def test_delete_on_checkpoint_revision(tmp_path):
+    """A delete recorded as a checkpoint leaves the component out of it"""
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.add(models.Project(id=1, name="P"))
+        db.add(models.Frame(id=1, project_id=1, name="F"))
+        db.add_all([models.Component(id=i, frame_id=1, name=f"c{i}", type="rectangle") for i in (1, 2)])
+        db.commit()
+
+        assert crud.delete_component(db, 2)
+        assert revisions.latest_revision(db, 1) == 1
+        assert revisions.reconstruct(db, 1, 1) == revisions.current_state(db, 1)
+        assert list(revisions.current_state(db, 1)["components"]) == ["1"]
+    engine.dispose()
@@ -0,0 +1,102 @@
+"""
+Unit tests for name search
+"""
+import sqlite3
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from app import models, search
+from app.database import create_database_engine
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Session on a fresh SQLite database with two small projects"""
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([models.Project(id=1, name="Pump Station"), models.Project(id=2, name="Boiler")])
+    session.add_all([
+        models.Frame(id=1, project_id=1, name="Pumps"),
+        models.Frame(id=2, project_id=2, name="Feed 100%"),
+    ])
+    session.add_all([
+        models.Component(id=1, frame_id=1, name="Pump-17", type="circle"),
+        models.Component(id=2, frame_id=1, name="pump", type="circle"),
+        models.Component(id=3, frame_id=2, name="Backup pump-17", type="rectangle"),
+        models.Component(id=4, frame_id=2, name="Valve", type="triangle"),
+    ])
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def hits(result) -> list[tuple]:
+    return [(item["kind"], item["id"], item["match"]) for item in result["items"]]
+
+
+def test_search_ranks_exact_prefix_then_substring(db):
+    """Exact before prefix before substring, projects before frames before components"""
+    result = search.search(db, "PUMP")
+    assert hits(result) == [
+        ("component", 2, "exact"),
+        ("project", 1, "prefix"),
+        ("frame", 1, "prefix"),
+        ("component", 1, "prefix"),
+        ("component", 3, "substring"),
+    ]
+    assert not result["has_more"]
+
+    component = result["items"][3]
+    assert component["type"] == "circle"
+    assert component["project"] == {"id": 1, "name": "Pump Station"}
+    assert component["frame"] == {"id": 1, "name": "Pumps"}
+
+
+def test_search_pagination_and_filters(db):
+    """Pages, kind and project filters, short queries and LIKE wildcards"""
+    first = search.search(db, "pump", limit=2)
+    second = search.search(db, "pump", offset=2, limit=2)
+    assert first["has_more"] and second["has_more"]
+    assert hits(first) + hits(second) == hits(search.search(db, "pump"))[:4]
+
+    assert hits(search.search(db, "pump-17", kinds=["component"], project_id=2)) == [
+        ("component", 3, "substring"),
+    ]
+    # Below MIN_SUBSTRING characters only prefixes match
+    assert hits(search.search(db, "al")) == []
+    assert hits(search.search(db, "va")) == [("component", 4, "prefix")]
+    assert hits(search.search(db, "00%")) == [("frame", 2, "substring")]
+    assert hits(search.search(db, "1%0")) == []
+
+
+def test_search_folds_non_ascii_case(db):
+    """Case-insensitive beyond ASCII, for prefixes and substrings alike"""
+    db.add(models.Project(id=3, name="Über Pump"))
+    db.commit()
+    for query in ("über", "ÜBER", "Über"):
+        assert hits(search.search(db, query)) == [("project", 3, "prefix")]
+    assert hits(search.search(db, "ÜBER PUMP")) == [("project", 3, "exact")]
+    assert ("project", 3, "substring") in hits(search.search(db, "BER PU"))
+    assert db.execute(text("SELECT lower('Ü')")).scalar() == "Ü"
+
+
+def test_sqlite_name_key_indexes_need_name_fold(tmp_path):
+    """Indexes built on lower() are rebuilt; clients without name_fold can't write"""
+    path = tmp_path / "search.db"
+    engine = create_database_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_projects_name_key"))
+        conn.execute(text("CREATE INDEX ix_projects_name_key ON projects (lower(name))"))
+    models.Base.metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'ix_projects_name_key'")).scalar()
+    assert "name_fold(name)" in sql
+    engine.dispose()
+
+    with sqlite3.connect(path) as conn, pytest.raises(sqlite3.OperationalError, match="name_fold"):
+        conn.execute("INSERT INTO projects (name) VALUES ('Über')")
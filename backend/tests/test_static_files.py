@@ -0,0 +1,96 @@
+"""
+Unit tests for frontend static file serving
+"""
+import gzip
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.static_files import (
+    IMMUTABLE_CACHE_CONTROL,
+    REVALIDATE_CACHE_CONTROL,
+    CachedIndex,
+    PrecompressedStaticFiles,
+    precompress_directory,
+)
+
+BUNDLE = "console.log('plant simulation');\n" * 200
+
+
+@pytest.fixture
+def static_client(tmp_path):
+    """App serving a fake frontend build from a temp directory"""
+    static_dir = tmp_path / "static"
+    (static_dir / "js").mkdir(parents=True)
+    (static_dir / "js" / "main.1a2b3c4d.js").write_text(BUNDLE)
+    (static_dir / "manifest.json").write_text("{}")
+    (tmp_path / "index.html").write_text("<html><body>app</body></html>" * 50)
+    precompress_directory(tmp_path)
+
+    index = CachedIndex(tmp_path / "index.html")
+    app = FastAPI()
+    app.mount("/static", PrecompressedStaticFiles(directory=str(static_dir)), name="static")
+
+    @app.get("/{full_path:path}")
+    async def serve_frontend(full_path: str, request: Request):
+        return index.response(request)
+
+    with TestClient(app) as client:
+        yield client
+
+
+def test_serves_precompressed_variant(static_client):
+    """A gzip-accepting client gets the .gz sibling of a hashed bundle"""
+    response = static_client.get("/static/js/main.1a2b3c4d.js", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.text == BUNDLE
+
+
+def test_serves_identity_when_not_accepted(static_client):
+    """Clients without gzip support get the original file"""
+    response = static_client.get("/static/js/main.1a2b3c4d.js", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.text == BUNDLE
+
+
+def test_unhashed_asset_is_revalidated(static_client):
+    """Files without a content hash must be revalidated"""
+    response = static_client.get("/static/manifest.json")
+    assert response.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+
+
+def test_static_conditional_request(static_client):
+    """A matching ETag returns 304 for static assets"""
+    headers = {"Accept-Encoding": "gzip"}
+    etag = static_client.get("/static/js/main.1a2b3c4d.js", headers=headers).headers["etag"]
+    response = static_client.get(
+        "/static/js/main.1a2b3c4d.js", headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+
+def test_index_served_from_memory(static_client):
+    """SPA routes get the cached, compressed index with an ETag"""
+    response = static_client.get("/projects/1", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+    assert "app" in response.text
+
+    etag = response.headers["etag"]
+    response = static_client.get("/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_precompress_skips_small_files(tmp_path):
+    """Tiny files are not worth compressing"""
+    (tmp_path / "small.js").write_text("x")
+    (tmp_path / "big.js").write_text(BUNDLE)
+    precompress_directory(tmp_path)
+    assert not (tmp_path / "small.js.gz").exists()
+    assert gzip.decompress((tmp_path / "big.js.gz").read_bytes()).decode() == BUNDLE
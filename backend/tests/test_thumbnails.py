@@ -0,0 +1,143 @@
+"""
+Unit tests for frame thumbnails
+"""
+import struct
+import threading
+import zlib
+
+import numpy as np
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app import models, thumbnails
+from app.database import create_database_engine
+from app.thumbnails import BACKGROUND, FILL, LINE, ThumbnailService
+
+
+def scene(kinds, x, y, width, height, edges=()) -> dict:
+    return {
+        "kinds": np.array(kinds, dtype=np.int8),
+        "x": np.array(x, dtype=float),
+        "y": np.array(y, dtype=float),
+        "width": np.array(width, dtype=float),
+        "height": np.array(height, dtype=float),
+        "edges": np.array(edges, dtype=np.int64).reshape(-1, 2),
+    }
+
+
+def decode_png(data: bytes) -> np.ndarray:
+    """Palette indices of an unfiltered 8-bit PNG"""
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    pos, chunks = 8, {}
+    while pos < len(data):
+        (length,), kind = struct.unpack(">I", data[pos:pos + 4]), data[pos + 4:pos + 8]
+        chunks[kind] = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+    width, height = struct.unpack(">II", chunks[b"IHDR"][:8])
+    rows = np.frombuffer(zlib.decompress(chunks[b"IDAT"]), dtype=np.uint8).reshape(height, width + 1)
+    assert not rows[:, 0].any()
+    return rows[:, 1:]
+
+
+def test_shapes_fill_the_image_with_y_up():
+    """Shapes are fitted into the padded image and drawn with y pointing up"""
+    # A square on the left and a circle at the top right, joined by a connection
+    canvas = thumbnails.rasterize(
+        scene([0, 1], x=[0, 100], y=[0, 100], width=[20, 20], height=[20, 20], edges=[(0, 1)]), size=64
+    )
+    assert canvas.shape == (64, 64)
+    assert canvas[59, 4] == FILL  # square at the bottom left
+    assert canvas[4:8, 56:60].max() == FILL  # circle at the top right
+    assert canvas[4, 59] == BACKGROUND  # circles don't fill their corners
+    assert canvas[32, 31] == canvas[31, 32] == LINE  # along the diagonal between them
+    assert canvas[0].max() == canvas[:, 0].max() == BACKGROUND
+
+    empty = thumbnails.rasterize(scene([], [], [], [], []), size=16)
+    assert not empty.any()
+
+
+def test_many_tiny_shapes():
+    """A million sub-pixel shapes render as a dense grid of pixels"""
+    n = 1_000_000
+    rng = np.random.default_rng(0)
+    canvas = thumbnails.rasterize(
+        scene(rng.integers(0, 3, n), rng.uniform(0, 1e5, n), rng.uniform(0, 1e5, n), np.full(n, 5.0),
+              np.full(n, 5.0)),
+        size=128,
+    )
+    assert (canvas[4:-4, 4:-4] == FILL).mean() > 0.99
+
+
+def test_png_and_svg_encoding():
+    """The PNG decodes to the raster; the SVG has one element per large shape"""
+    shapes = scene([0, 1, 2], x=[0, 50, 100], y=[0, 0, 0], width=[30, 30, 30], height=[30, 30, 30],
+                   edges=[(0, 2)])
+    png = thumbnails.render(shapes, 48, "png")
+    assert np.array_equal(decode_png(png), thumbnails.rasterize(shapes, 48))
+
+    svg = thumbnails.render(shapes, 48, "svg").decode()
+    assert svg.startswith("<svg") and svg.endswith("</svg>")
+    assert svg.count("<rect") == 2 and svg.count("<ellipse") == 1 and svg.count("<polygon") == 1
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'thumbnails.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        db.add(models.Project(id=1, name="P"))
+        db.add(models.Frame(id=1, project_id=1, name="F"))
+        db.add_all([
+            models.Component(id=1, frame_id=1, name="a", type="circle", x=0.0, y=0.0),
+            models.Component(id=2, frame_id=1, name="b", type="valve", x=500.0, y=0.0),
+            models.Component(id=3, frame_id=1, name="ab", type="connection",
+                             properties={"sourceId": 1, "targetId": 2}),
+            models.Component(id=4, frame_id=1, name="dangling", type="connection",
+                             properties={"sourceId": 1, "targetId": 99}),
+        ])
+        db.commit()
+    yield factory
+    engine.dispose()
+
+
+def test_load_scene(session_factory):
+    """Shapes become arrays; connections become index pairs, dangling ones are dropped"""
+    with session_factory() as db:
+        loaded = thumbnails.load_scene(db, 1)
+    assert loaded["kinds"].tolist() == [1, 0]
+    assert loaded["x"].tolist() == [0.0, 500.0]
+    assert loaded["edges"].tolist() == [[0, 1]]
+
+
+def test_service_caches_by_revision_in_worker_processes(session_factory):
+    """Renders run in the pool, once per revision, and concurrent requests share one"""
+    service = ThumbnailService(size=32, workers=1, max_entries=4, timeout=60)
+    try:
+        with session_factory() as db:
+            assert service.get(db, 1, revision=1) == service.get(db, 1, revision=1)
+            assert service.metrics()["renders"] == 1
+            assert service.metrics()["hits"] == 1
+
+            # A newer revision renders again, and only once for concurrent requests
+            results = []
+
+            def fetch():
+                with session_factory() as other:
+                    results.append(service.get(other, 1, revision=2))
+
+            threads = [threading.Thread(target=fetch) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert len(results) == 4 and len(set(results)) == 1
+            metrics = service.metrics()
+            assert metrics["renders"] == 2
+            assert metrics["hits"] + metrics["coalesced"] == 4
+
+            _, svg = service.get(db, 1, "svg", revision=2)
+            assert svg.startswith(b"<svg")
+            assert service.metrics()["entries"] == 2
+    finally:
+        service.stop()
@@ -0,0 +1,97 @@
+"""
+Unit tests for the frame tile pyramid
+"""
+import gzip
+import json
+
+import numpy as np
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import create_database_engine
+from app.tiles import TileCache, TileIndex, encode
+
+
+def random_index(n: int, seed: int = 0) -> TileIndex:
+    """Shapes spread over [-1000, 1000)^2"""
+    rng = np.random.default_rng(seed)
+    return TileIndex(
+        ids=np.arange(1, n + 1),
+        types=rng.integers(0, 3, n),
+        x=rng.uniform(-1000, 1000, n),
+        y=rng.uniform(-1000, 1000, n),
+        width=np.full(n, 10.0),
+        height=np.full(n, 10.0),
+        type_names=["circle", "rectangle", "triangle"],
+        world_size=1024.0,
+    )
+
+
+def test_shapes_belong_to_the_tile_holding_their_center():
+    """Every shape is in exactly one tile per level, including negative tiles"""
+    index = random_index(5000)
+    for z in (0, 1, 3):
+        size = index.tile_size(z)
+        seen = []
+        for tx in range(int(np.floor(-1000 / size)), int(np.floor(1000 / size)) + 1):
+            for ty in range(int(np.floor(-1000 / size)), int(np.floor(1000 / size)) + 1):
+                members = index.members(z, tx, ty)
+                assert np.all(np.floor(index.x[members] / size) == tx)
+                assert np.all(np.floor(index.y[members] / size) == ty)
+                seen.append(members)
+        assert sorted(np.concatenate(seen).tolist()) == list(range(5000))
+
+
+def test_busy_tiles_are_aggregated():
+    """Aggregated cells add up to the tile's count and pick the common type"""
+    index = random_index(20000)
+    tile = index.tile(0, 0, 0, grid=16, detail_limit=100)
+    assert tile["mode"] == "aggregate"
+    assert sum(tile["cells"]["count"]) == tile["count"] == len(index.members(0, 0, 0))
+    assert max(tile["cells"]["i"]) < 16 and max(tile["cells"]["j"]) < 16
+    assert set(tile["cells"]["type"]) <= {0, 1, 2}
+
+    sparse = index.tile(3, 0, 0, grid=16, detail_limit=100)
+    assert sparse["mode"] == "detail"
+    assert sorted(sparse["components"]["id"]) == sparse["components"]["id"]
+    assert len(sparse["components"]["id"]) == sparse["count"] <= 100
+
+
+def test_zoomed_out_view_of_a_million_shapes_is_small():
+    """The four z=0 tiles of a million shapes compress to kilobytes"""
+    index = random_index(1_000_000)
+    total = 0
+    for tx in (-1, 0):
+        for ty in (-1, 0):
+            body, gzipped = encode(index.tile(0, tx, ty, grid=32, detail_limit=256))
+            assert json.loads(gzip.decompress(gzipped)) == json.loads(body)
+            total += len(gzipped)
+    assert total < 64 * 1024
+
+
+def test_cache_is_keyed_by_revision(tmp_path):
+    """A new revision rebuilds the index; the same one hits the cache"""
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'tiles.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    cache = TileCache(world_size=1024.0, grid=8, detail_limit=10, max_frames=2, max_tiles_per_frame=10)
+    with sessionmaker(bind=engine)() as db:
+        db.add(models.Project(id=1, name="P"))
+        db.add(models.Frame(id=1, project_id=1, name="F"))
+        db.add(models.Component(frame_id=1, name="a", type="circle", x=10.0, y=10.0))
+        db.add(models.Component(frame_id=1, name="link", type="connection"))
+        db.commit()
+
+        _, first, _ = cache.get(db, 1, 0, 0, 0, revision=1)
+        _, again, _ = cache.get(db, 1, 0, 0, 0, revision=1)
+        assert first == again
+        assert json.loads(first)["count"] == 1
+        assert cache.metrics()["hits"] == 1
+
+        db.add(models.Component(frame_id=1, name="b", type="rectangle", x=20.0, y=20.0))
+        db.commit()
+        _, stale, _ = cache.get(db, 1, 0, 0, 0, revision=1)
+        assert stale == first
+        _, changed, _ = cache.get(db, 1, 0, 0, 0, revision=2)
+        assert json.loads(changed)["count"] == 2
+        assert cache.metrics()["index_builds"] == 2
+    engine.dispose()
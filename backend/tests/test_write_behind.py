@@ -0,0 +1,127 @@
+"""
+Unit tests for the write-behind position buffer
+"""
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import create_database_engine
+from app.write_behind import WriteBehindBuffer, WriteBehindFull
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Session factory for a fresh SQLite database with three components"""
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'write_behind.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        db.add(models.Project(id=1, name="P"))
+        db.add(models.Frame(id=1, project_id=1, name="F"))
+        for component_id in (1, 2, 3):
+            db.add(models.Component(id=component_id, frame_id=1, name="c", type="circle", x=0.0, y=0.0))
+        db.commit()
+    yield factory
+    engine.dispose()
+
+
+def positions(factory):
+    """Map component id to (x, y)"""
+    with factory() as db:
+        c = models.Component
+        return {row.id: (row.x, row.y) for row in db.execute(select(c.id, c.x, c.y))}
+
+
+def test_updates_are_coalesced(session_factory):
+    """Only the latest value per component is written"""
+    buffer = WriteBehindBuffer(session_factory, flush_interval=60.0, max_pending=1000)
+    for step in range(10):
+        buffer.submit([{"id": 1, "x": float(step), "y": 1.0}, {"id": 2, "x": -float(step)}])
+    assert positions(session_factory)[1] == (0.0, 0.0)
+
+    assert buffer.flush() == 2
+    assert positions(session_factory) == {1: (9.0, 1.0), 2: (-9.0, 0.0), 3: (0.0, 0.0)}
+
+    metrics = buffer.metrics()
+    assert metrics["received"] == 20
+    assert metrics["written"] == 2
+    assert metrics["coalescing_ratio"] == 10.0
+    assert metrics["pending"] == 0
+
+
+def test_stop_flushes_pending(session_factory):
+    """Stopping the background thread writes what is left"""
+    buffer = WriteBehindBuffer(session_factory, flush_interval=60.0, max_pending=1000)
+    buffer.start()
+    buffer.submit([{"id": 3, "x": 5.0, "y": 6.0}])
+    buffer.stop()
+    assert positions(session_factory)[3] == (5.0, 6.0)
+
+
+def test_failed_flush_keeps_updates(session_factory):
+    """Updates survive a failed flush and are retried"""
+    def broken_factory():
+        raise RuntimeError("database unavailable")
+
+    buffer = WriteBehindBuffer(broken_factory, flush_interval=60.0, max_pending=1000)
+    buffer.submit([{"id": 1, "x": 7.0}])
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+    assert buffer.metrics()["pending"] == 1
+
+    buffer.session_factory = session_factory
+    assert buffer.flush() == 1
+    assert positions(session_factory)[1] == (7.0, 0.0)
+
+
+def revision_count(factory):
+    with factory() as db:
+        return len(db.execute(select(models.FrameRevision.id)).all())
+
+
+def test_drag_is_recorded_once(session_factory):
+    """Flushes during a drag write positions but only its end is recorded as a revision"""
+    buffer = WriteBehindBuffer(session_factory, flush_interval=60.0, max_pending=1000, settle_interval=60.0)
+    for step in range(5):
+        buffer.submit([{"id": 1, "x": float(step)}, {"id": 2, "y": float(step)}])
+        buffer.flush()
+    assert positions(session_factory)[1] == (4.0, 0.0)
+    assert revision_count(session_factory) == 0
+    assert buffer.metrics()["unrecorded"] == 2
+
+    buffer.submit([{"id": 1, "x": 5.0}])
+    assert buffer.flush(record=True) == 1
+    assert revision_count(session_factory) == 1
+    assert buffer.metrics()["recorded"] == 2
+
+    # Without a final flush=true the drag is recorded once it settles
+    buffer.settle_interval = 0.0
+    buffer.submit([{"id": 3, "x": 1.0}])
+    buffer.flush()
+    assert revision_count(session_factory) == 2
+    assert buffer.flush() == 0
+
+
+def test_discard_drops_stale_positions(session_factory):
+    """A synchronous write of some fields drops only those pending values"""
+    buffer = WriteBehindBuffer(session_factory, flush_interval=60.0, max_pending=1000)
+    buffer.submit([{"id": 1, "x": 7.0, "y": 8.0}, {"id": 2, "x": 9.0}])
+    buffer.discard(1, ["x", "name"])
+    buffer.discard(2)
+    buffer.flush()
+    assert positions(session_factory) == {1: (0.0, 8.0), 2: (0.0, 0.0), 3: (0.0, 0.0)}
+
+
+def test_full_buffer_refuses_updates(session_factory):
+    """Updates for more than max_pending components are refused; pending ones still coalesce"""
+    buffer = WriteBehindBuffer(session_factory, flush_interval=60.0, max_pending=2)
+    buffer.submit([{"id": 1, "x": 1.0}, {"id": 2, "x": 1.0}])
+    with pytest.raises(WriteBehindFull):
+        buffer.submit([{"id": 1, "x": 2.0}, {"id": 3, "x": 1.0}])
+    assert buffer.submit([{"id": 1, "x": 3.0}]) == 1
+    assert buffer.metrics()["rejected"] == 1
+
+    buffer.flush()
+    assert positions(session_factory)[1] == (3.0, 0.0)
+    assert buffer.submit([{"id": 3, "x": 1.0}]) == 1
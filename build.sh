@@ -7,6 +7,9 @@ npm install
 npm run build
 cd ..
 
+echo "Precompressing frontend assets..."
+(cd backend && python precompress_assets.py)
+
 echo "Frontend build completed!"
 echo "Now you can run the backend server and it will serve both API and frontend:"
 echo "  cd backend && python run.py"